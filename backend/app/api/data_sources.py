@@ -1,10 +1,12 @@
 import logging
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.schemas.schemas import DataSource, DataSourceCreate, DataSourceUpdate, ConnectionTest
 from app.services.services import DataSourceService
+from app.services.connection_pool import connection_fingerprint
+from app.services.health_prober import health_prober, UNKNOWN
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -13,29 +15,40 @@ logger = logging.getLogger(__name__)
 async def startup_event():
     logger.info("Data sources API router initialized")
 
+def _with_status(data_source, circuit_state: str) -> dict:
+    """附加健康探测缓存中的状态；还没有探测结果时提交一次后台探测"""
+    data_source_dict = data_source.__dict__.copy()
+    status = health_prober.get_status(data_source)
+    if status["status"] == UNKNOWN:
+        health_prober.probe_async(data_source)
+    data_source_dict.update(status)
+    data_source_dict['circuit_state'] = circuit_state
+    return data_source_dict
+
+def _with_statuses(request: Request, data_sources) -> List[dict]:
+    """熔断器在执行巡检的进程中，standalone 模式下一次调用取回所有数据源的状态"""
+    states = request.app.state.scheduler_manager.circuit_states([ds.id for ds in data_sources])
+    return [_with_status(ds, states[ds.id]) for ds in data_sources]
+
 @router.post("/", response_model=DataSource)
 def create_data_source(
     data_source: DataSourceCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     data_source_service = DataSourceService(db)
     # In a real app, you'd get the user_id from the token
     user_id = 1  # Placeholder
     created_data_source = data_source_service.create_data_source(data_source, created_by=user_id)
-    # Add status field based on actual connection status
-    data_source_dict = created_data_source.__dict__.copy()
-    if created_data_source.is_active:
-        # Test the actual connection to determine status
-        connection_ok = data_source_service.test_connection(created_data_source.id)
-        data_source_dict['status'] = 'active' if connection_ok else 'error'
-    else:
-        data_source_dict['status'] = 'inactive'
-    return data_source_dict
+    # 连接状态由后台探测得出，不阻塞创建请求
+    return _with_statuses(request, [created_data_source])[0]
 
 @router.get("/", response_model=List[DataSource])
 def read_data_sources(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
+    refresh: bool = False,
     db: Session = Depends(get_db)
 ):
     logger.info(f"Fetching data sources with skip={skip}, limit={limit}")
@@ -43,39 +56,33 @@ def read_data_sources(
     try:
         result = data_source_service.get_data_sources(skip=skip, limit=limit)
         logger.info(f"Successfully fetched {len(result)} data sources")
-        # Add status field based on actual connection status
-        enhanced_result = []
-        for ds in result:
-            ds_dict = ds.__dict__.copy()
-            # Test actual connection to determine status
-            if ds.is_active:
-                connection_ok = data_source_service.test_connection(ds.id)
-                ds_dict['status'] = 'active' if connection_ok else 'error'
-            else:
-                ds_dict['status'] = 'inactive'
-            enhanced_result.append(ds_dict)
-        return enhanced_result
+        if refresh:
+            # 并发重新探测，总耗时约为最慢的一个数据源
+            health_prober.probe(result)
+        return _with_statuses(request, result)
     except Exception as e:
         logger.error(f"Error fetching data sources: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.get("/circuit-breakers")
+def read_circuit_breakers(request: Request):
+    """获取所有数据源的熔断器状态"""
+    return request.app.state.scheduler_manager.circuit_breaker_stats()
+
 @router.get("/{data_source_id}", response_model=DataSource)
 def read_data_source(
     data_source_id: int,
+    request: Request,
+    refresh: bool = False,
     db: Session = Depends(get_db)
 ):
     data_source_service = DataSourceService(db)
     data_source = data_source_service.get_data_source(data_source_id)
     if data_source is None:
         raise HTTPException(status_code=404, detail="Data source not found")
-    # Add status field based on actual connection status
-    data_source_dict = data_source.__dict__.copy()
-    if data_source.is_active:
-        connection_ok = data_source_service.test_connection(data_source_id)
-        data_source_dict['status'] = 'active' if connection_ok else 'error'
-    else:
-        data_source_dict['status'] = 'inactive'
-    return data_source_dict
+    if refresh:
+        health_prober.probe([data_source])
+    return _with_statuses(request, [data_source])[0]
 
 @router.post("/{data_source_id}/test")
 def test_connection(
@@ -89,6 +96,29 @@ def test_connection(
     result = data_source_service.test_connection(data_source_id)
     return {"connection_successful": result}
 
+@router.get("/{data_source_id}/circuit-breaker")
+def read_circuit_breaker(
+    data_source_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    data_source_service = DataSourceService(db)
+    if data_source_service.get_data_source(data_source_id) is None:
+        raise HTTPException(status_code=404, detail="Data source not found")
+    return request.app.state.scheduler_manager.circuit_breaker_stats(data_source_id)
+
+@router.post("/{data_source_id}/circuit-breaker/reset")
+def reset_circuit_breaker(
+    data_source_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """手动关闭熔断器，数据源恢复后不必等待恢复时间"""
+    data_source_service = DataSourceService(db)
+    if data_source_service.get_data_source(data_source_id) is None:
+        raise HTTPException(status_code=404, detail="Data source not found")
+    return request.app.state.scheduler_manager.reset_circuit_breaker(data_source_id)
+
 @router.post("/test-connection")
 def test_connection_before_create(
     connection_data: ConnectionTest,
@@ -125,19 +155,34 @@ def test_sql_query(
 @router.get("/{data_source_id}/schema")
 def get_sql_schema(
     data_source_id: int,
+    response: Response,
+    refresh: bool = False,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
+    """返回缓存的库表结构目录，客户端带上 If-None-Match 且版本未变时返回304"""
     data_source_service = DataSourceService(db)
     data_source = data_source_service.get_data_source(data_source_id)
     if data_source is None:
         raise HTTPException(status_code=404, detail="Data source not found")
-    schema = data_source_service.get_sql_schema(data_source_id)
+    try:
+        schema = data_source_service.get_sql_schema(data_source_id, refresh=refresh)
+    except Exception as e:
+        logger.error(f"Error loading schema for data source {data_source_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load schema: {str(e)}")
+
+    etag = f'"{schema["version"]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return schema
 
 @router.put("/{data_source_id}", response_model=DataSource)
 def update_data_source(
     data_source_id: int,
     data_source_update: DataSourceUpdate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """更新数据源"""
@@ -148,21 +193,17 @@ def update_data_source(
         # In a real app, you'd get the user_id from the token
         user_id = 1  # Placeholder
         
+        data_source = data_source_service.get_data_source(data_source_id)
+        previous_fingerprint = connection_fingerprint(data_source) if data_source else None
         updated_data_source = data_source_service.update_data_source(
             data_source_id, data_source_update, updated_by=user_id
         )
+        if connection_fingerprint(updated_data_source) != previous_fingerprint:
+            # 调度进程中按旧配置建立的连接和缓存同样需要丢弃
+            request.app.state.scheduler_manager.forget_data_source(data_source_id)
         
-        # Add status field based on actual connection status
-        data_source_dict = updated_data_source.__dict__.copy()
-        if updated_data_source.is_active:
-            # Test the actual connection to determine status
-            connection_ok = data_source_service.test_connection(updated_data_source.id)
-            data_source_dict['status'] = 'active' if connection_ok else 'error'
-        else:
-            data_source_dict['status'] = 'inactive'
-            
         logger.info(f"Successfully updated data source with ID: {data_source_id}")
-        return data_source_dict
+        return _with_statuses(request, [updated_data_source])[0]
         
     except ValueError as e:
         logger.error(f"Data source not found: {str(e)}")
@@ -177,6 +218,7 @@ def update_data_source(
 @router.delete("/{data_source_id}")
 def delete_data_source(
     data_source_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     logger.info(f"Attempting to delete data source with ID: {data_source_id}")
@@ -203,6 +245,7 @@ def delete_data_source(
         # Delete the data source
         success = data_source_service.delete_data_source(data_source_id)
         if success:
+            request.app.state.scheduler_manager.forget_data_source(data_source_id, deleted=True)
             logger.info(f"Successfully deleted data source with ID: {data_source_id}")
             return {"message": "Data source deleted successfully"}
         else:
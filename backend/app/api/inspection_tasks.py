@@ -1,11 +1,16 @@
 import logging
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import get_current_user
-from app.schemas.schemas import InspectionTask, InspectionTaskCreate, InspectionTaskUpdate, InspectionResult
+from app.schemas.schemas import InspectionTask, InspectionTaskCreate, InspectionTaskUpdate, InspectionResult, TaskDependency, TaskDependencyCreate, DependencySignal, BackfillCreate, BackfillRun, DeadLetter
 from app.services.services import InspectionTaskService
+from app.services.dependencies import TaskDependencyService
+from app.services.backfill import BackfillService
+from app.services.dead_letters import DeadLetterService
+from app.services.backfill_runner import backfill_runner
+from app.schedulers.control import SchedulerUnavailableError
 from app.models.models import User
 
 router = APIRouter()
@@ -34,7 +39,7 @@ def create_task(
             scheduler_manager = request.app.state.scheduler_manager
             scheduler = scheduler_manager.get_scheduler()
             if scheduler:
-                scheduler.add_task(created_task.id, task.cron_schedule, task.name)
+                scheduler.add_task(created_task.id, task.cron_schedule, task.name, created_task.spread_window_seconds)
                 logger.info(f"Added task {created_task.id} to scheduler")
         except Exception as e:
             logger.error(f"Failed to add task {created_task.id} to scheduler: {e}")
@@ -42,6 +47,100 @@ def create_task(
     
     return created_task
 
+@router.get("/result-cache/stats")
+def get_result_cache_stats(request: Request):
+    """获取期望SQL结果缓存的命中统计"""
+    return request.app.state.scheduler_manager.result_cache_stats()
+
+@router.delete("/result-cache")
+def clear_result_cache(request: Request, data_source_id: Optional[int] = None):
+    """清除期望SQL结果缓存，可按数据源清除"""
+    request.app.state.scheduler_manager.invalidate_result_cache(data_source_id)
+    return {"message": "Result cache cleared"}
+
+@router.get("/signals", response_model=List[DependencySignal])
+def read_signals(db: Session = Depends(get_db)):
+    """获取所有外部就绪信号及最近一次就绪时间"""
+    return TaskDependencyService(db).get_signals()
+
+@router.post("/signals/{signal_name}/ready", response_model=DependencySignal)
+def mark_signal_ready(signal_name: str, request: Request, db: Session = Depends(get_db)):
+    """上报外部信号就绪(如上游ETL完成)，依赖该信号的任务满足条件时立即执行"""
+    signal = TaskDependencyService(db).signal_ready(signal_name)
+    request.app.state.scheduler_manager.notify_signal(signal_name)
+    logger.info(f"Signal {signal_name} marked ready")
+    return signal
+
+@router.get("/dag/status")
+def get_dag_status(request: Request):
+    """获取DAG执行器的评估和触发统计"""
+    return request.app.state.scheduler_manager.dag_stats()
+
+@router.get("/backfills/{backfill_id}", response_model=BackfillRun)
+def read_backfill(backfill_id: int, db: Session = Depends(get_db)):
+    """获取回填的状态和进度"""
+    run = BackfillService(db).get_backfill(backfill_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Backfill not found")
+    return run
+
+@router.get("/backfills/{backfill_id}/results", response_model=List[InspectionResult])
+def read_backfill_results(backfill_id: int, db: Session = Depends(get_db)):
+    """获取回填每个窗口的执行结果，按窗口时间排序"""
+    return BackfillService(db).get_backfill_results(backfill_id)
+
+@router.post("/backfills/{backfill_id}/cancel", response_model=BackfillRun)
+def cancel_backfill(backfill_id: int, db: Session = Depends(get_db)):
+    """取消回填，已在执行的窗口会执行完"""
+    try:
+        return BackfillService(db).cancel_backfill(backfill_id)
+    except ValueError as e:
+        status_code = 404 if str(e) == "Backfill not found" else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+@router.post("/backfills/{backfill_id}/resume", response_model=BackfillRun)
+def resume_backfill(backfill_id: int, db: Session = Depends(get_db)):
+    """恢复失败或已取消的回填，跳过已有结果的窗口，重新执行出错的窗口"""
+    try:
+        run = BackfillService(db).resume_backfill(backfill_id)
+    except ValueError as e:
+        status_code = 404 if str(e) == "Backfill not found" else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+    backfill_runner.notify()
+    return run
+
+@router.get("/dead-letters", response_model=List[DeadLetter])
+def read_dead_letters(
+    task_id: Optional[int] = None,
+    include_resolved: bool = False,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """获取重试次数用尽仍然失败的执行"""
+    return DeadLetterService(db).get_dead_letters(task_id, include_resolved, skip, limit)
+
+@router.post("/dead-letters/{dead_letter_id}/retry", response_model=InspectionResult)
+def retry_dead_letter(dead_letter_id: int, db: Session = Depends(get_db)):
+    """立即重新执行死信对应的任务，执行没有出错时死信标记为已处理"""
+    try:
+        return DeadLetterService(db).retry_dead_letter(dead_letter_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/dead-letters/{dead_letter_id}/resolve", response_model=DeadLetter)
+def resolve_dead_letter(dead_letter_id: int, db: Session = Depends(get_db)):
+    """忽略死信，标记为已处理"""
+    try:
+        return DeadLetterService(db).resolve_dead_letter(dead_letter_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/retry/status")
+def get_retry_status(request: Request):
+    """获取重试队列中等待的重试数和执行统计"""
+    return request.app.state.scheduler_manager.retry_stats()
+
 @router.get("/", response_model=List[InspectionTask])
 def read_tasks(
     skip: int = 0,
@@ -104,7 +203,7 @@ def update_task(
                 
                 # 如果任务有调度配置且状态为active，重新添加到调度器
                 if updated_task.cron_schedule and updated_task.status == 'active':
-                    scheduler.add_task(task_id, updated_task.cron_schedule, updated_task.name)
+                    scheduler.add_task(task_id, updated_task.cron_schedule, updated_task.name, updated_task.spread_window_seconds)
                     logger.info(f"Updated task {task_id} in scheduler")
         except Exception as e:
             logger.error(f"Failed to update task {task_id} in scheduler: {e}")
@@ -121,7 +220,8 @@ def execute_task(
 ):
     task_service = InspectionTaskService(db)
     try:
-        result = task_service.execute_task(task_id)
+        # 手动执行直接返回结果，不进入重试队列
+        result = task_service.execute_task(task_id, retry=False)
         return result
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -227,6 +327,53 @@ def get_task_stats(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.get("/{task_id}/dependencies", response_model=List[TaskDependency])
+def read_task_dependencies(task_id: int, db: Session = Depends(get_db)):
+    """获取任务的上游任务和外部信号依赖"""
+    return TaskDependencyService(db).get_dependencies(task_id)
+
+@router.post("/{task_id}/dependencies", response_model=TaskDependency)
+def create_task_dependency(
+    task_id: int,
+    dependency: TaskDependencyCreate,
+    db: Session = Depends(get_db)
+):
+    """添加依赖：上游任务检查通过或外部信号就绪后执行本任务"""
+    try:
+        return TaskDependencyService(db).add_dependency(task_id, dependency)
+    except ValueError as e:
+        status_code = 404 if str(e) == "Task not found" else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+@router.delete("/{task_id}/dependencies/{dependency_id}")
+def delete_task_dependency(task_id: int, dependency_id: int, db: Session = Depends(get_db)):
+    """删除任务的一个依赖"""
+    if not TaskDependencyService(db).remove_dependency(task_id, dependency_id):
+        raise HTTPException(status_code=404, detail="Dependency not found")
+    return {"message": "Dependency deleted successfully"}
+
+@router.get("/{task_id}/backfills", response_model=List[BackfillRun])
+def read_task_backfills(task_id: int, db: Session = Depends(get_db)):
+    """获取任务的历史回填"""
+    return BackfillService(db).get_backfills(task_id)
+
+@router.post("/{task_id}/backfills", response_model=BackfillRun)
+def create_task_backfill(
+    task_id: int,
+    backfill: BackfillCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """把带时间窗口参数的任务按天回填到 [start_date, end_date]，每天一条执行结果"""
+    try:
+        run = BackfillService(db).create_backfill(task_id, backfill, current_user.id)
+    except ValueError as e:
+        status_code = 404 if str(e) == "Task not found" else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+    logger.info(f"Created backfill {run.id} for task {task_id}: {run.start_date} ~ {run.end_date}")
+    backfill_runner.notify()
+    return run
+
 @router.get("/{task_id}/scheduler-status")
 def get_task_scheduler_status(
     task_id: int,
@@ -249,6 +396,8 @@ def get_task_scheduler_status(
             "scheduler_enabled": True,
             "scheduler_status": status
         }
+    except SchedulerUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get scheduler status for task {task_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -276,7 +425,7 @@ def reload_task_scheduler(
         
         # 如果任务有调度配置且状态为active，重新添加到调度器
         if task.cron_schedule and task.status == 'active':
-            scheduler.add_task(task_id, task.cron_schedule, task.name)
+            scheduler.add_task(task_id, task.cron_schedule, task.name, task.spread_window_seconds)
             logger.info(f"Reloaded task {task_id} into scheduler")
             return {"message": "Task reloaded into scheduler successfully"}
         else:
@@ -284,6 +433,8 @@ def reload_task_scheduler(
             
     except HTTPException:
         raise
+    except SchedulerUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to reload task {task_id} scheduler: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -306,54 +457,81 @@ def get_scheduler_status(request: Request):
         tasks = scheduler.list_tasks()
         return {
             "scheduler_enabled": True,
-            "scheduler_type": "background",
+            "scheduler_type": scheduler_manager.settings.SCHEDULER_TYPE,
             "running": scheduler.is_running,
             "total_tasks": len(tasks),
             "tasks": tasks
         }
+    except SchedulerUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get scheduler status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/scheduler/reload-all")
-def reload_all_schedulers(
-    request: Request,
+@router.get("/scheduler/catch-up")
+def get_scheduler_catch_up(request: Request):
+    """获取最近一次启动时错过的触发和补跑进度"""
+    scheduler_manager = request.app.state.scheduler_manager
+    scheduler = scheduler_manager.get_scheduler()
+    if not scheduler:
+        raise HTTPException(status_code=400, detail="Scheduler not available")
+    
+    report = scheduler.get_catch_up_report()
+    if report is None:
+        return {"enabled": False}
+    return dict(report, enabled=True)
+
+@router.get("/scheduler/dispatch-stats")
+def get_scheduler_dispatch_stats(request: Request):
+    """获取各数据源的派发队列深度、执行中数量和等待时间"""
+    scheduler_manager = request.app.state.scheduler_manager
+    scheduler = scheduler_manager.get_scheduler()
+    if not scheduler:
+        raise HTTPException(status_code=400, detail="Scheduler not available")
+    
+    stats = scheduler.get_dispatch_stats()
+    if stats is None:
+        return {"enabled": False}
+    return dict(stats, enabled=True)
+
+@router.get("/scheduler/load-preview")
+def get_scheduler_load_preview(
+    horizon_seconds: int = Query(3600, ge=60, le=86400),
+    bucket_seconds: int = Query(60, ge=1, le=3600),
+    data_source_id: Optional[int] = None,
+    assume_spread_seconds: Optional[int] = Query(None, ge=0, le=86400),
     db: Session = Depends(get_db)
 ):
-    """重新加载所有活跃任务到调度器"""
+    """按数据源预览未来一段时间内每个时间桶的任务触发次数(含分散窗口的顺延)"""
+    task_service = InspectionTaskService(db)
+    return task_service.get_schedule_load_preview(
+        horizon_seconds=horizon_seconds,
+        bucket_seconds=bucket_seconds,
+        data_source_id=data_source_id,
+        assume_spread_seconds=assume_spread_seconds
+    )
+
+@router.post("/scheduler/reload-all")
+def reload_all_schedulers(request: Request):
+    """按数据库中的活跃任务增量同步调度器，只应用新增、删除和触发器变化"""
     try:
         scheduler_manager = request.app.state.scheduler_manager
         scheduler = scheduler_manager.get_scheduler()
         if not scheduler:
             raise HTTPException(status_code=400, detail="Scheduler not available")
         
-        # 获取所有活跃任务
-        from app.models.models import InspectionTask
-        active_tasks = db.query(InspectionTask).filter(
-            InspectionTask.status == 'active'
-        ).all()
-        
-        loaded_count = 0
-        for task in active_tasks:
-            if task.cron_schedule:
-                try:
-                    # 移除旧任务
-                    scheduler.remove_task(task.id)
-                    # 重新添加
-                    scheduler.add_task(task.id, task.cron_schedule, task.name)
-                    loaded_count += 1
-                    logger.info(f"Reloaded task {task.id}: {task.name}")
-                except Exception as e:
-                    logger.error(f"Failed to reload task {task.id}: {e}")
-        
-        return {
-            "message": f"Reloaded {loaded_count} active tasks into scheduler",
-            "total_active_tasks": len(active_tasks),
-            "loaded_tasks": loaded_count
-        }
+        summary = scheduler_manager.reconcile()
+        loaded_count = summary['total_active_tasks'] - len(summary['failed'])
+        return dict(
+            summary,
+            message=f"Reconciled {loaded_count} active tasks into scheduler",
+            loaded_tasks=loaded_count
+        )
         
     except HTTPException:
         raise
+    except SchedulerUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to reload all schedulers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
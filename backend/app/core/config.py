@@ -23,15 +23,108 @@ class Settings(BaseSettings):
     
     # Task Scheduler Configuration
     SCHEDULER_ENABLED: bool = True
-    SCHEDULER_TYPE: Literal["background", "redis", "celery"] = "background"
+    SCHEDULER_TYPE: Literal["background", "redis", "native", "database", "celery"] = "background"
+    # embedded: 调度器随API进程启动；standalone: 调度器由 scheduler_main.py 单独运行，API通过控制通道访问
+    SCHEDULER_MODE: Literal["embedded", "standalone"] = "embedded"
+    SCHEDULER_CONTROL_ADDRESS: str = "127.0.0.1:8765"  # host:port，或Unix socket路径
+    SCHEDULER_CONTROL_AUTHKEY: str = ""  # standalone 模式必须设置，且不能与默认 SECRET_KEY 相同
+    SCHEDULER_CONTROL_TIMEOUT: float = 10.0  # seconds
     REDIS_SCHEDULER_URL: str = "redis://localhost:6379/0"
     MAX_WORKERS: int = 4
     TASK_TIMEOUT: int = 300  # seconds
+    # 失败重试：连接失败、超时等瞬时错误按指数退避加随机抖动延迟重试，SQL错误等确定性错误直接失败
+    RETRY_MAX_RETRIES: int = 2  # 任务未配置时的重试次数，0表示不重试
+    RETRY_BACKOFF_SECONDS: int = 10  # 第一次重试的延迟，之后每次翻倍
+    RETRY_BACKOFF_MAX_SECONDS: int = 300
+    RETRY_MAX_WORKERS: int = 4  # 执行到期重试的线程数
+    # thread: 在调度线程中执行；process: 在独立工作进程中执行，超过 TASK_TIMEOUT 时终止工作进程
+    SCHEDULER_EXECUTOR: Literal["thread", "process"] = "thread"
+    SCHEDULER_WORKER_MAX_TASKS: int = 100  # 工作进程执行多少次后重建，0表示不重建
     
     # Scheduler Performance Settings
     SCHEDULER_MAX_INSTANCES: int = 3
     SCHEDULER_MISFIRE_GRACE_TIME: int = 3600  # seconds
     SCHEDULER_COALESCE: bool = True
+    # database: 作业和下一次触发时间保存在元数据库，重启后按补跑策略处理停机期间错过的触发；默认 memory，保持原有行为
+    SCHEDULER_JOB_STORE: Literal["memory", "database"] = "memory"
+    SCHEDULER_CATCHUP_POLICY: Literal["skip", "run_once", "run_all"] = "skip"
+    SCHEDULER_CATCHUP_MAX_RUNS: int = 24  # run_all 时每个任务最多补跑的次数
+    SCHEDULER_CATCHUP_RATE: float = 2.0  # 补跑速率，次/秒
+    SCHEDULER_RECONCILE_INTERVAL: int = 300  # seconds，定期按数据库增量同步调度器，0表示不同步
+    # 同一数据源上同时到期的任务合并为一条查询的等待窗口，0表示不合并
+    SCHEDULER_BATCH_WINDOW_MS: int = 0
+    SCHEDULER_BATCH_MAX_TASKS: int = 50
+    # 按数据源公平派发(默认关闭)：每个数据源一个有界队列，限制同时执行数，多个数据源之间轮转
+    # 不能与 SCHEDULER_BATCH_WINDOW_MS > 0 或 INSPECTION_ENGINE=asyncio 同时开启
+    SCHEDULER_FAIR_DISPATCH: bool = False
+    DISPATCH_MAX_IN_FLIGHT_PER_SOURCE: int = 2
+    DISPATCH_MAX_QUEUE_DEPTH: int = 100  # 每个数据源最多排队的触发数，超出时丢弃(或为更高优先级的触发丢弃最低优先级的排队任务)
+    DISPATCH_PRIORITY_AGING_SECONDS: int = 60  # 任务排队每满该时间优先级提升一级，避免低优先级任务一直被插队，0表示不提升
+    DISPATCH_CRITICAL_RESERVED_SLOTS: int = 1  # 全局和每个数据源额外保留给 critical 任务的执行槽
+    # 任务依赖(DAG)：上游任务检查通过或外部信号就绪后立即执行下游任务
+    DAG_ENABLED: bool = True
+    DAG_BATCH_WINDOW_MS: int = 200  # 收集同时就绪的下游任务的等待窗口，同一数据源的任务合并执行
+    DAG_SWEEP_INTERVAL: int = 30  # seconds，定期评估所有有依赖的任务，补上其他进程中完成的上游和上报的信号
+    DAG_MAX_WORKERS: int = 4  # 没有运行调度器时执行就绪任务的线程数
+
+    # 历史回填：带时间窗口参数({{ds}}、{{window_start}}等)的任务按天展开到历史区间执行
+    SQL_TEMPLATE_TIMEZONE: str = "Asia/Shanghai"  # 时间窗口参数使用的时区
+    BACKFILL_MAX_WINDOWS: int = 366  # 一次回填最多的天数
+    BACKFILL_MAX_WORKERS: int = 8
+    BACKFILL_MAX_PARALLEL_PER_SOURCE: int = 2  # 每个数据源同时执行的回填窗口数
+    BACKFILL_POLL_INTERVAL: int = 5  # seconds，领取待执行的回填
+    BACKFILL_LEASE_TTL: int = 60  # seconds，执行回填的进程宕机后经过该时间由其他进程接着执行
+
+    # Redis Scheduler (SCHEDULER_TYPE=redis，多副本共享调度计划)
+    REDIS_SCHEDULER_KEY_PREFIX: str = "dq:scheduler"
+    REDIS_SCHEDULER_POLL_INTERVAL: float = 1.0  # seconds
+    REDIS_SCHEDULER_LEASE_TTL: int = 60  # seconds，持有者宕机后经过该时间任务被其他副本接管
+    REDIS_SCHEDULER_CLAIM_BATCH: int = 10  # 每次轮询最多领取的任务数
+    
+    # Database Scheduler (SCHEDULER_TYPE=database，只依赖元数据库，多副本从任务表领取到期任务)
+    DATABASE_SCHEDULER_POLL_INTERVAL: float = 1.0  # seconds
+    DATABASE_SCHEDULER_LEASE_TTL: int = 60  # seconds
+    DATABASE_SCHEDULER_CLAIM_BATCH: int = 500  # 每次轮询最多领取的任务数(一条语句)
+    
+    # Data Source Connection Pool
+    DATA_SOURCE_CONNECT_TIMEOUT: int = 10  # seconds
+    CONNECTION_POOL_MAX_SIZE: int = 5  # 每个数据源的最大连接数
+    CONNECTION_POOL_IDLE_TIMEOUT: int = 300  # seconds
+    CONNECTION_POOL_ACQUIRE_TIMEOUT: int = 30  # seconds
+    
+    # Inspection Execution
+    # serial: 检查SQL和期望SQL在同一个会话中依次执行; parallel: 相互独立时并发执行
+    INSPECTION_QUERY_MODE: Literal["serial", "parallel"] = "serial"
+    INSPECTION_QUERY_THREADS: int = 8
+    # thread: 同步驱动 + 调度器线程池; asyncio: 单事件循环 + 异步驱动
+    INSPECTION_ENGINE: Literal["thread", "asyncio"] = "thread"
+    ASYNC_ENGINE_SOURCE_CONCURRENCY: int = 20  # 每个数据源的最大并发查询数
+    # 检查SQL结果行列数保护: off 不检查(默认，保持原有读取方式); warn 只读取有限行并记录告警日志; strict 超限时执行失败
+    QUERY_RESULT_GUARD: Literal["off", "warn", "strict"] = "off"
+    QUERY_MAX_ROWS: int = 1
+    QUERY_MAX_COLUMNS: int = 1
+    
+    # 多行(分组)检查: 每侧SQL最多返回的行数，以及每次执行保存的失败分组数
+    GROUPED_CHECK_MAX_ROWS: int = 100000
+    GROUPED_CHECK_MAX_FAILURES_STORED: int = 20
+    
+    # Data Source Circuit Breaker
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5  # 连续连接失败次数，0表示关闭熔断
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: int = 60  # seconds, 熔断后多久进入半开状态
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS: int = 1  # 半开状态允许的试探请求数
+    
+    # Data Source Health Probe
+    HEALTH_PROBE_ENABLED: bool = True
+    HEALTH_PROBE_INTERVAL: int = 60  # seconds
+    HEALTH_PROBE_THREADS: int = 16
+    
+    # Schema Catalog
+    SCHEMA_CATALOG_TTL: int = 300  # seconds, 过期后后台增量刷新
+    SCHEMA_CATALOG_FULL_REFRESH_INTERVAL: int = 3600  # seconds
+    
+    # Expected SQL Result Cache
+    RESULT_CACHE_DEFAULT_TTL: int = 0  # seconds, 0表示不缓存
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
     
     # Alert Settings
     ALERT_ENABLED: bool = True
@@ -1,5 +1,5 @@
 import logging
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -19,4 +19,35 @@ def get_db():
         yield db
     finally:
         db.close()
-        logger.info("Database session closed")
\ No newline at end of file
+        logger.info("Database session closed")
+
+def add_missing_columns(bind, metadata):
+    """为已存在的表补齐模型中新增的列
+
+    create_all 只会创建缺失的表，不会修改已有表结构；新增列都是可空列(或带有
+    server_default)，这里直接用 ALTER TABLE ADD COLUMN 补齐，并创建涉及新增列的索引。
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            added_columns = set()
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                added_columns.add(column.name)
+                column_type = column.type.compile(dialect=bind.dialect)
+                default = ""
+                if column.server_default is not None:
+                    default_arg = column.server_default.arg
+                    default_sql = default_arg.text if hasattr(default_arg, "text") else f"'{default_arg}'"
+                    default = f" DEFAULT {default_sql}"
+                logger.info(f"Adding column {table.name}.{column.name} ({column_type}{default})")
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}'))
+            for index in table.indexes:
+                if added_columns.intersection(column.name for column in index.columns):
+                    logger.info(f"Creating index {index.name} on {table.name}")
+                    index.create(connection)
@@ -0,0 +1,10 @@
+from .base import BaseDriver
+from .registry import get_driver, register_driver, loaded_drivers, UnsupportedDataSourceError
+
+__all__ = [
+    "BaseDriver",
+    "get_driver",
+    "register_driver",
+    "loaded_drivers",
+    "UnsupportedDataSourceError"
+]
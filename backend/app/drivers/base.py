@@ -0,0 +1,109 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+import logging
+import socket
+
+logger = logging.getLogger(__name__)
+
+# 连接测试使用较短的超时时间
+TEST_CONNECT_TIMEOUT = 5
+
+
+def chunked(items: List[Any], size: int = 500):
+    """分批生成，避免 IN 列表过长"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BaseDriver(ABC):
+    """数据源驱动基础抽象类
+
+    每种数据源类型一个驱动实例，负责建立连接、存活检查、执行标量查询、
+    取消查询以及读取库表结构。驱动模块只在第一次使用时才会被导入。
+    """
+
+    # 驱动名称，用于日志
+    name: str = ""
+
+    @abstractmethod
+    def connect(self, config, connect_timeout: Optional[int] = None):
+        """建立一个新的原生连接
+
+        Args:
+            config: 包含 host/port/database/username/password 的对象
+                (DataSource 或 ConnectionTest)
+            connect_timeout: 连接超时(秒)，为空时使用全局配置
+        """
+        pass
+
+    @abstractmethod
+    def ping(self, connection) -> bool:
+        """连接存活检查"""
+        pass
+
+    @abstractmethod
+    def execute_scalar(self, connection, sql_query: str) -> Any:
+        """执行SQL并返回第一行第一列的值，按 QUERY_RESULT_GUARD 检查结果形状"""
+        pass
+
+    @abstractmethod
+    def fetch_row(self, connection, sql_query: str) -> Optional[tuple]:
+        """执行SQL并返回第一行"""
+        pass
+
+    @abstractmethod
+    def fetch_rows(self, connection, sql_query: str, max_rows: int) -> List[tuple]:
+        """执行SQL并返回所有行(多行检查使用)，最多读取 max_rows + 1 行，超过 max_rows 时抛出 ResultShapeError"""
+        pass
+
+    @abstractmethod
+    def cancel(self, connection):
+        """取消连接上正在执行的查询"""
+        pass
+
+    @abstractmethod
+    def list_tables(self, connection) -> Dict[str, Any]:
+        """列出当前库中的表及其元数据变更标记 {表名: 标记}
+
+        标记(修改时间、系统目录行版本等)变化说明表结构可能变了；标记为 None 的表每次刷新都重新读取列。
+        默认库/schema 中的表用裸表名，其他 schema 中的表用 "schema.table"。
+        """
+        pass
+
+    @abstractmethod
+    def describe_tables(self, connection, table_names: List[str]) -> Dict[str, List[str]]:
+        """读取指定表的列名 {表名: [列名]}，表名与 list_tables 返回的一致"""
+        pass
+
+    @abstractmethod
+    async def create_async_pool(self, config, max_size: int):
+        """为异步执行引擎创建连接池"""
+        pass
+
+    @abstractmethod
+    async def execute_scalar_async(self, connection, sql_query: str) -> Any:
+        """异步版本的 execute_scalar"""
+        pass
+
+    def is_connection_error(self, error: BaseException) -> bool:
+        """是否为连接类错误(连接失败、超时、连接中断)，用于熔断判断；SQL错误返回False"""
+        return isinstance(error, (ConnectionError, socket.timeout, socket.gaierror, EOFError))
+
+    def reset(self, connection):
+        """归还连接池前结束当前事务，避免下次借出时读到旧快照"""
+        connection.rollback()
+
+    def close(self, connection):
+        """关闭连接，忽略关闭过程中的错误"""
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing {self.name} connection: {e}")
+
+    def test_connection(self, config) -> bool:
+        """建立一次连接并做存活检查"""
+        connection = self.connect(config, connect_timeout=TEST_CONNECT_TIMEOUT)
+        try:
+            return self.ping(connection)
+        finally:
+            self.close(connection)
@@ -0,0 +1,142 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from clickhouse_driver import Client
+from clickhouse_driver import errors as clickhouse_errors
+
+from app.core.config import settings
+from app.services.result_guard import first_value, limit_rows
+from .base import TEST_CONNECT_TIMEOUT, BaseDriver, chunked
+
+logger = logging.getLogger(__name__)
+
+
+class ClickHouseDriver(BaseDriver):
+    """ClickHouse 驱动 (clickhouse_driver / asynch)"""
+
+    name = "clickhouse"
+
+    def connect(self, config, connect_timeout: Optional[int] = None):
+        return Client(
+            host=config.host,
+            port=config.port,
+            user=config.username,
+            password=config.password,
+            database=config.database,
+            connect_timeout=connect_timeout or settings.DATA_SOURCE_CONNECT_TIMEOUT
+        )
+
+    def ping(self, connection) -> bool:
+        try:
+            # clickhouse_driver 在首次执行时才建立连接，未连接的客户端可以直接使用
+            if not connection.connection.connected:
+                return True
+            return bool(connection.connection.ping())
+        except Exception as e:
+            logger.debug(f"{self.name} ping failed: {e}")
+            return False
+
+    def test_connection(self, config) -> bool:
+        client = self.connect(config, connect_timeout=TEST_CONNECT_TIMEOUT)
+        try:
+            client.execute('SELECT 1')
+            return True
+        finally:
+            self.close(client)
+
+    def is_connection_error(self, error: BaseException) -> bool:
+        if isinstance(error, (clickhouse_errors.NetworkError, clickhouse_errors.SocketTimeoutError)):
+            return True
+        return super().is_connection_error(error)
+
+    def reset(self, connection):
+        pass
+
+    def close(self, connection):
+        try:
+            connection.disconnect()
+        except Exception as e:
+            logger.debug(f"Error closing {self.name} connection: {e}")
+
+    def execute_scalar(self, connection, sql_query: str) -> Any:
+        """流式读取，并让服务端在超过 QUERY_MAX_ROWS + 1 行后停止返回数据"""
+        if settings.QUERY_RESULT_GUARD == "off":
+            result = connection.execute(sql_query)
+            return result[0][0] if result and len(result) > 0 and len(result[0]) > 0 else None
+
+        max_rows = settings.QUERY_MAX_ROWS
+        stream = connection.execute_iter(
+            sql_query,
+            with_column_types=True,
+            settings={"max_result_rows": max_rows + 1, "result_overflow_mode": "break"}
+        )
+        rows = []
+        column_count = None
+        for index, item in enumerate(stream):
+            if index == 0:
+                column_count = len(item)
+            elif len(rows) <= max_rows:
+                rows.append(item)
+            # 其余数据块由服务端截断，读完即可保持连接可复用
+        return first_value(sql_query, rows, column_count, max_rows)
+
+    def fetch_row(self, connection, sql_query: str) -> Optional[tuple]:
+        result = connection.execute(sql_query)
+        return result[0] if result else None
+
+    def fetch_rows(self, connection, sql_query: str, max_rows: int) -> List[tuple]:
+        stream = connection.execute_iter(
+            sql_query,
+            settings={"max_result_rows": max_rows + 1, "result_overflow_mode": "break"}
+        )
+        rows = []
+        for row in stream:
+            if len(rows) <= max_rows:
+                rows.append(row)
+        return limit_rows(sql_query, rows, max_rows)
+
+    def cancel(self, connection):
+        connection.cancel()
+
+    def list_tables(self, connection) -> Dict[str, Any]:
+        rows = connection.execute(
+            "SELECT name, metadata_modification_time FROM system.tables WHERE database = currentDatabase()"
+        )
+        return {name: str(modified) for name, modified in rows}
+
+    def describe_tables(self, connection, table_names: List[str]) -> Dict[str, List[str]]:
+        columns: Dict[str, List[str]] = {name: [] for name in table_names}
+        for chunk in chunked(table_names):
+            rows = connection.execute(
+                "SELECT table, name FROM system.columns "
+                "WHERE database = currentDatabase() AND table IN %(tables)s ORDER BY table, position",
+                {"tables": tuple(chunk)}
+            )
+            for table, column in rows:
+                columns[table].append(column)
+        return columns
+
+    async def create_async_pool(self, config, max_size: int):
+        from asynch import create_pool
+        return await create_pool(
+            host=config.host,
+            port=config.port,
+            user=config.username,
+            password=config.password,
+            database=config.database,
+            minsize=0,
+            maxsize=max_size,
+            connect_timeout=settings.DATA_SOURCE_CONNECT_TIMEOUT
+        )
+
+    async def execute_scalar_async(self, connection, sql_query: str) -> Any:
+        async with connection.cursor() as cursor:
+            if settings.QUERY_RESULT_GUARD != "off":
+                cursor.set_settings({"max_result_rows": settings.QUERY_MAX_ROWS + 1, "result_overflow_mode": "break"})
+            await cursor.execute(sql_query)
+            if settings.QUERY_RESULT_GUARD == "off":
+                result = await cursor.fetchone()
+                return result[0] if result and len(result) > 0 else None
+            rows = await cursor.fetchmany(settings.QUERY_MAX_ROWS + 1)
+            column_count = len(cursor.description) if cursor.description else None
+        return first_value(sql_query, rows, column_count, settings.QUERY_MAX_ROWS)
@@ -0,0 +1,156 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import pymysql
+import pymysql.cursors
+
+from app.core.config import settings
+from app.services.result_guard import first_value, limit_rows
+from .base import BaseDriver, chunked
+
+logger = logging.getLogger(__name__)
+
+# 无法连接、连接断开、读写超时等客户端错误码
+_CONNECTION_ERROR_CODES = {2002, 2003, 2005, 2006, 2011, 2013, 2055}
+
+
+class MySQLDriver(BaseDriver):
+    """MySQL 驱动 (pymysql / aiomysql)"""
+
+    name = "mysql"
+
+    def connect(self, config, connect_timeout: Optional[int] = None):
+        return pymysql.connect(
+            host=config.host,
+            port=config.port,
+            user=config.username,
+            password=config.password,
+            database=config.database,
+            connect_timeout=connect_timeout or settings.DATA_SOURCE_CONNECT_TIMEOUT
+        )
+
+    def ping(self, connection) -> bool:
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logger.debug(f"{self.name} ping failed: {e}")
+            return False
+
+    def is_connection_error(self, error: BaseException) -> bool:
+        if isinstance(error, pymysql.err.InterfaceError):
+            return True
+        if isinstance(error, pymysql.err.OperationalError) and error.args:
+            return error.args[0] in _CONNECTION_ERROR_CODES
+        return super().is_connection_error(error)
+
+    def execute_scalar(self, connection, sql_query: str) -> Any:
+        """使用非缓冲游标最多读取 QUERY_MAX_ROWS + 1 行
+
+        还有剩余行时直接关闭连接，而不是把剩余结果读完；连接池在归还时
+        会发现连接已关闭并丢弃它。
+        """
+        if settings.QUERY_RESULT_GUARD == "off":
+            with connection.cursor() as cursor:
+                cursor.execute(sql_query)
+                result = cursor.fetchone()
+                return result[0] if result and len(result) > 0 else None
+
+        max_rows = settings.QUERY_MAX_ROWS
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(sql_query)
+        rows = cursor.fetchmany(max_rows + 1)
+        column_count = len(cursor.description) if cursor.description else None
+        if len(rows) > max_rows:
+            connection.close()
+        else:
+            cursor.close()
+        return first_value(sql_query, rows, column_count, max_rows)
+
+    def fetch_row(self, connection, sql_query: str) -> Optional[tuple]:
+        with connection.cursor() as cursor:
+            cursor.execute(sql_query)
+            return cursor.fetchone()
+
+    def fetch_rows(self, connection, sql_query: str, max_rows: int) -> List[tuple]:
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(sql_query)
+        rows = cursor.fetchmany(max_rows + 1)
+        if len(rows) > max_rows:
+            connection.close()
+        else:
+            cursor.close()
+        return limit_rows(sql_query, list(rows), max_rows)
+
+    def cancel(self, connection):
+        """通过另一个连接 KILL QUERY 当前连接上的查询"""
+        thread_id = connection.thread_id()
+        killer = pymysql.connect(
+            host=connection.host,
+            port=connection.port,
+            user=connection.user,
+            password=connection.password,
+            connect_timeout=settings.DATA_SOURCE_CONNECT_TIMEOUT
+        )
+        try:
+            with killer.cursor() as cursor:
+                cursor.execute(f"KILL QUERY {int(thread_id)}")
+        finally:
+            killer.close()
+
+    def list_tables(self, connection) -> Dict[str, Any]:
+        """CREATE_TIME 在 ALTER TABLE 重建表时变化；视图没有时间戳，标记为 None"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_NAME, CREATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()"
+            )
+            return {name: str(created) if created else None for name, created in cursor.fetchall()}
+
+    def describe_tables(self, connection, table_names: List[str]) -> Dict[str, List[str]]:
+        columns: Dict[str, List[str]] = {name: [] for name in table_names}
+        with connection.cursor() as cursor:
+            for chunk in chunked(table_names):
+                cursor.execute(
+                    "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN %s "
+                    "ORDER BY TABLE_NAME, ORDINAL_POSITION",
+                    (tuple(chunk),)
+                )
+                for table, column in cursor.fetchall():
+                    columns[table].append(column)
+        return columns
+
+    async def create_async_pool(self, config, max_size: int):
+        import aiomysql
+        return await aiomysql.create_pool(
+            host=config.host,
+            port=config.port,
+            user=config.username,
+            password=config.password,
+            db=config.database,
+            minsize=0,
+            maxsize=max_size,
+            pool_recycle=settings.CONNECTION_POOL_IDLE_TIMEOUT,
+            connect_timeout=settings.DATA_SOURCE_CONNECT_TIMEOUT,
+            autocommit=True
+        )
+
+    async def execute_scalar_async(self, connection, sql_query: str) -> Any:
+        if settings.QUERY_RESULT_GUARD == "off":
+            async with connection.cursor() as cursor:
+                await cursor.execute(sql_query)
+                result = await cursor.fetchone()
+                return result[0] if result and len(result) > 0 else None
+
+        import aiomysql
+        max_rows = settings.QUERY_MAX_ROWS
+        cursor = await connection.cursor(aiomysql.SSCursor)
+        await cursor.execute(sql_query)
+        rows = await cursor.fetchmany(max_rows + 1)
+        column_count = len(cursor.description) if cursor.description else None
+        if len(rows) > max_rows:
+            connection.close()
+        else:
+            await cursor.close()
+        return first_value(sql_query, rows, column_count, max_rows)
+
@@ -0,0 +1,160 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+from app.core.config import settings
+from app.services.result_guard import first_value, limit_rows
+from .base import BaseDriver
+
+logger = logging.getLogger(__name__)
+
+# 服务端游标只能用于普通查询
+_CURSOR_QUERY_PATTERN = re.compile(r"^\s*(SELECT|WITH|VALUES|TABLE)\b", re.IGNORECASE)
+
+
+class PostgreSQLDriver(BaseDriver):
+    """PostgreSQL 驱动 (psycopg2 / asyncpg)"""
+
+    name = "postgresql"
+
+    def connect(self, config, connect_timeout: Optional[int] = None):
+        return psycopg2.connect(
+            host=config.host,
+            port=config.port,
+            user=config.username,
+            password=config.password,
+            database=config.database,
+            connect_timeout=connect_timeout or settings.DATA_SOURCE_CONNECT_TIMEOUT
+        )
+
+    def ping(self, connection) -> bool:
+        try:
+            if connection.closed:
+                return False
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception as e:
+            logger.debug(f"{self.name} ping failed: {e}")
+            return False
+
+    def is_connection_error(self, error: BaseException) -> bool:
+        # psycopg2 的 OperationalError 还包括语句超时、事务冲突等服务端错误，这些错误带有 SQLSTATE
+        if isinstance(error, psycopg2.InterfaceError):
+            return True
+        if isinstance(error, psycopg2.OperationalError) and not error.pgcode:
+            return True
+        if type(error).__module__.startswith("asyncpg") and type(error).__name__ in (
+            "ConnectionDoesNotExistError", "CannotConnectNowError", "ConnectionFailureError"
+        ):
+            return True
+        return super().is_connection_error(error)
+
+    def execute_scalar(self, connection, sql_query: str) -> Any:
+        """使用服务端游标最多读取 QUERY_MAX_ROWS + 1 行，关闭游标即丢弃剩余结果"""
+        if settings.QUERY_RESULT_GUARD == "off" or not _CURSOR_QUERY_PATTERN.match(sql_query):
+            with connection.cursor() as cursor:
+                cursor.execute(sql_query)
+                result = cursor.fetchone()
+                return result[0] if result and len(result) > 0 else None
+
+        max_rows = settings.QUERY_MAX_ROWS
+        with connection.cursor(name="dq_guarded_fetch") as cursor:
+            cursor.itersize = max_rows + 1
+            cursor.execute(sql_query)
+            rows = cursor.fetchmany(max_rows + 1)
+            column_count = len(cursor.description) if cursor.description else None
+        return first_value(sql_query, rows, column_count, max_rows)
+
+    def fetch_row(self, connection, sql_query: str) -> Optional[tuple]:
+        with connection.cursor() as cursor:
+            cursor.execute(sql_query)
+            return cursor.fetchone()
+
+    def fetch_rows(self, connection, sql_query: str, max_rows: int) -> List[tuple]:
+        if not _CURSOR_QUERY_PATTERN.match(sql_query):
+            with connection.cursor() as cursor:
+                cursor.execute(sql_query)
+                rows = cursor.fetchmany(max_rows + 1)
+            return limit_rows(sql_query, rows, max_rows)
+
+        with connection.cursor(name="dq_grouped_fetch") as cursor:
+            cursor.itersize = min(max_rows + 1, 10000)
+            cursor.execute(sql_query)
+            rows = cursor.fetchmany(max_rows + 1)
+        return limit_rows(sql_query, rows, max_rows)
+
+    def cancel(self, connection):
+        connection.cancel()
+
+    def list_tables(self, connection) -> Dict[str, Any]:
+        """PostgreSQL 不记录DDL时间，用 pg_class 行的 xmin 作为标记：ALTER TABLE 会更新这一行"""
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT n.nspname, c.relname, c.xmin::text FROM pg_class c "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE c.relkind IN ('r', 'v', 'm', 'f', 'p') "
+                    "AND n.nspname NOT IN ('pg_catalog', 'information_schema') "
+                    "AND n.nspname NOT LIKE 'pg_toast%'"
+                )
+                return {self._table_name(schema, table): stamp for schema, table, stamp in cursor.fetchall()}
+        finally:
+            connection.rollback()
+
+    def describe_tables(self, connection, table_names: List[str]) -> Dict[str, List[str]]:
+        columns: Dict[str, List[str]] = {name: [] for name in table_names}
+        schemas, tables = [], []
+        for name in table_names:
+            schema, _, table = name.rpartition(".")
+            schemas.append(schema or "public")
+            tables.append(table)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT n.nspname, c.relname, a.attname FROM pg_attribute a "
+                    "JOIN pg_class c ON c.oid = a.attrelid "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE (n.nspname, c.relname) IN (SELECT * FROM unnest(%s::text[], %s::text[])) "
+                    "AND a.attnum > 0 AND NOT a.attisdropped "
+                    "ORDER BY n.nspname, c.relname, a.attnum",
+                    (schemas, tables)
+                )
+                for schema, table, column in cursor.fetchall():
+                    columns[self._table_name(schema, table)].append(column)
+        finally:
+            connection.rollback()
+        return columns
+
+    @staticmethod
+    def _table_name(schema: str, table: str) -> str:
+        return table if schema == "public" else f"{schema}.{table}"
+
+    async def create_async_pool(self, config, max_size: int):
+        import asyncpg
+        return await asyncpg.create_pool(
+            host=config.host,
+            port=config.port,
+            user=config.username,
+            password=config.password,
+            database=config.database,
+            min_size=0,
+            max_size=max_size,
+            max_inactive_connection_lifetime=settings.CONNECTION_POOL_IDLE_TIMEOUT,
+            timeout=settings.DATA_SOURCE_CONNECT_TIMEOUT
+        )
+
+    async def execute_scalar_async(self, connection, sql_query: str) -> Any:
+        if settings.QUERY_RESULT_GUARD == "off" or not _CURSOR_QUERY_PATTERN.match(sql_query):
+            result = await connection.fetchrow(sql_query)
+            return result[0] if result and len(result) > 0 else None
+
+        max_rows = settings.QUERY_MAX_ROWS
+        async with connection.transaction():
+            cursor = await connection.cursor(sql_query)
+            rows = await cursor.fetch(max_rows + 1)
+        column_count = len(rows[0]) if rows else None
+        return first_value(sql_query, rows, column_count, max_rows)
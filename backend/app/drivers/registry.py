@@ -0,0 +1,73 @@
+import importlib
+import logging
+import threading
+from typing import Dict, Union
+
+from app.models.models import DataSourceType
+from .base import BaseDriver
+
+logger = logging.getLogger(__name__)
+
+# 驱动类的导入路径，驱动模块(及其依赖的数据库客户端库)在第一次使用时才导入
+_DRIVER_PATHS: Dict[DataSourceType, str] = {
+    DataSourceType.MYSQL: "app.drivers.mysql:MySQLDriver",
+    DataSourceType.POSTGRESQL: "app.drivers.postgresql:PostgreSQLDriver",
+    DataSourceType.CLICKHOUSE: "app.drivers.clickhouse:ClickHouseDriver",
+    DataSourceType.STARROCKS: "app.drivers.starrocks:StarRocksDriver",
+}
+
+_drivers: Dict[DataSourceType, BaseDriver] = {}
+_lock = threading.Lock()
+
+
+class UnsupportedDataSourceError(ValueError):
+    """没有为该数据源类型注册驱动"""
+
+
+def _normalize_type(data_source_type) -> DataSourceType:
+    value = getattr(data_source_type, "value", data_source_type)
+    try:
+        return DataSourceType(value)
+    except ValueError:
+        raise UnsupportedDataSourceError(f"Unsupported data source type: {value}")
+
+
+def register_driver(data_source_type: Union[DataSourceType, str], driver: Union[str, BaseDriver]):
+    """注册驱动
+
+    Args:
+        data_source_type: 数据源类型
+        driver: 驱动实例，或 "module.path:ClassName" 形式的导入路径(延迟导入)
+    """
+    key = _normalize_type(data_source_type)
+    with _lock:
+        _drivers.pop(key, None)
+        if isinstance(driver, BaseDriver):
+            _drivers[key] = driver
+        else:
+            _DRIVER_PATHS[key] = driver
+
+
+def get_driver(data_source_type: Union[DataSourceType, str]) -> BaseDriver:
+    """获取数据源类型对应的驱动，第一次调用时导入驱动模块"""
+    key = _normalize_type(data_source_type)
+    driver = _drivers.get(key)
+    if driver is not None:
+        return driver
+
+    with _lock:
+        driver = _drivers.get(key)
+        if driver is None:
+            path = _DRIVER_PATHS.get(key)
+            if path is None:
+                raise UnsupportedDataSourceError(f"Unsupported data source type: {key.value}")
+            module_name, class_name = path.split(":")
+            driver = getattr(importlib.import_module(module_name), class_name)()
+            _drivers[key] = driver
+            logger.info(f"Loaded {key.value} driver from {module_name}")
+    return driver
+
+
+def loaded_drivers() -> Dict[str, str]:
+    """已加载的驱动"""
+    return {key.value: type(driver).__name__ for key, driver in _drivers.items()}
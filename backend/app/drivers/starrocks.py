@@ -0,0 +1,7 @@
+from .mysql import MySQLDriver
+
+
+class StarRocksDriver(MySQLDriver):
+    """StarRocks 驱动，StarRocks uses MySQL protocol"""
+
+    name = "starrocks"
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, String, Date, DateTime, Text, ForeignKey, Enum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -44,6 +44,7 @@ class DataSource(Base):
     password = Column(String(255), nullable=False)
     description = Column(Text)
     is_active = Column(Boolean, default=True)
+    result_cache_ttl = Column(Integer)  # 期望SQL结果缓存秒数，为空时使用全局默认值
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -86,11 +87,22 @@ class InspectionTask(Base):
     expected_sql = Column(Text, nullable=False)
     check_expression = Column(Text, nullable=False)
     cron_schedule = Column(String(100), nullable=False)
+    expected_cache_ttl = Column(Integer)  # 期望SQL结果缓存秒数，为空时使用数据源配置
+    check_mode = Column(String(20), default="scalar", server_default="scalar")  # scalar: 单值检查; grouped: 按分组键逐组比较
+    spread_window_seconds = Column(Integer, default=0, server_default="0")  # 分散窗口，触发时间按任务ID哈希在窗口内固定顺延
+    max_retries = Column(Integer)  # 瞬时错误的重试次数，为空时使用 RETRY_MAX_RETRIES
+    retry_backoff_seconds = Column(Integer)  # 第一次重试的延迟秒数，之后每次翻倍，为空时使用 RETRY_BACKOFF_SECONDS
+    priority = Column(String(20), default="normal", server_default="normal")  # critical/high/normal/low，积压时先执行优先级高的任务
     data_source_id = Column(Integer, ForeignKey("data_sources.id"), nullable=False)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     status = Column(String(20), default="active")
     last_run_at = Column(DateTime(timezone=True))
+    # SCHEDULER_TYPE=database 时的调度状态：下一次到期时间、计算它所用的 cron|偏移秒数、执行中的租约
+    next_run_at = Column(DateTime(timezone=True), index=True)
+    schedule_signature = Column(String(150))
+    lease_owner = Column(String(150))
+    lease_expires_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -108,5 +120,75 @@ class InspectionResult(Base):
     check_passed = Column(Boolean, nullable=False)
     execution_time = Column(DateTime(timezone=True), server_default=func.now())
     error_message = Column(Text)
+    check_duration_ms = Column(Integer)
+    expected_duration_ms = Column(Integer)
+    duration_ms = Column(Integer)
+    group_summary = Column(Text)  # 多行检查的分组统计和失败分组(JSON)
+    window_start = Column(DateTime(timezone=True), index=True)  # SQL带时间窗口参数时本次执行的窗口起始时间
+    backfill_id = Column(Integer, ForeignKey("backfill_runs.id"), index=True)
     
-    task = relationship("InspectionTask")
\ No newline at end of file
+    task = relationship("InspectionTask")
+
+
+class TaskDependency(Base):
+    """任务的前置依赖：上游任务(upstream_task_id)或外部就绪信号(signal_name)，两者取其一"""
+    __tablename__ = "task_dependencies"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("inspection_tasks.id"), nullable=False, index=True)
+    upstream_task_id = Column(Integer, ForeignKey("inspection_tasks.id"), index=True)
+    signal_name = Column(String(200), index=True)
+    # 最近一次由DAG触发下游时消费的上游完成时间/信号时间，上游产生更新的时间后依赖才再次满足
+    consumed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    task = relationship("InspectionTask", foreign_keys=[task_id])
+    upstream_task = relationship("InspectionTask", foreign_keys=[upstream_task_id])
+
+class DependencySignal(Base):
+    """外部系统(如ETL)通过API上报的就绪信号，记录最近一次就绪时间"""
+    __tablename__ = "dependency_signals"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), unique=True, index=True, nullable=False)
+    signaled_at = Column(DateTime(timezone=True), nullable=False)
+    signal_count = Column(Integer, default=0, server_default="0")
+
+class BackfillRun(Base):
+    """一次历史回填：任务按天展开到 [start_date, end_date]，每天一个窗口、一条执行结果"""
+    __tablename__ = "backfill_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("inspection_tasks.id"), nullable=False, index=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    # pending: 等待执行; running: 执行中; completed: 全部窗口已执行; failed: 有窗口执行出错; cancelled: 已取消
+    status = Column(String(20), default="pending", server_default="pending", index=True)
+    max_parallel = Column(Integer)
+    total_windows = Column(Integer, nullable=False)
+    passed_windows = Column(Integer, default=0, server_default="0")
+    failed_windows = Column(Integer, default=0, server_default="0")
+    error_windows = Column(Integer, default=0, server_default="0")
+    lease_owner = Column(String(150))
+    lease_expires_at = Column(DateTime(timezone=True))
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    
+    task = relationship("InspectionTask")
+
+class DeadLetter(Base):
+    """重试次数用尽后仍因瞬时错误失败的执行，处理(重新执行或忽略)后标记 resolved_at"""
+    __tablename__ = "dead_letters"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("inspection_tasks.id"), nullable=False, index=True)
+    result_id = Column(Integer, ForeignKey("inspection_results.id"))
+    attempts = Column(Integer, nullable=False)
+    error_message = Column(Text)
+    window_start = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    resolved_at = Column(DateTime(timezone=True), index=True)
+    
+    task = relationship("InspectionTask")
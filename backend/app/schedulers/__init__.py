@@ -1,10 +1,16 @@
 from .base import BaseScheduler
 from .background_scheduler import BackgroundScheduler
+from .redis_scheduler import RedisScheduler
+from .native_scheduler import NativeScheduler
+from .database_scheduler import DatabaseScheduler
 from .factory import create_scheduler, SchedulerType
 
 __all__ = [
     "BaseScheduler",
     "BackgroundScheduler", 
+    "RedisScheduler",
+    "NativeScheduler",
+    "DatabaseScheduler",
     "create_scheduler",
     "SchedulerType"
 ]
\ No newline at end of file
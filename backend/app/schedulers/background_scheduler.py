@@ -1,13 +1,33 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from logging import getLogger
+from datetime import datetime, timedelta
+import threading
+import time
+from concurrent import futures
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.background import BackgroundScheduler as APScheduler
-from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.orm import sessionmaker
 
+from app.core.config import settings
 from .base import BaseScheduler
+from .batcher import TickBatcher
+from .triggers import spread_offset
 
 logger = getLogger(__name__)
 
+# 持久化的作业只能引用模块级函数，执行时转交给当前运行的调度器实例
+_active_scheduler: Optional["BackgroundScheduler"] = None
+
+
+def run_scheduled_task(task_id: int):
+    """APScheduler作业入口"""
+    scheduler = _active_scheduler
+    if scheduler is None:
+        logger.warning(f"No running scheduler, skipping task {task_id}")
+        return
+    scheduler._execute_task(task_id)
+
 
 class BackgroundScheduler(BaseScheduler):
     """基于APScheduler BackgroundScheduler的实现"""
@@ -15,31 +35,82 @@ class BackgroundScheduler(BaseScheduler):
     def __init__(self, db_session_factory: sessionmaker, config: Optional[Dict[str, Any]] = None):
         super().__init__(config)
         self.db_session_factory = db_session_factory
+        
+        # database模式下作业和下一次触发时间保存在元数据库中，重启后按补跑策略处理错过的触发
+        jobstores = {}
+        self.persistent = self.config.get('job_store', settings.SCHEDULER_JOB_STORE) == 'database'
+        if self.persistent:
+            from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+            engine = getattr(db_session_factory, 'kw', {}).get('bind')
+            if engine is not None:
+                jobstores['default'] = SQLAlchemyJobStore(engine=engine, tablename='apscheduler_jobs')
+            else:
+                jobstores['default'] = SQLAlchemyJobStore(url=settings.DATABASE_URL, tablename='apscheduler_jobs')
+        self.catch_up_policy = self.config.get('catch_up_policy', settings.SCHEDULER_CATCHUP_POLICY)
+        self._catch_up_report: Optional[Dict[str, Any]] = None
+        self._catch_up_stop = threading.Event()
+        self._catch_up_thread: Optional[threading.Thread] = None
+        
+        # process模式下调度线程只等待工作进程返回，线程数与工作进程数一致
         self.scheduler = APScheduler(
             timezone='Asia/Shanghai',
+            jobstores=jobstores,
+            executors={
+                'default': ThreadPoolExecutor(self.config.get('max_workers') or settings.MAX_WORKERS)
+            },
             job_defaults={
-                'coalesce': True,  # 错过的执行合并为一次
-                'max_instances': 3,  # 最大并发实例数
-                'misfire_grace_time': 3600  # 错过执行的最大宽容时间(秒)
+                'coalesce': self.config.get('coalesce', settings.SCHEDULER_COALESCE),  # 错过的执行合并为一次
+                'max_instances': self.config.get('max_instances', settings.SCHEDULER_MAX_INSTANCES),  # 最大并发实例数
+                'misfire_grace_time': self.config.get('misfire_grace_time', settings.SCHEDULER_MISFIRE_GRACE_TIME)  # 错过执行的最大宽容时间(秒)
             }
         )
         self._task_service = None
         
+        # 同一时刻触发的任务按数据源合并执行
+        self._batcher = None
+        if settings.SCHEDULER_BATCH_WINDOW_MS > 0:
+            self._batcher = TickBatcher(self._dispatch_batch, settings.SCHEDULER_BATCH_WINDOW_MS / 1000)
+        
     def start(self):
         """启动调度器"""
+        global _active_scheduler
         if not self.is_running:
-            self.scheduler.start()
+            _active_scheduler = self
+            # 重试、依赖触发等不由Cron触发的执行使用单独的线程池
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=self.config.get('max_workers') or settings.MAX_WORKERS, thread_name_prefix="background-scheduler"
+            )
+            if self.persistent:
+                # 暂停状态下启动，先处理停机期间错过的触发再恢复调度
+                self.scheduler.start(paused=True)
+                self._catch_up()
+                self.scheduler.resume()
+            else:
+                self.scheduler.start()
             self.is_running = True
             logger.info("Background scheduler started successfully")
             
     def shutdown(self):
         """关闭调度器"""
+        global _active_scheduler
         if self.is_running:
+            self._catch_up_stop.set()
+            if self._catch_up_thread:
+                self._catch_up_thread.join(timeout=30)
             self.scheduler.shutdown(wait=True)
+            if _active_scheduler is self:
+                _active_scheduler = None
+            if self._batcher:
+                self._batcher.flush()
+            self._executor.shutdown(wait=True)
+            self._shutdown_executors()
+            if settings.INSPECTION_ENGINE == "asyncio":
+                from app.services.async_engine import async_engine
+                async_engine.shutdown()
             self.is_running = False
             logger.info("Background scheduler shutdown successfully")
             
-    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None):
+    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None, spread_window_seconds: int = 0):
         """添加定时任务"""
         try:
             if not self.validate_cron(cron_schedule):
@@ -49,21 +120,21 @@ class BackgroundScheduler(BaseScheduler):
             if self.scheduler.get_job(f"task_{task_id}"):
                 self.remove_task(task_id)
                 
-            # 解析Cron表达式
-            trigger = self._parse_cron_trigger(cron_schedule)
+            # 解析Cron表达式，配置了分散窗口时按任务ID固定顺延
+            offset_seconds = spread_offset(task_id, spread_window_seconds)
+            trigger = self._parse_cron_trigger(cron_schedule, offset_seconds)
             
             # 添加任务
             self.scheduler.add_job(
-                self._execute_task,
+                run_scheduled_task,
                 trigger=trigger,
                 args=[task_id],
                 id=f"task_{task_id}",
                 name=task_name or f"Task {task_id}",
-                replace_existing=True,
-                misfire_grace_time=3600
+                replace_existing=True
             )
             
-            logger.info(f"Added task {task_id} with schedule: {cron_schedule}")
+            logger.info(f"Added task {task_id} with schedule: {cron_schedule} (offset {offset_seconds}s)")
             
         except Exception as e:
             logger.error(f"Failed to add task {task_id}: {e}")
@@ -132,55 +203,147 @@ class BackgroundScheduler(BaseScheduler):
             logger.error(f"Failed to list tasks: {e}")
             return {}
             
-    def _parse_cron_trigger(self, cron_schedule: str) -> CronTrigger:
-        """解析Cron表达式并创建触发器
-        
-        Args:
-            cron_schedule: Cron表达式，格式: 分 时 日 月 周
+    def task_fingerprints(self) -> Dict[int, Tuple[str, str]]:
+        """现有任务的触发器描述和名称"""
+        return {
+            int(job.id.replace('task_', '')): (str(job.trigger), job.name)
+            for job in self.scheduler.get_jobs()
+            if job.id.startswith('task_')
+        }
             
-        Returns:
-            CronTrigger对象
-        """
-        try:
-            parts = cron_schedule.strip().split()
-            if len(parts) != 5:
-                raise ValueError(f"Cron schedule must have 5 parts: {cron_schedule}")
+    def _apply_reconcile(self, adds: List[Tuple[int, str, str, int]], renames: List[Tuple[int, str, str, int]], removes: List[int]):
+        """批量应用同步结果，不逐个查询和记录日志"""
+        for task_id in removes:
+            try:
+                self.scheduler.remove_job(f"task_{task_id}")
+            except JobLookupError:
+                pass
                 
-            minute, hour, day, month, day_of_week = parts
-            
-            # 转换特殊字符
-            def _convert_cron_field(field, field_name):
-                if field == '*':
-                    # 对于APScheduler，'*'表示所有值，而不是None
-                    return '*'
-                return field
+        for task_id, cron_schedule, name, spread in adds:
+            try:
+                trigger = self._parse_cron_trigger(cron_schedule, spread_offset(task_id, spread))
+                self.scheduler.add_job(
+                    run_scheduled_task,
+                    trigger=trigger,
+                    args=[task_id],
+                    id=f"task_{task_id}",
+                    name=name,
+                    replace_existing=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to add task {task_id}: {e}")
                 
-            return CronTrigger(
-                minute=_convert_cron_field(minute, 'minute'),
-                hour=_convert_cron_field(hour, 'hour'),
-                day=_convert_cron_field(day, 'day'),
-                month=_convert_cron_field(month, 'month'),
-                day_of_week=_convert_cron_field(day_of_week, 'day_of_week')
+        # 只改名不影响下一次触发时间
+        for task_id, _, name, _ in renames:
+            try:
+                self.scheduler.modify_job(f"task_{task_id}", name=name)
+            except JobLookupError:
+                pass
+            
+    def get_catch_up_report(self) -> Optional[Dict[str, Any]]:
+        """最近一次启动时补跑错过触发的情况"""
+        return self._catch_up_report
+            
+    def _catch_up(self):
+        """按补跑策略处理停机期间错过的触发
+        
+        - skip: 不补跑，只记录错过的触发
+        - run_once: 每个错过触发的任务补跑一次
+        - run_all: 每次错过的触发都补跑，每个任务最多 catch_up_max_runs 次
+        
+        所有作业的下一次触发时间先推进到当前时间之后，补跑按 catch_up_rate 限速在后台执行。
+        """
+        max_runs = self.config.get('catch_up_max_runs', settings.SCHEDULER_CATCHUP_MAX_RUNS)
+        now = datetime.now(self.scheduler.timezone)
+        active_ids = self._active_task_ids()
+        
+        missed_tasks = []
+        runs = []
+        for job in self.scheduler.get_jobs():
+            if not job.id.startswith('task_') or job.next_run_time is None or job.next_run_time > now:
+                continue
+            task_id = int(job.id.replace('task_', ''))
+            
+            # 最多统计 max_runs + 1 次，停机很久时不逐一枚举所有错过的触发
+            missed = []
+            fire_time = job.next_run_time
+            while fire_time is not None and fire_time <= now and len(missed) <= max_runs:
+                missed.append(fire_time)
+                fire_time = job.trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+            job.modify(next_run_time=job.trigger.get_next_fire_time(None, now))
+            
+            if task_id not in active_ids:
+                continue
+            truncated = len(missed) > max_runs
+            missed = missed[:max_runs]
+            if self.catch_up_policy == 'run_all':
+                runs.extend((fire_time, task_id) for fire_time in missed)
+            elif self.catch_up_policy == 'run_once':
+                runs.append((missed[-1], task_id))
+            missed_tasks.append({
+                'task_id': task_id,
+                'missed_runs': f"{max_runs}+" if truncated else len(missed),
+                'first_missed': missed[0].astimezone(self.scheduler.timezone).isoformat(),
+                'last_missed': missed[-1].astimezone(self.scheduler.timezone).isoformat(),
+            })
+            logger.warning(
+                f"Task {task_id} missed {missed_tasks[-1]['missed_runs']} run(s) since {missed[0]}, "
+                f"catch-up policy: {self.catch_up_policy}"
             )
             
-        except Exception as e:
-            logger.error(f"Failed to parse cron schedule '{cron_schedule}': {e}")
-            raise ValueError(f"Invalid cron schedule: {cron_schedule}")
+        # 多个任务的补跑按错过的时间先后交错执行
+        runs.sort()
+        self._catch_up_report = {
+            'policy': self.catch_up_policy,
+            'checked_at': now.isoformat(),
+            'tasks_missed': len(missed_tasks),
+            'runs_scheduled': len(runs),
+            'runs_completed': 0,
+            'tasks': missed_tasks,
+        }
+        logger.info(f"Catch-up: {len(missed_tasks)} tasks missed runs, {len(runs)} runs scheduled ({self.catch_up_policy})")
+        if runs:
+            self._catch_up_stop.clear()
+            self._catch_up_thread = threading.Thread(
+                target=self._run_catch_up, args=([task_id for _, task_id in runs],),
+                name="scheduler-catch-up", daemon=True
+            )
+            self._catch_up_thread.start()
+            
+    def _run_catch_up(self, task_ids: List[int]):
+        rate = self.config.get('catch_up_rate') or settings.SCHEDULER_CATCHUP_RATE
+        started = time.monotonic()
+        for index, task_id in enumerate(task_ids):
+            if self._catch_up_stop.wait(max(started + index / rate - time.monotonic(), 0)):
+                logger.info(f"Catch-up stopped after {index}/{len(task_ids)} runs")
+                return
+            try:
+                self._execute_task(task_id)
+            except Exception as e:
+                logger.error(f"Catch-up run of task {task_id} failed: {e}")
+            self._catch_up_report['runs_completed'] += 1
+        logger.info(f"Catch-up completed: {len(task_ids)} runs")
+            
+    def _active_task_ids(self) -> set:
+        db = self.db_session_factory()
+        try:
+            from app.models.models import InspectionTask
+            rows = db.query(InspectionTask.id).filter(InspectionTask.status == 'active').all()
+            return {row[0] for row in rows}
+        finally:
+            db.close()
             
     def _execute_task(self, task_id: int):
         """执行任务的核心逻辑"""
         logger.info(f"Executing task {task_id} via scheduler")
         
-        db = self.db_session_factory()
-        try:
-            # 动态导入任务服务，避免循环依赖
-            from app.services.services import InspectionTaskService
-            task_service = InspectionTaskService(db)
-            result = task_service.execute_task(task_id)
-            logger.info(f"Task {task_id} executed successfully: {result.check_passed}")
-            
-        except Exception as e:
-            logger.error(f"Failed to execute task {task_id}: {e}")
-            # 可以在这里添加错误处理逻辑，如重试、告警等
-        finally:
-            db.close()
\ No newline at end of file
+        if self._batcher:
+            self._batcher.submit(task_id)
+            return
+        
+        if settings.INSPECTION_ENGINE == "asyncio" or self.dispatcher is not None:
+            # 交给异步引擎或进入数据源队列后立即返回，不占用调度器线程等待查询返回
+            self.submit_execution(task_id)
+            return
+        
+        self._run_task(task_id)
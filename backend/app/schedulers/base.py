@@ -1,16 +1,58 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 import logging
+import threading
+import time
+
+from apscheduler.triggers.cron import CronTrigger
+
+from app.core.config import settings
+from .dispatcher import DispatchQueueFullError, create_dispatcher, priority_level
+from .executors import RetryRequest, TaskTimeoutError, create_process_pool
+from .triggers import parse_cron_trigger, spread_offset
 
 logger = logging.getLogger(__name__)
 
 
+def _when_all(futures: List[Future]) -> Future:
+    """所有 futures 结束时完成的 Future"""
+    combined = Future()
+    combined.set_running_or_notify_cancel()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+    
+    def _done(_):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            combined.set_result(None)
+    
+    if not futures:
+        combined.set_result(None)
+    for future in futures:
+        future.add_done_callback(_done)
+    return combined
+
+
 class BaseScheduler(ABC):
     """调度器基础抽象类"""
     
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or {}
         self.is_running = False
+        # executor=process 时任务在独立的工作进程中执行，否则在调度线程中直接执行
+        self.process_pool = create_process_pool(self.config)
+        # fair_dispatch 开启时触发的任务先进入所属数据源的队列，按优先级和数据源轮转执行
+        self.dispatcher = create_dispatcher(self.config, self._run_task, self._task_dispatch_info)
+        # 执行触发的任务的线程池，由子类在启动时创建
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 每个任务正在执行的实例数，调度器自己派发执行时用于限制 max_instances
+        self.max_instances = self.config.get('max_instances', settings.SCHEDULER_MAX_INSTANCES)
+        self._running: Dict[int, int] = {}
+        self._running_lock = threading.Lock()
         
     @abstractmethod
     def start(self):
@@ -23,13 +65,14 @@ class BaseScheduler(ABC):
         pass
         
     @abstractmethod
-    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None):
+    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None, spread_window_seconds: int = 0):
         """添加定时任务
         
         Args:
             task_id: 任务ID
             cron_schedule: Cron表达式，格式: 分 时 日 月 周
             task_name: 任务名称 (可选)
+            spread_window_seconds: 分散窗口(秒)，触发时间按任务ID哈希在窗口内固定顺延，0表示不顺延
         """
         pass
         
@@ -63,6 +106,94 @@ class BaseScheduler(ABC):
         """
         pass
         
+    @abstractmethod
+    def task_fingerprints(self) -> Dict[int, Tuple[str, str]]:
+        """调度器中现有任务的指纹 {任务ID: (触发器描述, 任务名称)}，用于和数据库比较，见 reconcile"""
+        pass
+        
+    def reconcile(self, tasks: Iterable[Any]) -> Dict[str, Any]:
+        """按数据库中的活跃任务增量同步调度器
+        
+        只新增缺少的任务、移除多余的任务、重建触发器变化的任务，名称变化只改名，
+        其余任务保持原有的下一次触发时间不变。
+        
+        比较的是调度器中实际生效的触发器和名称(task_fingerprints)，而不是数据库的
+        updated_at：updated_at 只在通过ORM修改时更新，且SQL、描述等与调度无关的修改
+        也会改变它，会让触发器不变的任务被重建、丢掉当前排期；调度器一侧的状态还可能
+        因为持久化作业存储恢复、Redis数据丢失或其他副本的修改而与数据库不一致，只有
+        比较实际状态才能发现并修正。触发器描述按 (cron, 偏移) 缓存，2万个任务的
+        无变化同步约0.3-0.6秒。
+        
+        Args:
+            tasks: 活跃任务，需要有 id、cron_schedule、name、spread_window_seconds 属性
+            
+        Returns:
+            各类变更的数量
+        """
+        current = self.task_fingerprints()
+        trigger_texts: Dict[Tuple[str, int], str] = {}
+        desired: Dict[int, Tuple[str, str]] = {}
+        definitions: Dict[int, Tuple[str, str, int]] = {}
+        failed: List[int] = []
+        
+        for task in tasks:
+            if not task.cron_schedule:
+                continue
+            spread = task.spread_window_seconds or 0
+            key = (task.cron_schedule, spread_offset(task.id, spread))
+            try:
+                if key not in trigger_texts:
+                    if not self.validate_cron(task.cron_schedule):
+                        raise ValueError(f"Invalid cron schedule: {task.cron_schedule}")
+                    trigger_texts[key] = str(self._parse_cron_trigger(*key))
+            except ValueError as e:
+                logger.error(f"Skipping task {task.id} during reconcile: {e}")
+                failed.append(task.id)
+                continue
+            name = task.name or f"Task {task.id}"
+            desired[task.id] = (trigger_texts[key], name)
+            definitions[task.id] = (task.cron_schedule, name, spread)
+            
+        removes = [task_id for task_id in current if task_id not in desired]
+        adds = []
+        renames = []
+        for task_id, fingerprint in desired.items():
+            existing = current.get(task_id)
+            if existing is None or existing[0] != fingerprint[0]:
+                adds.append((task_id,) + definitions[task_id])
+            elif existing[1] != fingerprint[1]:
+                renames.append((task_id,) + definitions[task_id])
+                
+        self._apply_reconcile(adds, renames, removes)
+        
+        summary = {
+            'added': sum(1 for task_id, *_ in adds if task_id not in current),
+            'updated': sum(1 for task_id, *_ in adds if task_id in current),
+            'renamed': len(renames),
+            'removed': len(removes),
+            'unchanged': len(desired) - len(adds) - len(renames),
+            'failed': failed,
+        }
+        logger.info(
+            f"Scheduler reconciled: {summary['added']} added, {summary['updated']} updated, "
+            f"{summary['renamed']} renamed, {summary['removed']} removed, {summary['unchanged']} unchanged, "
+            f"{len(failed)} failed"
+        )
+        return summary
+        
+    def _apply_reconcile(self, adds: List[Tuple[int, str, str, int]], renames: List[Tuple[int, str, str, int]], removes: List[int]):
+        """应用同步结果，子类可以覆盖为批量操作
+        
+        Args:
+            adds: 需要新增或重建触发器的任务 (任务ID, Cron表达式, 名称, 分散窗口)
+            renames: 触发器不变、只有名称变化的任务，格式同 adds
+            removes: 需要移除的任务ID
+        """
+        for task_id in removes:
+            self.remove_task(task_id)
+        for task_id, cron_schedule, name, spread in adds + renames:
+            self.add_task(task_id, cron_schedule, name, spread)
+        
     def is_task_running(self, task_id: int) -> bool:
         """检查任务是否正在运行"""
         try:
@@ -92,4 +223,223 @@ class BaseScheduler(ABC):
                     
             return True
         except Exception:
-            return False
\ No newline at end of file
+            return False
+            
+    def _parse_cron_trigger(self, cron_schedule: str, offset_seconds: int = 0) -> CronTrigger:
+        """解析Cron表达式并创建触发器
+        
+        Args:
+            cron_schedule: Cron表达式，格式: 分 时 日 月 周
+            offset_seconds: 在每次触发时间上顺延的秒数
+            
+        Returns:
+            CronTrigger对象
+        """
+        return parse_cron_trigger(cron_schedule, offset_seconds)
+            
+    def submit_execution(self, task_id: int, window=None, attempt: int = 1, backfill_id: Optional[int] = None) -> Future:
+        """提交一次任务执行，立即返回执行结束时完成的 Future
+        
+        定时触发、到期的重试、依赖触发和回填窗口都从这里执行：异步引擎开启时交给异步引擎，
+        开启公平派发时进入所属数据源的队列，否则在调度器线程池中执行；process 模式下
+        执行发生在工作进程中，受 TASK_TIMEOUT 约束。
+        
+        Args:
+            task_id: 任务ID
+            window: SQL时间窗口参数对应的窗口，不指定时使用默认窗口
+            attempt: 本次是第几次执行
+            backfill_id: 所属回填
+            
+        Raises:
+            RuntimeError: 调度器已关闭
+        """
+        if settings.INSPECTION_ENGINE == "asyncio":
+            from app.services.async_engine import async_engine
+            return async_engine.submit(task_id, window, attempt, backfill_id)
+            
+        run = None
+        if window is not None or attempt != 1 or backfill_id is not None:
+            run = partial(self._run_task, task_id, window, attempt, backfill_id)
+        if self.dispatcher is not None:
+            # 默认参数的执行与排队中的同一任务合并为一次
+            future = self.dispatcher.submit(task_id, run=run)
+            if run is None:
+                future.add_done_callback(partial(self._record_rejected, task_id))
+            return future
+        if self._executor is None:
+            raise RuntimeError("Scheduler is not running")
+        return self._executor.submit(run or partial(self._run_task, task_id))
+            
+    def submit_batch(self, task_ids: List[int]) -> Future:
+        """提交同一时刻触发或同时就绪的一组任务，返回全部执行结束时完成的 Future，见 _submit_groups
+        
+        Raises:
+            RuntimeError: 调度器已关闭
+        """
+        return _when_all([future for _, future in self._submit_groups(task_ids)])
+            
+    def _submit_groups(self, task_ids: List[int]) -> List[Tuple[List[int], Future]]:
+        """按数据源分组提交，每组在调度器线程池中合并执行，不同数据源并行；返回 [(任务ID列表, Future)]
+        
+        异步引擎、公平派发或 process 模式下合并执行会绕过它们的并发上限和超时，改为逐个经
+        submit_execution 执行。
+        """
+        if len(task_ids) == 1 or settings.INSPECTION_ENGINE == "asyncio" or self.dispatcher is not None or self.process_pool is not None:
+            return [([task_id], self.submit_execution(task_id)) for task_id in task_ids]
+        if self._executor is None:
+            raise RuntimeError("Scheduler is not running")
+        return [(group, self._executor.submit(self._execute_batch, group)) for group in self._group_by_data_source(task_ids)]
+            
+    def _dispatch_batch(self, task_ids: List[int]):
+        """合并执行同一时刻触发的任务，已达到 max_instances 的任务本次跳过"""
+        task_ids = self._acquire_instances(task_ids)
+        if not task_ids:
+            return
+        try:
+            groups = self._submit_groups(task_ids)
+        except Exception as e:
+            logger.error(f"Failed to dispatch batch of {len(task_ids)} tasks: {e}")
+            self._release_instances(task_ids)
+            return
+        for group, future in groups:
+            future.add_done_callback(lambda _, group=group: self._release_instances(group))
+            
+    def _acquire_instances(self, task_ids: List[int]) -> List[int]:
+        """为每个任务占用一个执行实例，返回没有达到 max_instances 的任务"""
+        acquired = []
+        with self._running_lock:
+            for task_id in task_ids:
+                running = self._running.get(task_id, 0)
+                if running >= self.max_instances:
+                    logger.warning(f"Task {task_id} skipped: {running} instances already running")
+                    continue
+                self._running[task_id] = running + 1
+                acquired.append(task_id)
+        return acquired
+            
+    def _release_instances(self, task_ids: List[int]):
+        with self._running_lock:
+            for task_id in task_ids:
+                running = self._running.get(task_id, 0) - 1
+                if running > 0:
+                    self._running[task_id] = running
+                else:
+                    self._running.pop(task_id, None)
+            
+    def _group_by_data_source(self, task_ids: List[int]) -> List[List[int]]:
+        """按所属数据源分组，不存在的任务跳过"""
+        db = self.db_session_factory()
+        try:
+            from app.models.models import InspectionTask
+            rows = db.query(InspectionTask.id, InspectionTask.data_source_id).filter(InspectionTask.id.in_(task_ids)).all()
+        finally:
+            db.close()
+        groups: Dict[int, List[int]] = {}
+        for row in rows:
+            groups.setdefault(row.data_source_id, []).append(row.id)
+        if len(rows) < len(task_ids):
+            found = {row.id for row in rows}
+            logger.warning(f"Tasks not found, skipped from batch: {[task_id for task_id in task_ids if task_id not in found]}")
+        return list(groups.values())
+            
+    def _execute_batch(self, task_ids: List[int]):
+        """合并执行同一数据源的一组任务"""
+        db = self.db_session_factory()
+        try:
+            from app.services.batch_executor import BatchInspectionExecutor
+            results = BatchInspectionExecutor(db).execute_tasks(task_ids)
+            passed = sum(1 for result in results if result.check_passed)
+            logger.info(f"Batch of {len(task_ids)} tasks executed: {passed}/{len(results)} passed")
+        except Exception as e:
+            logger.error(f"Batch of {len(task_ids)} tasks failed: {e}")
+        finally:
+            db.close()
+            
+    def _run_task(self, task_id: int, window=None, attempt: int = 1, backfill_id: Optional[int] = None):
+        """同步执行一次巡检任务，需要子类提供 db_session_factory"""
+        if self.process_pool is not None:
+            self._run_task_in_process(task_id, window, attempt, backfill_id)
+            return
+            
+        db = self.db_session_factory()
+        try:
+            # 动态导入任务服务，避免循环依赖
+            from app.services.services import InspectionTaskService
+            task_service = InspectionTaskService(db)
+            result = task_service.execute_task(task_id, window=window, backfill_id=backfill_id, attempt=attempt)
+            if result is None:
+                logger.info(f"Task {task_id} hit a transient error, retry scheduled")
+            else:
+                logger.info(f"Task {task_id} executed successfully: {result.check_passed}")
+            
+        except Exception as e:
+            logger.error(f"Failed to execute task {task_id}: {e}")
+        finally:
+            db.close()
+            
+    def _run_task_in_process(self, task_id: int, window=None, attempt: int = 1, backfill_id: Optional[int] = None):
+        """在进程池中执行任务；超时的任务记录为一次执行失败，工作进程申请的重试放入本进程的重试队列"""
+        started = time.perf_counter()
+        try:
+            outcome = self.process_pool.run(task_id, window, attempt, backfill_id)
+            if isinstance(outcome, RetryRequest):
+                from app.services.retry import retry_queue
+                if retry_queue.schedule_relayed(task_id, *outcome):
+                    logger.info(f"Task {task_id} hit a transient error, retry scheduled")
+            else:
+                logger.info(f"Task {task_id} executed successfully: {outcome}")
+            
+        except TaskTimeoutError as e:
+            logger.error(str(e))
+            self._record_error(
+                task_id, str(e), int((time.perf_counter() - started) * 1000), e, window, attempt, backfill_id
+            )
+        except Exception as e:
+            logger.error(f"Failed to execute task {task_id}: {e}")
+            
+    def _record_rejected(self, task_id: int, future: Future):
+        """触发因数据源的派发队列已满被拒绝，或排队时被更高优先级的触发挤出时记录一次失败结果；
+        带参数的执行(重试、回填)由提交方处理"""
+        if not future.cancelled() and isinstance(future.exception(), DispatchQueueFullError):
+            self._record_error(task_id, str(future.exception()), None, future.exception())
+            
+    def _record_error(self, task_id: int, error_message: str, duration_ms: Optional[int], error: Optional[BaseException] = None,
+                      window=None, attempt: int = 1, backfill_id: Optional[int] = None):
+        db = self.db_session_factory()
+        try:
+            from app.services.services import InspectionTaskService
+            task_service = InspectionTaskService(db)
+            task = task_service.get_task(task_id)
+            if task:
+                task_service.record_error(task, error_message, duration_ms, window, backfill_id, error, attempt)
+                
+        except Exception as e:
+            logger.error(f"Failed to record error for task {task_id}: {e}")
+        finally:
+            db.close()
+            
+    def _task_dispatch_info(self, task_id: int) -> Tuple[int, int]:
+        """查询任务所属的数据源ID和优先级"""
+        db = self.db_session_factory()
+        try:
+            from app.models.models import InspectionTask
+            row = db.query(InspectionTask.data_source_id, InspectionTask.priority).filter(InspectionTask.id == task_id).first()
+        finally:
+            db.close()
+        if row is None:
+            raise ValueError(f"Task {task_id} not found")
+        return row.data_source_id, priority_level(row.priority)
+            
+    def get_catch_up_report(self) -> Optional[Dict[str, Any]]:
+        """最近一次启动时补跑错过触发的情况，不支持补跑的调度器返回None"""
+        return None
+            
+    def get_dispatch_stats(self) -> Optional[Dict[str, Any]]:
+        """各数据源的排队深度、执行中数量和等待时间，未开启公平派发时返回None"""
+        return self.dispatcher.stats() if self.dispatcher is not None else None
+            
+    def _shutdown_executors(self):
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown(wait=True)
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
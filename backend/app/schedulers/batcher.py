@@ -0,0 +1,46 @@
+import threading
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class TickBatcher:
+    """收集同一调度时刻触发的任务，窗口结束后一次性交给批量执行回调
+
+    第一个任务到达时开始计时，window_seconds 内到达的任务归入同一批。
+    """
+
+    def __init__(self, flush_callback: Callable[[List[int]], None], window_seconds: float):
+        self.flush_callback = flush_callback
+        self.window_seconds = window_seconds
+        self._pending: List[int] = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def submit(self, task_id: int):
+        """加入当前批次"""
+        with self._lock:
+            if task_id not in self._pending:
+                self._pending.append(task_id)
+            if self._timer is None:
+                self._timer = threading.Timer(self.window_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """立即执行当前批次"""
+        with self._lock:
+            task_ids, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not task_ids:
+            return
+
+        logger.info(f"Flushing batch of {len(task_ids)} co-scheduled tasks")
+        try:
+            self.flush_callback(task_ids)
+        except Exception as e:
+            logger.error(f"Failed to execute task batch {task_ids}: {e}")
@@ -0,0 +1,353 @@
+import json
+import logging
+import socket
+import threading
+from datetime import date
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from .factory import EXECUTION_STATE_METHODS, ExecutionStateMixin
+
+logger = logging.getLogger(__name__)
+
+# 控制通道允许调用的调度器方法
+_SCHEDULER_METHODS = {
+    "add_task",
+    "remove_task",
+    "get_task_status",
+    "list_tasks",
+    "get_catch_up_report",
+    "get_dispatch_stats",
+}
+
+# 单个请求或响应的最大字节数
+_MAX_MESSAGE_BYTES = 1024 * 1024
+
+
+class SchedulerUnavailableError(RuntimeError):
+    """调度器进程未运行或控制通道无法连接"""
+
+
+def parse_control_address(address: str) -> Union[Tuple[str, int], str]:
+    """host:port 解析为TCP地址，其他值视为Unix socket路径"""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def control_authkey(settings) -> bytes:
+    """控制通道的认证密钥，未单独配置或仍为默认 SECRET_KEY 时拒绝启动"""
+    authkey = settings.SCHEDULER_CONTROL_AUTHKEY
+    if not authkey or authkey == type(settings).model_fields["SECRET_KEY"].default:
+        raise RuntimeError("SCHEDULER_CONTROL_AUTHKEY must be set to a dedicated secret in standalone mode")
+    return authkey.encode("utf-8")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode(message) -> bytes:
+    return json.dumps(message, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+
+def _decode(data: bytes):
+    return json.loads(data.decode("utf-8"))
+
+
+class SchedulerControlServer:
+    """在独立调度进程中监听控制通道，把API进程的请求转给 SchedulerManager
+
+    每个连接使用 authkey 认证，消息为JSON：请求为 [方法名, 参数列表]，响应为 ["ok", 返回值] 或 ["error", 错误信息]。
+    不使用pickle，即使密钥泄露也无法借控制通道在调度进程中执行任意代码。
+    监听地址同时起到单实例锁的作用：同一地址上已有调度进程时启动失败，避免任务被重复调度。
+    """
+
+    def __init__(self, manager, address: str, authkey: bytes):
+        self.manager = manager
+        self.address = parse_control_address(address)
+        self.authkey = authkey
+        self._family = socket.AF_INET if isinstance(self.address, tuple) else socket.AF_UNIX
+        self._listener: Optional[Listener] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._accept_loop, name="scheduler-control", daemon=True)
+        self._thread.start()
+        logger.info(f"Scheduler control channel listening on {self._listener.address}")
+
+    def shutdown(self):
+        if self._listener is None:
+            return
+        self._stopped.set()
+        try:
+            # 阻塞在 accept 上的线程不会因 close 返回，用一个本地连接唤醒它
+            Client(self._listener.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+        self._thread.join(timeout=5)
+        self._listener.close()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            # 关闭底层socket的读写，唤醒阻塞在 recv 上的处理线程，由其自行关闭连接
+            try:
+                with socket.fromfd(connection.fileno(), self._family, socket.SOCK_STREAM) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._listener = None
+        logger.info("Scheduler control channel closed")
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                connection = self._listener.accept()
+            except (OSError, AuthenticationError) as e:
+                # 监听已关闭或认证失败
+                if self._stopped.is_set():
+                    return
+                logger.warning(f"Rejected scheduler control connection: {e}")
+                continue
+            if self._stopped.is_set():
+                connection.close()
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+        try:
+            self._serve_requests(connection)
+        finally:
+            with self._lock:
+                self._connections.discard(connection)
+            connection.close()
+
+    def _serve_requests(self, connection):
+        while True:
+            try:
+                data = connection.recv_bytes(_MAX_MESSAGE_BYTES)
+            except (EOFError, OSError):
+                return
+            method = None
+            try:
+                method, args = _decode(data)
+                response = ["ok", self.handle(method, args)]
+            except Exception as e:
+                logger.error(f"Scheduler control request {method} failed: {e}")
+                response = ["error", str(e)]
+            try:
+                connection.send_bytes(_encode(response))
+            except (OSError, ValueError):
+                return
+
+    def handle(self, method: str, args: list) -> Any:
+        if method == "status":
+            scheduler = self.manager.get_scheduler()
+            return {
+                "initialized": self.manager.is_initialized,
+                "running": bool(self.manager.is_scheduler_running()),
+                "scheduler_type": self.manager.settings.SCHEDULER_TYPE,
+                "total_tasks": len(scheduler.task_fingerprints()) if scheduler else 0,
+            }
+        if method == "reconcile":
+            return self.manager.reconcile()
+        if method == "forget_data_source":
+            from app.services.services import forget_data_source
+            return forget_data_source(*args)
+        if method in EXECUTION_STATE_METHODS:
+            return getattr(self.manager, method)(*args)
+        if method not in _SCHEDULER_METHODS:
+            raise ValueError(f"Unsupported scheduler control method: {method}")
+        scheduler = self.manager.get_scheduler()
+        if scheduler is None:
+            raise RuntimeError("Scheduler not available")
+        return getattr(scheduler, method)(*args)
+
+
+class SchedulerClient:
+    """通过控制通道调用独立调度进程中的调度器，方法与 BaseScheduler 一致
+
+    每个线程保持一条已认证的连接，避免每次调用都重新握手；连接失效时重连一次。
+    """
+
+    def __init__(self, address: str, authkey: bytes, timeout: float):
+        self.address = parse_control_address(address)
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def call(self, method: str, *args) -> Any:
+        connection = getattr(self._local, "connection", None)
+        try:
+            if connection is None:
+                status, value = self._request(self._connect(), method, args)
+            else:
+                try:
+                    status, value = self._request(connection, method, args)
+                except (OSError, EOFError, ValueError):
+                    # 调度进程重启过，缓存的连接已断开，重连后重试一次
+                    self._close()
+                    status, value = self._request(self._connect(), method, args)
+        except (OSError, EOFError, ValueError) as e:
+            self._close()
+            raise SchedulerUnavailableError(f"Scheduler control connection lost during {method}: {e}") from e
+
+        if status != "ok":
+            raise RuntimeError(value)
+        return value
+
+    def _request(self, connection, method: str, args: tuple) -> Tuple[str, Any]:
+        connection.send_bytes(_encode([method, list(args)]))
+        if not connection.poll(self.timeout):
+            # 响应未读完的连接不能复用
+            self._close()
+            raise SchedulerUnavailableError(f"Scheduler control request {method} timed out after {self.timeout}s")
+        status, value = _decode(connection.recv_bytes())
+        return status, value
+
+    def _connect(self):
+        try:
+            connection = Client(self.address, authkey=self.authkey)
+        except (OSError, EOFError, AuthenticationError) as e:
+            raise SchedulerUnavailableError(f"Scheduler process unreachable at {self.address}: {e}") from e
+        self._local.connection = connection
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection.close()
+
+    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None, spread_window_seconds: int = 0):
+        return self.call("add_task", task_id, cron_schedule, task_name, spread_window_seconds)
+
+    def remove_task(self, task_id: int):
+        return self.call("remove_task", task_id)
+
+    def get_task_status(self, task_id: int) -> Dict[str, Any]:
+        return self.call("get_task_status", task_id)
+
+    def list_tasks(self) -> Dict[int, Dict[str, Any]]:
+        # JSON对象的键为字符串，还原为任务ID
+        return {int(task_id): status for task_id, status in self.call("list_tasks").items()}
+
+    def get_catch_up_report(self) -> Optional[Dict[str, Any]]:
+        return self.call("get_catch_up_report")
+
+    def get_dispatch_stats(self) -> Optional[Dict[str, Any]]:
+        return self.call("get_dispatch_stats")
+
+    def status(self) -> Dict[str, Any]:
+        return self.call("status")
+
+    @property
+    def is_running(self) -> bool:
+        try:
+            return self.status()["running"]
+        except SchedulerUnavailableError:
+            return False
+
+
+class RemoteSchedulerManager(ExecutionStateMixin):
+    """SCHEDULER_MODE=standalone 时API进程使用的管理器
+
+    接口与 SchedulerManager 相同，但不在本进程创建调度器，所有操作经控制通道转给 scheduler_main.py，
+    因此API可以多worker、多副本部署而不会重复执行任务。
+    熔断器、结果缓存等执行状态同样读写调度进程中的实例；手动执行仍在API进程中进行，
+    因此重置和清除操作同时作用于两个进程。
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.client = SchedulerClient(
+            settings.SCHEDULER_CONTROL_ADDRESS,
+            control_authkey(settings),
+            settings.SCHEDULER_CONTROL_TIMEOUT,
+        )
+
+    @property
+    def is_initialized(self) -> bool:
+        return self.settings.SCHEDULER_ENABLED
+
+    def initialize(self):
+        if self.settings.SCHEDULER_ENABLED:
+            logger.info(f"Scheduler runs in standalone mode, using control channel at {self.settings.SCHEDULER_CONTROL_ADDRESS}")
+
+    def shutdown(self):
+        """调度器属于独立进程，API退出时无需关闭"""
+
+    def load_active_tasks(self):
+        """活跃任务由调度进程启动时加载"""
+
+    def reconcile(self) -> Dict[str, Any]:
+        return self.client.call("reconcile")
+
+    def get_scheduler(self) -> Optional[SchedulerClient]:
+        return self.client if self.settings.SCHEDULER_ENABLED else None
+
+    def is_scheduler_running(self) -> bool:
+        return self.settings.SCHEDULER_ENABLED and self.client.is_running
+
+    def _forward(self, method: str, *args) -> Any:
+        """调度器未启用时没有调度进程，读写本进程的状态"""
+        if not self.settings.SCHEDULER_ENABLED:
+            return getattr(super(), method)(*args)
+        return self.client.call(method, *args)
+
+    def circuit_breaker_stats(self, data_source_id: Optional[int] = None):
+        return self._forward("circuit_breaker_stats", data_source_id)
+
+    def circuit_states(self, data_source_ids: Iterable[int]) -> Dict[int, str]:
+        data_source_ids = list(data_source_ids)
+        try:
+            states = self._forward("circuit_states", data_source_ids)
+        except SchedulerUnavailableError as e:
+            # 列表页不因调度进程不可达而失败，退回API进程自己的熔断状态
+            logger.warning(f"Falling back to local circuit states: {e}")
+            return super().circuit_states(data_source_ids)
+        return {int(data_source_id): state for data_source_id, state in states.items()}
+
+    def reset_circuit_breaker(self, data_source_id: int) -> Dict[str, Any]:
+        stats = super().reset_circuit_breaker(data_source_id)
+        if self.settings.SCHEDULER_ENABLED:
+            stats = self.client.call("reset_circuit_breaker", data_source_id)
+        return stats
+
+    def forget_data_source(self, data_source_id: int, deleted: bool = False):
+        """本进程的状态已由 DataSourceService 清理，只需通知调度进程"""
+        if not self.settings.SCHEDULER_ENABLED:
+            return
+        try:
+            self.client.call("forget_data_source", data_source_id, deleted)
+        except SchedulerUnavailableError as e:
+            # 数据源的修改已经提交，不因通知失败而报错；连接池按连接指纹自行重建
+            logger.warning(f"Failed to notify scheduler process about data source {data_source_id}: {e}")
+
+    def result_cache_stats(self) -> Dict[str, Any]:
+        return self._forward("result_cache_stats")
+
+    def invalidate_result_cache(self, data_source_id: Optional[int] = None):
+        super().invalidate_result_cache(data_source_id)
+        if self.settings.SCHEDULER_ENABLED:
+            self.client.call("invalidate_result_cache", data_source_id)
+
+    def notify_signal(self, name: str):
+        self._forward("notify_signal", name)
+
+    def dag_stats(self) -> Dict[str, Any]:
+        return self._forward("dag_stats")
+
+    def retry_stats(self) -> Dict[str, Any]:
+        return self._forward("retry_stats")
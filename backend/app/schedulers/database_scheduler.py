@@ -0,0 +1,437 @@
+import itertools
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, case, or_, select, update
+
+from app.core.config import settings
+from app.models.models import InspectionTask
+from .base import BaseScheduler
+from .dispatcher import DEFAULT_PRIORITY, PRIORITY_LEVELS
+from .triggers import spread_offset
+
+logger = getLogger(__name__)
+
+_tasks = InspectionTask.__table__
+# 调度状态的变化不算对任务的修改，保留原来的 updated_at
+_KEEP_UPDATED_AT = {'updated_at': _tasks.c.updated_at}
+# 到期任务超过一次领取的数量时先领取优先级高的
+_CLAIM_ORDER = (
+    case(PRIORITY_LEVELS, value=_tasks.c.priority, else_=PRIORITY_LEVELS[DEFAULT_PRIORITY]),
+    _tasks.c.next_run_at,
+)
+
+
+class DatabaseScheduler(BaseScheduler):
+    """只依赖元数据库的分布式调度器，调度计划直接保存在任务表中
+
+    - next_run_at         下一次到期时间，为空表示不在调度中
+    - schedule_signature  计算 next_run_at 所用的 cron|偏移秒数，用于识别调度配置的变化
+    - lease_owner / lease_expires_at  正在执行该任务的节点租约
+
+    每个节点按轮询间隔用一条语句批量领取到期任务：PostgreSQL 使用 FOR UPDATE SKIP LOCKED，
+    多个节点并发领取时互不等待；其他数据库用带本次领取令牌的条件UPDATE原子地加租约，再按令牌读回。
+    领取本身不计算触发器，执行完成后才按任务的 cron 计算下一次到期时间。
+    执行期间持有者定期续约，节点宕机后租约过期，任务会被其他节点重新领取执行。
+    """
+
+    def __init__(self, db_session_factory, config: Optional[Dict[str, Any]] = None):
+        super().__init__(config)
+        self.db_session_factory = db_session_factory
+        self.max_workers = self.config.get('max_workers') or settings.MAX_WORKERS
+        self.poll_interval = self.config.get('db_poll_interval') or settings.DATABASE_SCHEDULER_POLL_INTERVAL
+        self.lease_ttl = self.config.get('db_lease_ttl') or settings.DATABASE_SCHEDULER_LEASE_TTL
+        self.claim_batch = self.config.get('db_claim_batch') or settings.DATABASE_SCHEDULER_CLAIM_BATCH
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight: Dict[int, str] = {}  # 任务ID -> 租约令牌
+        self._completed: List[Dict[str, Any]] = []  # 待批量写回的执行结果
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._claims = itertools.count()
+        self._last_heartbeat = 0.0
+        self._triggers: Dict[str, Any] = {}
+
+    def start(self):
+        """启动调度器"""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="database-scheduler")
+        self._thread = threading.Thread(target=self._poll_loop, name="database-scheduler-poll", daemon=True)
+        self._thread.start()
+        self.is_running = True
+        logger.info(f"Database scheduler started as node {self.node_id}")
+
+    def shutdown(self):
+        """关闭调度器，等待本节点正在执行的任务完成并写回下一次到期时间"""
+        if not self.is_running:
+            return
+        self._stop.set()
+        self._thread.join(timeout=30)
+        self._executor.shutdown(wait=True)
+        self._shutdown_executors()
+        if settings.INSPECTION_ENGINE == "asyncio":
+            from app.services.async_engine import async_engine
+            async_engine.shutdown()
+        try:
+            self._flush_completed()
+        except Exception as e:
+            logger.error(f"Failed to reschedule completed tasks on shutdown: {e}")
+        self.is_running = False
+        logger.info("Database scheduler shutdown successfully")
+
+    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None, spread_window_seconds: int = 0):
+        """添加定时任务；调度配置未变化时保留现有的到期时间，多个副本重复加载不会重置"""
+        try:
+            if not self.validate_cron(cron_schedule):
+                raise ValueError(f"Invalid cron schedule: {cron_schedule}")
+            offset_seconds = spread_offset(task_id, spread_window_seconds)
+            self._schedule([(task_id, self._signature(cron_schedule, offset_seconds))], time.time())
+            logger.info(f"Added task {task_id} with schedule: {cron_schedule} (offset {offset_seconds}s)")
+
+        except Exception as e:
+            logger.error(f"Failed to add task {task_id}: {e}")
+            raise
+
+    def remove_task(self, task_id: int):
+        """移除定时任务；正在执行的本次触发完成后不再排期"""
+        try:
+            if self._unschedule([task_id]):
+                logger.info(f"Removed task {task_id}")
+            else:
+                logger.warning(f"Task {task_id} not found in scheduler")
+
+        except Exception as e:
+            logger.error(f"Failed to remove task {task_id}: {e}")
+
+    def get_task_status(self, task_id: int) -> Dict[str, Any]:
+        """获取任务状态"""
+        try:
+            rows = self._scheduled_rows(_tasks.c.id == task_id)
+            if not rows:
+                return {
+                    'task_id': task_id,
+                    'exists': False,
+                    'running': False,
+                    'next_run': None
+                }
+            return self._status(rows[0])
+
+        except Exception as e:
+            logger.error(f"Failed to get status for task {task_id}: {e}")
+            return {
+                'task_id': task_id,
+                'exists': False,
+                'running': False,
+                'error': str(e)
+            }
+
+    def list_tasks(self) -> Dict[int, Dict[str, Any]]:
+        """列出所有任务"""
+        try:
+            return {row.id: self._status(row) for row in self._scheduled_rows()}
+        except Exception as e:
+            logger.error(f"Failed to list tasks: {e}")
+            return {}
+
+    def task_fingerprints(self) -> Dict[int, Tuple[str, str]]:
+        """现有任务的触发器描述和名称(按 schedule_signature 计算，反映实际排期所用的配置)"""
+        db = self.db_session_factory()
+        try:
+            rows = db.execute(
+                select(_tasks.c.id, _tasks.c.name, _tasks.c.schedule_signature).where(_tasks.c.schedule_signature.isnot(None))
+            ).all()
+        finally:
+            db.close()
+        return {row.id: (str(self._trigger_for(row.schedule_signature)), row.name) for row in rows}
+
+    def _apply_reconcile(self, adds: List[Tuple[int, str, str, int]], renames: List[Tuple[int, str, str, int]], removes: List[int]):
+        """批量写入调度配置；名称直接读取任务表，不需要单独更新"""
+        now = time.time()
+        entries = []
+        for task_id, cron_schedule, _, spread in adds:
+            try:
+                signature = self._signature(cron_schedule, spread_offset(task_id, spread))
+                self._trigger_for(signature)
+                entries.append((task_id, signature))
+            except Exception as e:
+                logger.error(f"Failed to add task {task_id}: {e}")
+        if entries:
+            self._schedule(entries, now)
+        if removes:
+            self._unschedule(removes)
+
+    def _schedule(self, entries: List[Tuple[int, str]], now: float):
+        """按 (任务ID, 签名) 批量写入下一次到期时间；签名未变且已在调度中的任务保持不变"""
+        next_runs: Dict[str, datetime] = {}
+        params = []
+        for task_id, signature in entries:
+            if signature not in next_runs:
+                next_runs[signature] = self._next_run(signature, now)
+            params.append({'task_id': task_id, 'signature': signature, 'next_run': next_runs[signature]})
+
+        statement = update(_tasks).where(
+            _tasks.c.id == bindparam('task_id'),
+            or_(
+                _tasks.c.schedule_signature.is_(None),
+                _tasks.c.schedule_signature != bindparam('signature'),
+                _tasks.c.next_run_at.is_(None),
+            ),
+        ).values(
+            next_run_at=bindparam('next_run', type_=_tasks.c.next_run_at.type),
+            schedule_signature=bindparam('signature'),
+            **_KEEP_UPDATED_AT
+        )
+        db = self.db_session_factory()
+        try:
+            db.execute(statement, params)
+            db.commit()
+        finally:
+            db.close()
+
+    def _unschedule(self, task_ids: List[int]) -> int:
+        db = self.db_session_factory()
+        try:
+            result = db.execute(
+                update(_tasks)
+                .where(_tasks.c.id.in_(task_ids), _tasks.c.schedule_signature.isnot(None))
+                .values(next_run_at=None, schedule_signature=None, **_KEEP_UPDATED_AT)
+            )
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
+
+    def _scheduled_rows(self, *conditions):
+        db = self.db_session_factory()
+        try:
+            return db.execute(
+                select(
+                    _tasks.c.id,
+                    _tasks.c.name,
+                    _tasks.c.next_run_at,
+                    _tasks.c.schedule_signature,
+                    _tasks.c.lease_owner,
+                    _tasks.c.lease_expires_at,
+                ).where(_tasks.c.schedule_signature.isnot(None), *conditions)
+            ).all()
+        finally:
+            db.close()
+
+    def _status(self, row) -> Dict[str, Any]:
+        cron_schedule, offset_seconds = row.schedule_signature.rsplit('|', 1)
+        leased = row.lease_owner is not None and self._from_db(row.lease_expires_at) > time.time()
+        status = {
+            'task_id': row.id,
+            'exists': True,
+            'running': True,
+            'name': row.name,
+            'trigger': cron_schedule,
+            'offset_seconds': int(offset_seconds),
+            'executing': leased,
+            'next_run': self._isoformat(row.next_run_at),
+        }
+        if leased:
+            status['lease_owner'] = row.lease_owner.rsplit(':', 1)[0]
+            status['lease_expires'] = self._isoformat(row.lease_expires_at)
+        return status
+
+    def _poll_loop(self):
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                self._flush_completed()
+                self._renew_leases()
+                claimed = self._claim_due_tasks()
+            except Exception as e:
+                logger.error(f"Database scheduler poll failed: {e}")
+            # 领取数达到批量上限说明还有积压，立即继续领取
+            if claimed < self.claim_batch:
+                self._stop.wait(self.poll_interval)
+
+    def _claim_due_tasks(self) -> int:
+        # 开启公平派发时多领取一倍，慢数据源的任务在本地排队时其他数据源的任务仍能被领取
+        capacity = self.max_workers * 2 if self.dispatcher is not None else self.max_workers
+        with self._lock:
+            free = capacity - len(self._in_flight) - len(self._completed)
+        if free <= 0:
+            return 0
+
+        now = time.time()
+        limit = min(free, self.claim_batch)
+        token = f"{self.node_id}:{next(self._claims)}"
+        db = self.db_session_factory()
+        try:
+            if db.get_bind().dialect.name == 'postgresql':
+                rows = self._claim_skip_locked(db, token, now, limit)
+            else:
+                rows = self._claim_by_token(db, token, now, limit)
+            db.commit()
+        finally:
+            db.close()
+
+        for row in rows:
+            fire_at = self._from_db(row.next_run_at)
+            if getattr(row, 'previous_owner', None):
+                logger.warning(f"Recovered expired lease for task {row.id} (scheduled at {datetime.fromtimestamp(fire_at)})")
+            with self._lock:
+                self._in_flight[row.id] = token
+            self._dispatch(row.id, token, fire_at, row.schedule_signature)
+        return len(rows)
+
+    def _due_condition(self, now: float):
+        return and_(
+            _tasks.c.status == 'active',
+            _tasks.c.next_run_at <= self._to_db(now),
+            _tasks.c.schedule_signature.isnot(None),
+            or_(_tasks.c.lease_expires_at.is_(None), _tasks.c.lease_expires_at < self._to_db(now)),
+        )
+
+    def _claim_skip_locked(self, db, token: str, now: float, limit: int):
+        """PostgreSQL：一条 WITH ... FOR UPDATE SKIP LOCKED / UPDATE ... RETURNING 领取一批任务"""
+        due = (
+            select(_tasks.c.id, _tasks.c.lease_owner.label('previous_owner'))
+            .where(self._due_condition(now))
+            .order_by(*_CLAIM_ORDER)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte('due')
+        )
+        statement = (
+            update(_tasks)
+            .where(_tasks.c.id == due.c.id)
+            .values(lease_owner=token, lease_expires_at=self._to_db(now + self.lease_ttl), **_KEEP_UPDATED_AT)
+            .returning(_tasks.c.id, _tasks.c.next_run_at, _tasks.c.schedule_signature, due.c.previous_owner)
+        )
+        return db.execute(statement).all()
+
+    def _claim_by_token(self, db, token: str, now: float, limit: int):
+        """其他数据库：条件UPDATE在一条语句内原子地给到期任务加上本次领取的令牌，再按令牌读回"""
+        due = select(_tasks.c.id).where(self._due_condition(now)).order_by(*_CLAIM_ORDER).limit(limit).subquery()
+        result = db.execute(
+            update(_tasks)
+            .where(_tasks.c.id.in_(select(due.c.id)))
+            .values(lease_owner=token, lease_expires_at=self._to_db(now + self.lease_ttl), **_KEEP_UPDATED_AT)
+        )
+        if not result.rowcount:
+            return []
+        return db.execute(
+            select(_tasks.c.id, _tasks.c.next_run_at, _tasks.c.schedule_signature).where(_tasks.c.lease_owner == token)
+        ).all()
+
+    def _dispatch(self, task_id: int, token: str, fire_at: float, signature: str):
+        logger.info(f"Executing task {task_id} via database scheduler")
+        try:
+            future = self.submit_execution(task_id)
+        except Exception as e:
+            logger.error(f"Failed to dispatch task {task_id}: {e}")
+            self._finish(task_id, token, fire_at, signature)
+            return
+        future.add_done_callback(lambda _: self._finish(task_id, token, fire_at, signature))
+
+    def _finish(self, task_id: int, token: str, fire_at: float, signature: str):
+        """计算下一次到期时间，由轮询线程批量写回；执行期间错过的触发不再补跑"""
+        try:
+            next_run = self._next_run(signature, max(fire_at + 1, time.time()))
+        except Exception as e:
+            logger.error(f"Failed to compute next run for task {task_id}: {e}")
+            next_run = None
+        with self._lock:
+            self._in_flight.pop(task_id, None)
+            self._completed.append({'task_id': task_id, 'token': token, 'signature': signature, 'next_run': next_run})
+
+    def _flush_completed(self):
+        """释放租约并写入下一次到期时间；执行期间调度配置被修改或任务被移除时保留新的排期"""
+        with self._lock:
+            completed, self._completed = self._completed, []
+        if not completed:
+            return
+
+        statement = update(_tasks).where(
+            _tasks.c.id == bindparam('task_id'),
+            _tasks.c.lease_owner == bindparam('token'),
+        ).values(
+            lease_owner=None,
+            lease_expires_at=None,
+            next_run_at=case(
+                (_tasks.c.schedule_signature == bindparam('signature'), bindparam('next_run', type_=_tasks.c.next_run_at.type)),
+                else_=_tasks.c.next_run_at,
+            ),
+            **_KEEP_UPDATED_AT
+        )
+        db = self.db_session_factory()
+        try:
+            result = db.execute(statement, completed)
+            db.commit()
+        except Exception:
+            with self._lock:
+                self._completed[:0] = completed
+            raise
+        finally:
+            db.close()
+        if 0 <= result.rowcount < len(completed):
+            logger.warning(f"{len(completed) - result.rowcount} leases were lost before completion, not rescheduling them")
+
+    def _renew_leases(self):
+        now = time.time()
+        if now - self._last_heartbeat < self.lease_ttl / 3:
+            return
+        self._last_heartbeat = now
+        with self._lock:
+            tokens = set(self._in_flight.values())
+        if not tokens:
+            return
+        db = self.db_session_factory()
+        try:
+            db.execute(
+                update(_tasks)
+                .where(_tasks.c.lease_owner.in_(tokens))
+                .values(lease_expires_at=self._to_db(now + self.lease_ttl), **_KEEP_UPDATED_AT)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _trigger_for(self, signature: str):
+        trigger = self._triggers.get(signature)
+        if trigger is None:
+            cron_schedule, offset_seconds = signature.rsplit('|', 1)
+            trigger = self._parse_cron_trigger(cron_schedule, int(offset_seconds))
+            self._triggers[signature] = trigger
+        return trigger
+
+    def _next_run(self, signature: str, after: float) -> Optional[datetime]:
+        """after 之后(含)的下一次触发时间"""
+        trigger = self._trigger_for(signature)
+        next_fire = trigger.get_next_fire_time(None, datetime.fromtimestamp(after, trigger.timezone))
+        return next_fire.astimezone(timezone.utc) if next_fire else None
+
+    @staticmethod
+    def _signature(cron_schedule: str, offset_seconds: int) -> str:
+        return f"{cron_schedule.strip()}|{offset_seconds}"
+
+    @staticmethod
+    def _to_db(timestamp: float) -> datetime:
+        return datetime.fromtimestamp(timestamp, timezone.utc)
+
+    @staticmethod
+    def _from_db(value: Optional[datetime]) -> float:
+        """SQLite 读回的是不带时区的UTC时间"""
+        if value is None:
+            return 0.0
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+
+    def _isoformat(self, value: Optional[datetime]) -> Optional[str]:
+        return datetime.fromtimestamp(self._from_db(value)).isoformat() if value is not None else None
@@ -0,0 +1,335 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 任务优先级，数值越小越先执行
+PRIORITY_LEVELS = {"critical": 0, "high": 1, "normal": 2, "low": 3}
+PRIORITY_NAMES = {level: name for name, level in PRIORITY_LEVELS.items()}
+DEFAULT_PRIORITY = "normal"
+CRITICAL = PRIORITY_LEVELS["critical"]
+
+
+def priority_level(priority: Optional[str]) -> int:
+    return PRIORITY_LEVELS.get(priority or DEFAULT_PRIORITY, PRIORITY_LEVELS[DEFAULT_PRIORITY])
+
+
+class DispatchQueueFullError(RuntimeError):
+    """数据源的等待队列已满，本次触发被丢弃"""
+
+
+class _QueuedTask:
+    __slots__ = ("task_id", "priority", "run", "enqueued_at", "future")
+
+    def __init__(self, task_id: int, priority: int, run: Optional[Callable[[], Any]] = None):
+        self.task_id = task_id
+        self.priority = priority
+        self.run = run
+        self.enqueued_at = time.monotonic()
+        self.future: Future = Future()
+
+
+class _SourceQueue:
+    """单个数据源的等待队列和统计，每个优先级一个先进先出队列"""
+
+    def __init__(self, data_source_id: int):
+        self.data_source_id = data_source_id
+        self.lanes: List[Deque[_QueuedTask]] = [deque() for _ in PRIORITY_LEVELS]
+        self.size = 0
+        self.in_flight = 0
+        self.dispatched = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def pending(self):
+        for lane in self.lanes:
+            yield from lane
+
+    def append(self, queued: _QueuedTask):
+        self.lanes[queued.priority].append(queued)
+        self.size += 1
+
+    def head(self, now: float, aging_seconds: float, allow_non_critical: bool) -> Optional[Tuple[int, int]]:
+        """最先应执行的排队任务 (有效优先级, 所在队列)
+
+        排队每满 aging_seconds 有效优先级提升一级，最高提升到与 critical 相同；
+        有效优先级相同时原优先级高的先执行。
+        """
+        best = None
+        for level, lane in enumerate(self.lanes):
+            if not lane or (level != CRITICAL and not allow_non_critical):
+                continue
+            rank = level
+            if aging_seconds > 0:
+                rank = max(CRITICAL, level - int((now - lane[0].enqueued_at) // aging_seconds))
+            if best is None or rank < best[0]:
+                best = (rank, level)
+        return best
+
+    def popleft(self, level: int) -> _QueuedTask:
+        self.size -= 1
+        return self.lanes[level].popleft()
+
+    def evict_below(self, priority: int) -> Optional[_QueuedTask]:
+        """队列已满时为更高优先级的触发腾出位置：丢弃优先级最低的队列中最新的任务"""
+        for level in range(len(self.lanes) - 1, priority, -1):
+            if self.lanes[level]:
+                self.size -= 1
+                return self.lanes[level].pop()
+        return None
+
+    def oldest_enqueued_at(self) -> Optional[float]:
+        heads = [lane[0].enqueued_at for lane in self.lanes if lane]
+        return min(heads) if heads else None
+
+
+class FairDispatcher:
+    """按数据源公平、按优先级派发任务执行
+
+    - 每个数据源一个有界等待队列，队列满时丢弃新的触发(或为更高优先级的触发丢弃最低优先级的排队任务)；
+      同一任务已在排队时合并为一次
+    - 每个数据源同时执行的任务数不超过 max_in_flight_per_source
+    - 有空闲工作线程时取有效优先级最高的任务，优先级相同时按数据源轮转，慢数据源积压不会占满所有线程
+    - 排队每满 priority_aging_seconds 有效优先级提升一级，低优先级任务不会一直被插队
+    - 全局和每个数据源额外保留 reserved_critical_slots 个只给 critical 任务使用的执行槽，
+      普通任务积压再多，critical 任务也不需要等它们执行完
+    """
+
+    def __init__(
+        self,
+        run_task: Callable[[int], Any],
+        resolve_task: Callable[[int], Tuple[int, int]],
+        max_workers: int,
+        max_in_flight_per_source: int,
+        max_queue_depth: int,
+        priority_aging_seconds: float = 0,
+        reserved_critical_slots: int = 0,
+    ):
+        self.run_task = run_task
+        self.resolve_task = resolve_task
+        self.max_workers = max_workers
+        self.max_in_flight_per_source = max_in_flight_per_source
+        self.max_queue_depth = max_queue_depth
+        self.priority_aging_seconds = priority_aging_seconds
+        self.reserved_critical_slots = reserved_critical_slots
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers + reserved_critical_slots, thread_name_prefix="fair-dispatch"
+        )
+        self._sources: Dict[int, _SourceQueue] = {}
+        self._ready: Deque[int] = deque()  # 有任务排队的数据源ID，按轮转顺序
+        self._running = 0
+        self._waits = {level: [0, 0.0, 0.0] for level in PRIORITY_NAMES}  # 每个优先级的 [派发数, 总等待, 最大等待]
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, task_id: int, run: Optional[Callable[[], Any]] = None) -> Future:
+        """任务进入所属数据源的队列，返回任务执行完成时结束的 Future
+
+        run 替代 run_task 执行这一次提交(如带重试次数和时间窗口的重试)，这样的提交不与排队中的触发合并。
+        """
+        try:
+            data_source_id, priority = self.resolve_task(task_id)
+        except Exception as e:
+            logger.error(f"Failed to resolve data source for task {task_id}: {e}")
+            future = Future()
+            future.set_exception(e)
+            return future
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Dispatcher is shut down")
+            queue = self._sources.get(data_source_id)
+            if queue is None:
+                queue = self._sources[data_source_id] = _SourceQueue(data_source_id)
+
+            for queued in queue.pending():
+                if queued.task_id == task_id and queued.run is None and run is None:
+                    queue.coalesced += 1
+                    return queued.future
+
+            evicted = None
+            if queue.size >= self.max_queue_depth:
+                evicted = queue.evict_below(priority)
+                if evicted is None:
+                    queue.rejected += 1
+                    future = Future()
+                    future.set_exception(self._queue_full(data_source_id, task_id))
+                    logger.warning(f"Dispatch queue for data source {data_source_id} is full, dropping task {task_id}")
+                    return future
+                queue.rejected += 1
+
+            queued = _QueuedTask(task_id, priority, run)
+            if not queue.size:
+                self._ready.append(data_source_id)
+            queue.append(queued)
+            started = self._take_ready()
+
+        if evicted is not None:
+            logger.warning(
+                f"Dispatch queue for data source {data_source_id} is full, dropping queued "
+                f"{PRIORITY_NAMES[evicted.priority]} task {evicted.task_id} for {PRIORITY_NAMES[priority]} task {task_id}"
+            )
+            evicted.future.set_exception(DispatchQueueFullError(
+                f"Queue for data source {data_source_id} is full ({self.max_queue_depth}), "
+                f"task {evicted.task_id} evicted for higher priority task {task_id}"
+            ))
+        self._start(started)
+        return queued.future
+
+    def shutdown(self, wait: bool = True):
+        """停止派发，取消仍在排队的任务"""
+        with self._lock:
+            self._closed = True
+            cancelled = [queued for queue in self._sources.values() for queued in queue.pending()]
+            for queue in self._sources.values():
+                for lane in queue.lanes:
+                    lane.clear()
+                queue.size = 0
+            self._ready.clear()
+        for queued in cancelled:
+            queued.future.cancel()
+        if cancelled:
+            logger.info(f"Cancelled {len(cancelled)} queued task executions")
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            sources = []
+            for data_source_id in sorted(self._sources):
+                queue = self._sources[data_source_id]
+                oldest = queue.oldest_enqueued_at()
+                sources.append({
+                    "data_source_id": data_source_id,
+                    "queued": queue.size,
+                    "in_flight": queue.in_flight,
+                    "dispatched": queue.dispatched,
+                    "rejected": queue.rejected,
+                    "coalesced": queue.coalesced,
+                    "avg_wait_ms": round(queue.total_wait / queue.dispatched * 1000, 1) if queue.dispatched else 0,
+                    "max_wait_ms": round(queue.max_wait * 1000, 1),
+                    "oldest_wait_ms": round((now - oldest) * 1000, 1) if oldest is not None else 0,
+                })
+            priorities = {
+                PRIORITY_NAMES[level]: {
+                    "queued": sum(len(queue.lanes[level]) for queue in self._sources.values()),
+                    "dispatched": dispatched,
+                    "avg_wait_ms": round(total_wait / dispatched * 1000, 1) if dispatched else 0,
+                    "max_wait_ms": round(max_wait * 1000, 1),
+                }
+                for level, (dispatched, total_wait, max_wait) in self._waits.items()
+            }
+            return {
+                "max_workers": self.max_workers,
+                "max_in_flight_per_source": self.max_in_flight_per_source,
+                "max_queue_depth": self.max_queue_depth,
+                "priority_aging_seconds": self.priority_aging_seconds,
+                "reserved_critical_slots": self.reserved_critical_slots,
+                "running": self._running,
+                "queued": sum(source["queued"] for source in sources),
+                "priorities": priorities,
+                "data_sources": sources,
+            }
+
+    def _take_ready(self) -> List[tuple]:
+        """在持有锁时取出可以开始执行的任务：有效优先级最高的先执行，相同时按数据源轮转顺序"""
+        started = []
+        while self._ready:
+            now = time.monotonic()
+            best = None
+            for position, data_source_id in enumerate(self._ready):
+                queue = self._sources[data_source_id]
+                # 达到普通并发上限的数据源只能用保留槽执行 critical 任务
+                if not self._has_slot(queue, critical=True):
+                    continue
+                head = queue.head(now, self.priority_aging_seconds, self._has_slot(queue, critical=False))
+                if head is not None and (best is None or head[0] < best[0]):
+                    best = (head[0], head[1], position)
+                    if head[0] == CRITICAL:
+                        break
+            if best is None:
+                break
+
+            _, level, position = best
+            data_source_id = self._ready[position]
+            del self._ready[position]
+            queue = self._sources[data_source_id]
+            queued = queue.popleft(level)
+            if queue.size:
+                self._ready.append(data_source_id)
+            wait = now - queued.enqueued_at
+            queue.in_flight += 1
+            queue.dispatched += 1
+            queue.total_wait += wait
+            queue.max_wait = max(queue.max_wait, wait)
+            waits = self._waits[level]
+            waits[0] += 1
+            waits[1] += wait
+            waits[2] = max(waits[2], wait)
+            self._running += 1
+            started.append((queue, queued))
+        return started
+
+    def _has_slot(self, queue: _SourceQueue, critical: bool) -> bool:
+        reserved = self.reserved_critical_slots if critical else 0
+        return (self._running < self.max_workers + reserved
+                and queue.in_flight < self.max_in_flight_per_source + reserved)
+
+    def _queue_full(self, data_source_id: int, task_id: int) -> DispatchQueueFullError:
+        return DispatchQueueFullError(
+            f"Queue for data source {data_source_id} is full ({self.max_queue_depth}), dropping task {task_id}"
+        )
+
+    def _start(self, started: List[tuple]):
+        for queue, queued in started:
+            if not queued.future.set_running_or_notify_cancel():
+                self._finished(queue)
+                continue
+            self._executor.submit(self._run, queue, queued)
+
+    def _run(self, queue: _SourceQueue, queued: _QueuedTask):
+        try:
+            queued.future.set_result(queued.run() if queued.run is not None else self.run_task(queued.task_id))
+        except BaseException as e:
+            queued.future.set_exception(e)
+        finally:
+            self._finished(queue)
+
+    def _finished(self, queue: _SourceQueue):
+        with self._lock:
+            queue.in_flight -= 1
+            self._running -= 1
+            started = [] if self._closed else self._take_ready()
+        self._start(started)
+
+
+def create_dispatcher(config: Dict[str, Any], run_task, resolve_task) -> Optional[FairDispatcher]:
+    """fair_dispatch 开启时创建公平派发器，否则返回 None(触发时直接执行)
+
+    resolve_task 根据任务ID返回 (数据源ID, 优先级数值)。合并执行和异步引擎自行安排查询，
+    不经过派发器的队列、并发上限和优先级，与公平派发同时开启时拒绝启动，而不是悄悄绕过派发器。
+    """
+    if not config.get('fair_dispatch', settings.SCHEDULER_FAIR_DISPATCH):
+        return None
+    if settings.SCHEDULER_BATCH_WINDOW_MS > 0 or settings.INSPECTION_ENGINE == "asyncio":
+        raise ValueError(
+            "SCHEDULER_FAIR_DISPATCH cannot be combined with SCHEDULER_BATCH_WINDOW_MS > 0 "
+            "or INSPECTION_ENGINE=asyncio, disable one of them"
+        )
+    return FairDispatcher(
+        run_task,
+        resolve_task,
+        max_workers=config.get('max_workers') or settings.MAX_WORKERS,
+        max_in_flight_per_source=config.get('max_in_flight_per_source') or settings.DISPATCH_MAX_IN_FLIGHT_PER_SOURCE,
+        max_queue_depth=config.get('max_queue_depth') or settings.DISPATCH_MAX_QUEUE_DEPTH,
+        priority_aging_seconds=config.get('priority_aging_seconds', settings.DISPATCH_PRIORITY_AGING_SECONDS),
+        reserved_critical_slots=config.get('reserved_critical_slots', settings.DISPATCH_CRITICAL_RESERVED_SLOTS),
+    )
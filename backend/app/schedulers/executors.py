@@ -0,0 +1,203 @@
+import logging
+import multiprocessing
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TaskTimeoutError(TimeoutError):
+    """任务执行超过 TASK_TIMEOUT，执行它的工作进程已被终止"""
+
+
+class WorkerCrashedError(RuntimeError):
+    """工作进程在执行任务期间意外退出"""
+
+
+class RetryRequest(NamedTuple):
+    """工作进程中的执行遇到瞬时错误，申请在 delay 秒后作为第 attempt 次执行重试"""
+    attempt: int
+    delay: float
+    window: Optional[Any]
+    error_message: str
+
+
+def _worker_main(connection):
+    """工作进程入口：循环接收 (任务ID, 时间窗口, 第几次执行, 回填ID) 并执行，收到 None 时退出
+
+    工作进程使用 spawn 方式启动，拥有独立的数据库会话、数据源连接池和GIL。工作进程中
+    没有运行重试队列，瞬时错误申请的重试交回调度进程排队。
+    """
+    from app.core.database import SessionLocal
+    from app.services.retry import retry_queue
+    from app.services.services import InspectionTaskService
+
+    retry_queue.relay()
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        task_id, window, attempt, backfill_id = request
+        db = SessionLocal()
+        try:
+            result = InspectionTaskService(db).execute_task(task_id, window=window, backfill_id=backfill_id, attempt=attempt)
+            if result is None:
+                # 瞬时错误申请了重试，本次没有执行结果
+                _, *retry = retry_queue.take_relayed()[-1]
+                connection.send(("transient", RetryRequest(*retry)))
+            else:
+                connection.send(("ok", result.check_passed))
+        except Exception as e:
+            connection.send(("error", str(e)))
+        finally:
+            db.close()
+
+
+class _Worker:
+    def __init__(self, context, index: int):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_connection,), name=f"inspection-worker-{index}", daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.executions = 0
+
+    def stop(self, timeout: float = 5):
+        """通知工作进程退出，超时未退出时强制终止"""
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.connection.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class TaskProcessPool:
+    """执行巡检任务的进程池
+
+    - 最多 max_workers 个工作进程，按需启动，空闲进程复用
+    - 单次执行超过 task_timeout 秒时终止该工作进程(连同其中卡住的查询)，下次按需补充新进程
+    - 每个工作进程执行 max_tasks_per_worker 次后退出重建，回收驱动扩展可能泄漏的内存；0表示不回收
+    """
+
+    def __init__(self, max_workers: int, task_timeout: float, max_tasks_per_worker: int = 0):
+        self.max_workers = max_workers
+        self.task_timeout = task_timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = 0
+        self._closed = False
+        self._counters = {"executed": 0, "timed_out": 0, "crashed": 0, "recycled": 0}
+
+    def run(self, task_id: int, window=None, attempt: int = 1, backfill_id: Optional[int] = None) -> Any:
+        """在工作进程中执行任务并等待结果，返回 check_passed；瞬时错误申请重试时返回 RetryRequest
+
+        Raises:
+            TaskTimeoutError: 执行超时，工作进程已被终止
+            WorkerCrashedError: 工作进程意外退出
+            RuntimeError: 任务执行失败(如任务不存在)或进程池已关闭
+        """
+        with self._slots:
+            worker = self._checkout()
+            try:
+                worker.connection.send((task_id, window, attempt, backfill_id))
+                finished = worker.connection.poll(self.task_timeout)
+                if finished:
+                    status, value = worker.connection.recv()
+            except (EOFError, OSError) as e:
+                worker.kill()
+                self._count("crashed")
+                raise WorkerCrashedError(
+                    f"Worker pid {worker.process.pid} exited while running task {task_id} (exit code {worker.process.exitcode})"
+                ) from e
+            except BaseException:
+                if worker.process.is_alive():
+                    worker.kill()
+                raise
+
+            if not finished:
+                worker.kill()
+                self._count("timed_out")
+                raise TaskTimeoutError(
+                    f"Task {task_id} exceeded timeout of {self.task_timeout}s, worker pid {worker.process.pid} terminated"
+                )
+            worker.executions += 1
+            self._count("executed")
+            self._checkin(worker)
+
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+        logger.info(f"Task process pool shut down: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, idle=len(self._idle), started=self._started)
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Task process pool is shut down")
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.connection.close()
+            self._started += 1
+            index = self._started
+        started = time.perf_counter()
+        worker = _Worker(self._context, index)
+        logger.info(f"Started inspection worker pid {worker.process.pid} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return worker
+
+    def _checkin(self, worker: _Worker):
+        recycle = self.max_tasks_per_worker and worker.executions >= self.max_tasks_per_worker
+        with self._lock:
+            if not recycle and not self._closed:
+                self._idle.append(worker)
+                return
+            if recycle:
+                self._counters["recycled"] += 1
+        if recycle:
+            logger.info(f"Recycling inspection worker pid {worker.process.pid} after {worker.executions} executions")
+        worker.stop()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+
+def create_process_pool(config: Dict[str, Any]) -> Optional[TaskProcessPool]:
+    """executor 配置为 process 时创建进程池，否则返回 None(在调度线程中直接执行)"""
+    if config.get('executor', settings.SCHEDULER_EXECUTOR) != 'process':
+        return None
+    return TaskProcessPool(
+        max_workers=config.get('max_workers') or settings.MAX_WORKERS,
+        task_timeout=config.get('task_timeout') or settings.TASK_TIMEOUT,
+        max_tasks_per_worker=config.get('worker_max_tasks', settings.SCHEDULER_WORKER_MAX_TASKS),
+    )
@@ -1,9 +1,13 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional
 from enum import Enum
 import logging
+import threading
 
 from .base import BaseScheduler
 from .background_scheduler import BackgroundScheduler
+from .redis_scheduler import RedisScheduler
+from .native_scheduler import NativeScheduler
+from .database_scheduler import DatabaseScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +16,8 @@ class SchedulerType(Enum):
     """调度器类型枚举"""
     BACKGROUND = "background"
     REDIS = "redis" 
+    NATIVE = "native"
+    DATABASE = "database"
     CELERY = "celery"
 
 
@@ -38,7 +44,11 @@ def create_scheduler(
     if scheduler_type == SchedulerType.BACKGROUND:
         return BackgroundScheduler(db_session_factory, config)
     elif scheduler_type == SchedulerType.REDIS:
-        raise NotImplementedError("Redis scheduler not implemented yet")
+        return RedisScheduler(db_session_factory, config)
+    elif scheduler_type == SchedulerType.NATIVE:
+        return NativeScheduler(db_session_factory, config)
+    elif scheduler_type == SchedulerType.DATABASE:
+        return DatabaseScheduler(db_session_factory, config)
     elif scheduler_type == SchedulerType.CELERY:
         raise NotImplementedError("Celery scheduler not implemented yet")
     else:
@@ -57,14 +67,89 @@ def get_scheduler_config(settings) -> Dict[str, Any]:
     return {
         'max_workers': settings.MAX_WORKERS,
         'task_timeout': settings.TASK_TIMEOUT,
+        'executor': settings.SCHEDULER_EXECUTOR,
+        'worker_max_tasks': settings.SCHEDULER_WORKER_MAX_TASKS,
+        'fair_dispatch': settings.SCHEDULER_FAIR_DISPATCH,
+        'max_in_flight_per_source': settings.DISPATCH_MAX_IN_FLIGHT_PER_SOURCE,
+        'max_queue_depth': settings.DISPATCH_MAX_QUEUE_DEPTH,
         'max_instances': settings.SCHEDULER_MAX_INSTANCES,
         'misfire_grace_time': settings.SCHEDULER_MISFIRE_GRACE_TIME,
         'coalesce': settings.SCHEDULER_COALESCE,
+        'job_store': settings.SCHEDULER_JOB_STORE,
+        'catch_up_policy': settings.SCHEDULER_CATCHUP_POLICY,
+        'catch_up_max_runs': settings.SCHEDULER_CATCHUP_MAX_RUNS,
+        'catch_up_rate': settings.SCHEDULER_CATCHUP_RATE,
         'redis_url': settings.REDIS_SCHEDULER_URL,
+        'key_prefix': settings.REDIS_SCHEDULER_KEY_PREFIX,
+        'poll_interval': settings.REDIS_SCHEDULER_POLL_INTERVAL,
+        'lease_ttl': settings.REDIS_SCHEDULER_LEASE_TTL,
+        'claim_batch': settings.REDIS_SCHEDULER_CLAIM_BATCH,
+        'db_poll_interval': settings.DATABASE_SCHEDULER_POLL_INTERVAL,
+        'db_lease_ttl': settings.DATABASE_SCHEDULER_LEASE_TTL,
+        'db_claim_batch': settings.DATABASE_SCHEDULER_CLAIM_BATCH,
     }
 
 
-class SchedulerManager:
+# 控制通道允许调用的进程内执行状态方法
+EXECUTION_STATE_METHODS = {
+    "circuit_breaker_stats",
+    "circuit_states",
+    "reset_circuit_breaker",
+    "result_cache_stats",
+    "invalidate_result_cache",
+    "notify_signal",
+    "dag_stats",
+    "retry_stats",
+}
+
+
+class ExecutionStateMixin:
+    """熔断器、结果缓存、依赖触发和重试队列都是执行巡检的进程内状态
+
+    嵌入模式下直接读写本进程的单例；standalone 模式下由 RemoteSchedulerManager 转给调度进程。
+    """
+
+    def circuit_breaker_stats(self, data_source_id: Optional[int] = None):
+        """所有数据源或单个数据源的熔断器状态"""
+        from app.services.circuit_breaker import circuit_breakers
+        if data_source_id is None:
+            return list(circuit_breakers.stats().values())
+        return circuit_breakers.get(data_source_id).stats()
+
+    def circuit_states(self, data_source_ids: Iterable[int]) -> Dict[int, str]:
+        from app.services.circuit_breaker import circuit_breakers
+        return {data_source_id: circuit_breakers.state(data_source_id) for data_source_id in data_source_ids}
+
+    def reset_circuit_breaker(self, data_source_id: int) -> Dict[str, Any]:
+        from app.services.circuit_breaker import circuit_breakers
+        circuit_breakers.reset(data_source_id)
+        return circuit_breakers.get(data_source_id).stats()
+
+    def forget_data_source(self, data_source_id: int, deleted: bool = False):
+        """数据源连接配置变化或被删除；嵌入模式下 DataSourceService 已在本进程清理，无需处理"""
+
+    def result_cache_stats(self) -> Dict[str, Any]:
+        from app.services.result_cache import result_cache
+        return result_cache.stats()
+
+    def invalidate_result_cache(self, data_source_id: Optional[int] = None):
+        from app.services.result_cache import result_cache
+        result_cache.invalidate(data_source_id)
+
+    def notify_signal(self, name: str):
+        from app.services.dag_executor import dag_executor
+        dag_executor.notify_signal(name)
+
+    def dag_stats(self) -> Dict[str, Any]:
+        from app.services.dag_executor import dag_executor
+        return dag_executor.stats()
+
+    def retry_stats(self) -> Dict[str, Any]:
+        from app.services.retry import retry_queue
+        return retry_queue.stats()
+
+
+class SchedulerManager(ExecutionStateMixin):
     """调度器管理器，负责调度器的生命周期管理"""
     
     def __init__(self, settings, db_session_factory):
@@ -72,6 +157,9 @@ class SchedulerManager:
         self.db_session_factory = db_session_factory
         self.scheduler: Optional[BaseScheduler] = None
         self.is_initialized = False
+        self._reconcile_lock = threading.Lock()
+        self._sync_stop = threading.Event()
+        self._sync_thread: Optional[threading.Thread] = None
         
     def initialize(self):
         """初始化调度器"""
@@ -99,6 +187,22 @@ class SchedulerManager:
             self.scheduler.start()
             self.is_initialized = True
             
+            # 到期的重试、依赖触发和回填窗口与定时触发一样由调度器执行，经过进程池、公平派发器或异步引擎
+            from app.services.backfill_runner import backfill_runner
+            from app.services.dag_executor import dag_executor
+            from app.services.retry import retry_queue
+            for component in (retry_queue, dag_executor, backfill_runner):
+                component.scheduler = self.scheduler
+            
+            # 定期与数据库同步，补上其他副本或直接修改数据库造成的差异
+            interval = self.settings.SCHEDULER_RECONCILE_INTERVAL
+            if interval > 0:
+                self._sync_stop.clear()
+                self._sync_thread = threading.Thread(
+                    target=self._sync_loop, args=(interval,), name="scheduler-sync", daemon=True
+                )
+                self._sync_thread.start()
+            
             logger.info(f"Scheduler initialized successfully with type: {scheduler_type.value}")
             
         except Exception as e:
@@ -111,6 +215,16 @@ class SchedulerManager:
             return
             
         try:
+            self._sync_stop.set()
+            if self._sync_thread:
+                self._sync_thread.join(timeout=10)
+                self._sync_thread = None
+            from app.services.backfill_runner import backfill_runner
+            from app.services.dag_executor import dag_executor
+            from app.services.retry import retry_queue
+            for component in (retry_queue, dag_executor, backfill_runner):
+                if component.scheduler is self.scheduler:
+                    component.scheduler = None
             self.scheduler.shutdown()
             self.scheduler = None
             self.is_initialized = False
@@ -126,39 +240,45 @@ class SchedulerManager:
             return
             
         try:
-            from app.services.services import InspectionTaskService
-            from app.models.models import InspectionTask
-            
-            db = self.db_session_factory()
-            try:
-                task_service = InspectionTaskService(db)
-                
-                # 获取所有活跃的任务
-                active_tasks = db.query(InspectionTask).filter(
-                    InspectionTask.status == 'active'
-                ).all()
-                
-                logger.info(f"Loading {len(active_tasks)} active tasks into scheduler")
-                
-                # 将每个任务添加到调度器
-                for task in active_tasks:
-                    if task.cron_schedule:
-                        try:
-                            self.scheduler.add_task(
-                                task.id, 
-                                task.cron_schedule, 
-                                task.name
-                            )
-                            logger.info(f"Loaded task {task.id}: {task.name}")
-                        except Exception as e:
-                            logger.error(f"Failed to load task {task.id}: {e}")
-                            
-            finally:
-                db.close()
-                
+            self.reconcile()
         except Exception as e:
             logger.error(f"Failed to load active tasks: {e}")
             
+    def reconcile(self) -> Dict[str, Any]:
+        """比较数据库中的活跃任务和调度器中的任务，只应用有变化的部分
+        
+        Returns:
+            各类变更的数量和活跃任务总数
+        """
+        if not self.scheduler or not self.is_initialized:
+            raise RuntimeError("Scheduler not initialized")
+            
+        from app.models.models import InspectionTask
+        
+        db = self.db_session_factory()
+        try:
+            # 只读取调度需要的列
+            active_tasks = db.query(
+                InspectionTask.id,
+                InspectionTask.name,
+                InspectionTask.cron_schedule,
+                InspectionTask.spread_window_seconds
+            ).filter(InspectionTask.status == 'active').all()
+        finally:
+            db.close()
+            
+        with self._reconcile_lock:
+            summary = self.scheduler.reconcile(active_tasks)
+        summary['total_active_tasks'] = len(active_tasks)
+        return summary
+        
+    def _sync_loop(self, interval: float):
+        while not self._sync_stop.wait(interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Periodic scheduler sync failed: {e}")
+            
     def get_scheduler(self) -> Optional[BaseScheduler]:
         """获取调度器实例"""
         return self.scheduler
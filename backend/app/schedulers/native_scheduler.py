@@ -0,0 +1,291 @@
+import heapq
+import itertools
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from .base import BaseScheduler
+from .triggers import spread_offset
+
+logger = getLogger(__name__)
+
+# 每次批量计算的触发时间个数
+_BATCH_SIZE = 64
+
+
+class _CronGroup:
+    """同一个Cron表达式共享的触发器和批量计算的触发时间表"""
+
+    __slots__ = ("cron", "trigger", "_start", "_times")
+
+    def __init__(self, cron: str, trigger):
+        self.cron = cron
+        self.trigger = trigger
+        self._start = 0.0
+        self._times: List[float] = []
+
+    def next_at_or_after(self, ts: float) -> Optional[float]:
+        """ts 及之后的第一个触发时间戳；命中缓存时只做一次二分查找"""
+        times = self._times
+        if ts >= self._start:
+            index = bisect_left(times, ts)
+            if index < len(times):
+                return times[index]
+        self._start = ts
+        self._times = times = self._compute(ts)
+        return times[0] if times else None
+
+    def _compute(self, ts: float) -> List[float]:
+        times = []
+        now = datetime.fromtimestamp(ts, self.trigger.timezone)
+        fire_time = self.trigger.get_next_fire_time(None, now)
+        while fire_time is not None and len(times) < _BATCH_SIZE:
+            times.append(fire_time.timestamp())
+            fire_time = self.trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+        return times
+
+
+class _Bucket:
+    """Cron表达式和顺延秒数都相同的任务共用一个堆节点，同时触发"""
+
+    __slots__ = ("key", "group", "offset", "task_ids", "fire_ts")
+
+    def __init__(self, key: Tuple[str, int], group: _CronGroup, offset: int):
+        self.key = key
+        self.group = group
+        self.offset = offset
+        self.task_ids: Set[int] = set()
+        self.fire_ts: Optional[float] = None
+
+    def next_fire(self, after_ts: float) -> Optional[float]:
+        base = self.group.next_at_or_after(after_ts - self.offset)
+        return base + self.offset if base is not None else None
+
+
+class _TaskSlot:
+    __slots__ = ("name", "bucket")
+
+    def __init__(self, name: str, bucket: _Bucket):
+        self.name = name
+        self.bucket = bucket
+
+
+class NativeScheduler(BaseScheduler):
+    """面向大量任务的原生调度器
+
+    - 任务只保存名称和所属分组(__slots__)，不为每个任务创建作业和触发器对象
+    - 相同Cron表达式共享一个触发器，触发时间按批计算并缓存，所有任务复用
+    - Cron表达式和顺延秒数都相同的任务合并为一个最小堆节点，到期时一起派发
+    """
+
+    def __init__(self, db_session_factory, config: Optional[Dict[str, Any]] = None):
+        super().__init__(config)
+        self.db_session_factory = db_session_factory
+        self.max_workers = self.config.get('max_workers') or settings.MAX_WORKERS
+        self.misfire_grace_time = self.config.get('misfire_grace_time', settings.SCHEDULER_MISFIRE_GRACE_TIME)
+
+        self._groups: Dict[str, _CronGroup] = {}
+        self._buckets: Dict[Tuple[str, int], _Bucket] = {}
+        self._tasks: Dict[int, _TaskSlot] = {}
+        self._trigger_texts: Dict[Tuple[str, int], str] = {}
+        self._heap: List[Tuple[float, int, _Bucket]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        """启动调度器"""
+        if self.is_running:
+            return
+        self._stop = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="native-scheduler")
+        self._thread = threading.Thread(target=self._loop, name="native-scheduler", daemon=True)
+        self._thread.start()
+        self.is_running = True
+        logger.info("Native scheduler started successfully")
+
+    def shutdown(self):
+        """关闭调度器"""
+        if not self.is_running:
+            return
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+        self._thread.join(timeout=30)
+        self._executor.shutdown(wait=True)
+        self._shutdown_executors()
+        if settings.INSPECTION_ENGINE == "asyncio":
+            from app.services.async_engine import async_engine
+            async_engine.shutdown()
+        self.is_running = False
+        logger.info("Native scheduler shutdown successfully")
+
+    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None, spread_window_seconds: int = 0):
+        """添加定时任务"""
+        try:
+            if not self.validate_cron(cron_schedule):
+                raise ValueError(f"Invalid cron schedule: {cron_schedule}")
+            offset_seconds = spread_offset(task_id, spread_window_seconds)
+            with self._condition:
+                self._add(task_id, cron_schedule, task_name or f"Task {task_id}", offset_seconds, time.time())
+            logger.info(f"Added task {task_id} with schedule: {cron_schedule} (offset {offset_seconds}s)")
+
+        except Exception as e:
+            logger.error(f"Failed to add task {task_id}: {e}")
+            raise
+
+    def remove_task(self, task_id: int):
+        """移除定时任务"""
+        with self._condition:
+            removed = self._remove(task_id)
+        if removed:
+            logger.info(f"Removed task {task_id}")
+        else:
+            logger.warning(f"Task {task_id} not found in scheduler")
+
+    def get_task_status(self, task_id: int) -> Dict[str, Any]:
+        """获取任务状态"""
+        with self._condition:
+            slot = self._tasks.get(task_id)
+            if slot is None:
+                return {
+                    'task_id': task_id,
+                    'exists': False,
+                    'running': False,
+                    'next_run': None
+                }
+            return self._status(task_id, slot)
+
+    def list_tasks(self) -> Dict[int, Dict[str, Any]]:
+        """列出所有任务"""
+        with self._condition:
+            return {task_id: self._status(task_id, slot) for task_id, slot in self._tasks.items()}
+
+    def task_fingerprints(self) -> Dict[int, Tuple[str, str]]:
+        """现有任务的触发器描述和名称"""
+        with self._condition:
+            return {
+                task_id: (self._trigger_text(slot.bucket.group.cron, slot.bucket.offset), slot.name)
+                for task_id, slot in self._tasks.items()
+            }
+
+    def _apply_reconcile(self, adds: List[Tuple[int, str, str, int]], renames: List[Tuple[int, str, str, int]], removes: List[int]):
+        """在一次加锁中批量应用同步结果"""
+        now = time.time()
+        with self._condition:
+            for task_id in removes:
+                self._remove(task_id)
+            for task_id, cron_schedule, name, spread in adds:
+                try:
+                    self._add(task_id, cron_schedule, name, spread_offset(task_id, spread), now)
+                except Exception as e:
+                    logger.error(f"Failed to add task {task_id}: {e}")
+            for task_id, _, name, _ in renames:
+                self._tasks[task_id].name = name
+
+    def _add(self, task_id: int, cron_schedule: str, name: str, offset_seconds: int, now: float):
+        """在持有锁时添加任务，同一分组的任务直接加入已有的堆节点"""
+        self._remove(task_id)
+        key = (cron_schedule, offset_seconds)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            group = self._groups.get(cron_schedule)
+            if group is None:
+                group = self._groups[cron_schedule] = _CronGroup(cron_schedule, self._parse_cron_trigger(cron_schedule))
+            bucket = self._buckets[key] = _Bucket(key, group, offset_seconds)
+            self._push(bucket, bucket.next_fire(now))
+        bucket.task_ids.add(task_id)
+        self._tasks[task_id] = _TaskSlot(name, bucket)
+
+    def _remove(self, task_id: int) -> bool:
+        slot = self._tasks.pop(task_id, None)
+        if slot is None:
+            return False
+        bucket = slot.bucket
+        bucket.task_ids.discard(task_id)
+        if not bucket.task_ids:
+            # 堆中的旧节点在弹出时发现分组已删除后丢弃
+            del self._buckets[bucket.key]
+            bucket.fire_ts = None
+        return True
+
+    def _push(self, bucket: _Bucket, fire_ts: Optional[float]):
+        bucket.fire_ts = fire_ts
+        if fire_ts is None:
+            return
+        if not self._heap or fire_ts < self._heap[0][0]:
+            self._condition.notify()
+        heapq.heappush(self._heap, (fire_ts, next(self._sequence), bucket))
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                if self._stop:
+                    return
+                now = time.time()
+                if not self._heap or self._heap[0][0] > now:
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    self._condition.wait(timeout)
+                    continue
+                due = self._pop_due(now)
+            if due and settings.SCHEDULER_BATCH_WINDOW_MS > 0:
+                # 同一时刻到期的任务已经在一起，无需再等待收集窗口；与逐个派发一样检查 max_instances，
+                # 分组查询数据源放到线程池中执行，不阻塞调度线程
+                self._executor.submit(self._dispatch_batch, due)
+                continue
+            for task_id in due:
+                self._dispatch(task_id)
+
+    def _pop_due(self, now: float) -> List[int]:
+        """在持有锁时弹出所有到期的分组，计算下一次触发并放回堆中"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_ts, _, bucket = heapq.heappop(self._heap)
+            if bucket.fire_ts != fire_ts or self._buckets.get(bucket.key) is not bucket:
+                continue
+            if self.misfire_grace_time is not None and now - fire_ts > self.misfire_grace_time:
+                logger.warning(f"Skipped {len(bucket.task_ids)} tasks scheduled at {datetime.fromtimestamp(fire_ts)}: missed by {now - fire_ts:.0f}s")
+            else:
+                due.extend(bucket.task_ids)
+            # 调度线程落后时错过的触发合并为一次
+            self._push(bucket, bucket.next_fire(max(fire_ts + 1, now)))
+        return due
+
+    def _dispatch(self, task_id: int):
+        if not self._acquire_instances([task_id]):
+            return
+
+        logger.info(f"Executing task {task_id} via native scheduler")
+        try:
+            future = self.submit_execution(task_id)
+        except Exception as e:
+            logger.error(f"Failed to dispatch task {task_id}: {e}")
+            self._release_instances([task_id])
+            return
+        future.add_done_callback(lambda _: self._release_instances([task_id]))
+
+    def _trigger_text(self, cron_schedule: str, offset_seconds: int) -> str:
+        key = (cron_schedule, offset_seconds)
+        text = self._trigger_texts.get(key)
+        if text is None:
+            text = self._trigger_texts[key] = str(self._parse_cron_trigger(cron_schedule, offset_seconds))
+        return text
+
+    def _status(self, task_id: int, slot: _TaskSlot) -> Dict[str, Any]:
+        bucket = slot.bucket
+        return {
+            'task_id': task_id,
+            'exists': True,
+            'running': True,
+            'name': slot.name,
+            'next_run': datetime.fromtimestamp(bucket.fire_ts).isoformat() if bucket.fire_ts else None,
+            'trigger': self._trigger_text(bucket.group.cron, bucket.offset),
+            'executing': self._running.get(task_id, 0),
+        }
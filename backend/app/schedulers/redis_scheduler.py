@@ -0,0 +1,374 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from .base import BaseScheduler
+from .triggers import spread_offset
+
+logger = getLogger(__name__)
+
+# 注册/更新任务定义；任务正在执行时只更新定义，由执行完成时重新排期。
+# 定义未变化或只改名(ARGV[4] == '1')时保留现有排期
+_REGISTER_SCRIPT = """
+local previous = redis.call('HGET', KEYS[3], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+    return 0
+end
+if (previous == ARGV[2] or ARGV[4] == '1') and redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+# 原子领取到期任务：把分数推迟到租约到期时间，并记录租约(持有者令牌|计划触发时间)。
+# 租约过期(持有者宕机、不再续约)的任务会再次到期并被其他节点领取，沿用原来的计划触发时间。
+_CLAIM_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[3]))
+local claimed = {}
+for i = 1, #due, 2 do
+    local member = due[i]
+    local fire_at = due[i + 1]
+    local previous = redis.call('HGET', KEYS[2], member)
+    local recovered = '0'
+    if previous then
+        local separator = string.find(previous, '|', 1, true)
+        fire_at = string.sub(previous, separator + 1)
+        recovered = '1'
+    end
+    local lease = ARGV[4] .. ':' .. member .. ':' .. ARGV[1] .. '|' .. fire_at
+    redis.call('ZADD', KEYS[1], ARGV[2], member)
+    redis.call('HSET', KEYS[2], member, lease)
+    table.insert(claimed, member)
+    table.insert(claimed, lease)
+    table.insert(claimed, fire_at)
+    table.insert(claimed, recovered)
+end
+return claimed
+"""
+
+# 续约：只有仍持有租约时才推迟到期时间
+_HEARTBEAT_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+# 执行完成：释放租约并排入下一次触发时间；任务已删除时从计划中移除
+_COMPLETE_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+if ARGV[3] ~= '' and redis.call('HEXISTS', KEYS[3], ARGV[1]) == 1 then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+else
+    redis.call('ZREM', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class RedisScheduler(BaseScheduler):
+    """基于Redis的分布式调度器，多个后端副本共享同一份调度计划
+
+    - {prefix}:schedule  有序集合，成员为任务ID，分数为下一次到期时间(秒级时间戳)
+    - {prefix}:tasks     哈希，任务ID -> 任务定义(cron、名称)
+    - {prefix}:leases    哈希，任务ID -> 正在执行该任务的节点租约
+
+    每个节点按 poll_interval 轮询，用Lua脚本原子地领取到期任务，同一次触发在所有
+    副本中只会执行一次；领取数不超过本节点空闲的工作线程数，增加副本即可横向扩展。
+    执行期间持有者定期续约，节点宕机后租约过期，任务会被其他节点重新领取执行。
+    """
+
+    def __init__(self, db_session_factory, config: Optional[Dict[str, Any]] = None, client=None):
+        super().__init__(config)
+        self.db_session_factory = db_session_factory
+
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(self.config.get('redis_url') or settings.REDIS_SCHEDULER_URL)
+        self.client = client
+
+        prefix = self.config.get('key_prefix') or settings.REDIS_SCHEDULER_KEY_PREFIX
+        self.schedule_key = f"{prefix}:schedule"
+        self.tasks_key = f"{prefix}:tasks"
+        self.leases_key = f"{prefix}:leases"
+
+        self.max_workers = self.config.get('max_workers') or settings.MAX_WORKERS
+        self.poll_interval = self.config.get('poll_interval') or settings.REDIS_SCHEDULER_POLL_INTERVAL
+        self.lease_ttl = self.config.get('lease_ttl') or settings.REDIS_SCHEDULER_LEASE_TTL
+        self.claim_batch = self.config.get('claim_batch') or settings.REDIS_SCHEDULER_CLAIM_BATCH
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._register = client.register_script(_REGISTER_SCRIPT)
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._heartbeat = client.register_script(_HEARTBEAT_SCRIPT)
+        self._complete = client.register_script(_COMPLETE_SCRIPT)
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight: Dict[str, Tuple[int, str]] = {}  # 租约 -> (任务ID, 计划触发时间)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_heartbeat = 0.0
+        self._triggers: Dict[str, Any] = {}
+
+    def start(self):
+        """启动调度器"""
+        if self.is_running:
+            return
+        self.client.ping()
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="redis-scheduler")
+        self._thread = threading.Thread(target=self._poll_loop, name="redis-scheduler-poll", daemon=True)
+        self._thread.start()
+        self.is_running = True
+        logger.info(f"Redis scheduler started as node {self.node_id}")
+
+    def shutdown(self):
+        """关闭调度器，等待本节点正在执行的任务完成"""
+        if not self.is_running:
+            return
+        self._stop.set()
+        self._thread.join(timeout=30)
+        self._executor.shutdown(wait=True)
+        self._shutdown_executors()
+        if settings.INSPECTION_ENGINE == "asyncio":
+            from app.services.async_engine import async_engine
+            async_engine.shutdown()
+        self.is_running = False
+        logger.info("Redis scheduler shutdown successfully")
+
+    def add_task(self, task_id: int, cron_schedule: str, task_name: str = None, spread_window_seconds: int = 0):
+        """添加定时任务；定义未变化时保留现有排期，多个副本重复加载不会重置触发时间"""
+        try:
+            if not self.validate_cron(cron_schedule):
+                raise ValueError(f"Invalid cron schedule: {cron_schedule}")
+            offset_seconds = spread_offset(task_id, spread_window_seconds)
+            trigger = self._trigger_for(cron_schedule, offset_seconds)
+            definition = json.dumps(
+                {"cron": cron_schedule, "name": task_name or f"Task {task_id}", "offset": offset_seconds}, sort_keys=True
+            )
+            next_due = self._next_fire_timestamp(trigger, time.time())
+            self._register(
+                keys=[self.schedule_key, self.leases_key, self.tasks_key],
+                args=[task_id, definition, next_due, 0]
+            )
+            logger.info(f"Added task {task_id} with schedule: {cron_schedule} (offset {offset_seconds}s)")
+
+        except Exception as e:
+            logger.error(f"Failed to add task {task_id}: {e}")
+            raise
+
+    def remove_task(self, task_id: int):
+        """移除定时任务；正在执行的本次触发完成后不再排期"""
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.hdel(self.tasks_key, task_id)
+            pipeline.zrem(self.schedule_key, task_id)
+            pipeline.hdel(self.leases_key, task_id)
+            removed = pipeline.execute()[0]
+            if removed:
+                logger.info(f"Removed task {task_id}")
+            else:
+                logger.warning(f"Task {task_id} not found in scheduler")
+
+        except Exception as e:
+            logger.error(f"Failed to remove task {task_id}: {e}")
+
+    def get_task_status(self, task_id: int) -> Dict[str, Any]:
+        """获取任务状态"""
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.hget(self.tasks_key, task_id)
+            pipeline.zscore(self.schedule_key, task_id)
+            pipeline.hget(self.leases_key, task_id)
+            definition, score, lease = pipeline.execute()
+            if definition is None:
+                return {
+                    'task_id': task_id,
+                    'exists': False,
+                    'running': False,
+                    'next_run': None
+                }
+            return self._status(task_id, definition, score, lease)
+
+        except Exception as e:
+            logger.error(f"Failed to get status for task {task_id}: {e}")
+            return {
+                'task_id': task_id,
+                'exists': False,
+                'running': False,
+                'error': str(e)
+            }
+
+    def list_tasks(self) -> Dict[int, Dict[str, Any]]:
+        """列出所有任务"""
+        try:
+            definitions = self.client.hgetall(self.tasks_key)
+            leases = self.client.hgetall(self.leases_key)
+            scores = dict(self.client.zrange(self.schedule_key, 0, -1, withscores=True))
+            tasks = {}
+            for member, definition in definitions.items():
+                task_id = int(member)
+                tasks[task_id] = self._status(task_id, definition, scores.get(member), leases.get(member))
+            return tasks
+
+        except Exception as e:
+            logger.error(f"Failed to list tasks: {e}")
+            return {}
+
+    def task_fingerprints(self) -> Dict[int, Tuple[str, str]]:
+        """现有任务的触发器描述和名称"""
+        fingerprints = {}
+        for member, definition in self.client.hgetall(self.tasks_key).items():
+            definition = json.loads(definition)
+            trigger = self._trigger_for(definition['cron'], definition.get('offset', 0))
+            fingerprints[int(member)] = (str(trigger), definition['name'])
+        return fingerprints
+
+    def _apply_reconcile(self, adds: List[Tuple[int, str, str, int]], renames: List[Tuple[int, str, str, int]], removes: List[int]):
+        """在一个pipeline中批量注册和移除任务；未变化的任务保留现有排期"""
+        pipeline = self.client.pipeline(transaction=False)
+        now = time.time()
+        renamed = {task_id for task_id, *_ in renames}
+        for task_id, cron_schedule, name, spread in adds + renames:
+            try:
+                offset_seconds = spread_offset(task_id, spread)
+                trigger = self._trigger_for(cron_schedule, offset_seconds)
+                definition = json.dumps({"cron": cron_schedule, "name": name, "offset": offset_seconds}, sort_keys=True)
+                self._register(
+                    keys=[self.schedule_key, self.leases_key, self.tasks_key],
+                    args=[task_id, definition, self._next_fire_timestamp(trigger, now), int(task_id in renamed)],
+                    client=pipeline
+                )
+            except Exception as e:
+                logger.error(f"Failed to add task {task_id}: {e}")
+        for task_id in removes:
+            pipeline.hdel(self.tasks_key, task_id)
+            pipeline.zrem(self.schedule_key, task_id)
+            pipeline.hdel(self.leases_key, task_id)
+        pipeline.execute()
+
+    def _status(self, task_id: int, definition, score, lease) -> Dict[str, Any]:
+        definition = json.loads(definition)
+        status = {
+            'task_id': task_id,
+            'exists': True,
+            'running': True,
+            'name': definition['name'],
+            'trigger': definition['cron'],
+            'offset_seconds': definition.get('offset', 0),
+            'executing': lease is not None,
+        }
+        if lease is not None:
+            lease = lease.decode() if isinstance(lease, bytes) else lease
+            status['next_run'] = None
+            status['lease_owner'] = lease.rsplit(':', 2)[0]
+            status['lease_expires'] = datetime.fromtimestamp(score).isoformat() if score is not None else None
+        else:
+            status['next_run'] = datetime.fromtimestamp(score).isoformat() if score is not None else None
+        return status
+
+    def _poll_loop(self):
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                self._renew_leases()
+                claimed = self._claim_due_tasks()
+            except Exception as e:
+                logger.error(f"Redis scheduler poll failed: {e}")
+            # 领取数达到批量上限说明还有积压，立即继续领取
+            if claimed < self.claim_batch:
+                self._stop.wait(self.poll_interval)
+
+    def _claim_due_tasks(self) -> int:
+        # 开启公平派发时多领取一倍，慢数据源的任务在本地排队时其他数据源的任务仍能被领取
+        capacity = self.max_workers * 2 if self.dispatcher is not None else self.max_workers
+        with self._lock:
+            free = capacity - len(self._in_flight)
+        if free <= 0:
+            return 0
+
+        now = time.time()
+        result = self._claim(
+            keys=[self.schedule_key, self.leases_key],
+            args=[now, now + self.lease_ttl, min(free, self.claim_batch), self.node_id]
+        )
+        claimed = 0
+        for index in range(0, len(result), 4):
+            member, lease, fire_at, recovered = (self._decode(value) for value in result[index:index + 4])
+            task_id = int(member)
+            if recovered == '1':
+                logger.warning(f"Recovered expired lease for task {task_id} (scheduled at {datetime.fromtimestamp(float(fire_at))})")
+            with self._lock:
+                self._in_flight[lease] = (task_id, fire_at)
+            self._dispatch(task_id, lease, float(fire_at))
+            claimed += 1
+        return claimed
+
+    def _dispatch(self, task_id: int, lease: str, fire_at: float):
+        logger.info(f"Executing task {task_id} via redis scheduler")
+        future = self.submit_execution(task_id)
+        future.add_done_callback(lambda _: self._finish(task_id, lease, fire_at))
+
+    def _finish(self, task_id: int, lease: str, fire_at: float):
+        """释放租约并排入下一次触发；执行期间错过的触发不再补跑"""
+        try:
+            definition = self.client.hget(self.tasks_key, task_id)
+            next_due = ''
+            if definition is not None:
+                definition = json.loads(definition)
+                trigger = self._trigger_for(definition['cron'], definition.get('offset', 0))
+                next_due = self._next_fire_timestamp(trigger, max(fire_at + 1, time.time()))
+            completed = self._complete(keys=[self.schedule_key, self.leases_key, self.tasks_key], args=[task_id, lease, next_due])
+            # 执行期间任务被移除时租约已一并删除，不需要告警
+            if not completed and definition is not None:
+                logger.warning(f"Lease for task {task_id} was lost before completion, not rescheduling")
+        except Exception as e:
+            logger.error(f"Failed to complete task {task_id}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.pop(lease, None)
+
+    def _renew_leases(self):
+        now = time.time()
+        if now - self._last_heartbeat < self.lease_ttl / 3:
+            return
+        self._last_heartbeat = now
+        with self._lock:
+            in_flight = list(self._in_flight.items())
+        for lease, (task_id, _) in in_flight:
+            if not self._heartbeat(keys=[self.schedule_key, self.leases_key], args=[task_id, lease, now + self.lease_ttl]):
+                logger.warning(f"Lease for task {task_id} was taken over by another node")
+
+    def _trigger_for(self, cron_schedule: str, offset_seconds: int = 0):
+        key = (cron_schedule, offset_seconds)
+        trigger = self._triggers.get(key)
+        if trigger is None:
+            trigger = self._parse_cron_trigger(cron_schedule, offset_seconds)
+            self._triggers[key] = trigger
+        return trigger
+
+    @staticmethod
+    def _next_fire_timestamp(trigger, after: float) -> float:
+        """after 之后(含)的下一次触发时间戳"""
+        now = datetime.fromtimestamp(after, trigger.timezone)
+        next_fire = trigger.get_next_fire_time(None, now)
+        return next_fire.timestamp() if next_fire else float('inf')
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else str(value)
@@ -0,0 +1,98 @@
+import logging
+import zlib
+from datetime import timedelta, timezone
+
+from apscheduler.triggers.cron import CronTrigger
+
+logger = logging.getLogger(__name__)
+
+
+def spread_offset(task_id: int, spread_window_seconds: int) -> int:
+    """按任务ID的哈希在 [0, spread_window_seconds) 内取一个固定偏移，重启后保持不变"""
+    if not spread_window_seconds or spread_window_seconds <= 0:
+        return 0
+    return zlib.crc32(str(task_id).encode("utf-8")) % int(spread_window_seconds)
+
+
+class SpreadCronTrigger(CronTrigger):
+    """在cron触发时间基础上固定顺延 offset_seconds 秒
+
+    例如 0 * * * * 配合 300 秒的分散窗口，任务会固定在每小时前5分钟内的某一秒触发，
+    同一时刻到期的大量任务因此被打散到整个窗口内。
+    """
+
+    def __init__(self, *args, offset_seconds: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.offset_seconds = offset_seconds
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        offset = timedelta(seconds=self.offset_seconds)
+        if previous_fire_time is not None:
+            previous_fire_time = self._shift(previous_fire_time, -offset)
+        next_fire_time = super().get_next_fire_time(previous_fire_time, self._shift(now, -offset))
+        return self._shift(next_fire_time, offset) if next_fire_time else None
+
+    def _shift(self, value, delta: timedelta):
+        # 在UTC上加减，避免夏令时切换附近的本地时间歧义
+        return (value.astimezone(timezone.utc) + delta).astimezone(self.timezone)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['offset_seconds'] = self.offset_seconds
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self.offset_seconds = state.pop('offset_seconds', 0)
+        super().__setstate__(state)
+
+    def __str__(self):
+        return f"{super().__str__()} +{self.offset_seconds}s"
+
+    def __repr__(self):
+        return f"{super().__repr__()[:-1]}, offset_seconds={self.offset_seconds}>"
+
+
+def parse_cron_trigger(cron_schedule: str, offset_seconds: int = 0) -> CronTrigger:
+    """解析Cron表达式并创建触发器
+
+    Args:
+        cron_schedule: Cron表达式，格式: 分 时 日 月 周
+        offset_seconds: 在每次触发时间上顺延的秒数
+
+    Returns:
+        CronTrigger对象，offset_seconds 大于0时为 SpreadCronTrigger
+    """
+    try:
+        parts = cron_schedule.strip().split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron schedule must have 5 parts: {cron_schedule}")
+
+        minute, hour, day, month, day_of_week = parts
+
+        # 转换特殊字符
+        def _convert_cron_field(field, field_name):
+            if field == '*':
+                # 对于APScheduler，'*'表示所有值，而不是None
+                return '*'
+            return field
+
+        fields = dict(
+            minute=_convert_cron_field(minute, 'minute'),
+            hour=_convert_cron_field(hour, 'hour'),
+            day=_convert_cron_field(day, 'day'),
+            month=_convert_cron_field(month, 'month'),
+            day_of_week=_convert_cron_field(day_of_week, 'day_of_week')
+        )
+        if offset_seconds:
+            return SpreadCronTrigger(offset_seconds=offset_seconds, **fields)
+        return CronTrigger(**fields)
+
+    except Exception as e:
+        logger.error(f"Failed to parse cron schedule '{cron_schedule}': {e}")
+        raise ValueError(f"Invalid cron schedule: {cron_schedule}")
+
+
+def build_task_trigger(task_id: int, cron_schedule: str, spread_window_seconds: int = 0) -> CronTrigger:
+    """创建任务的触发器，配置了分散窗口时按任务ID的哈希顺延"""
+    return parse_cron_trigger(cron_schedule, spread_offset(task_id, spread_window_seconds))
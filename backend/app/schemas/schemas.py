@@ -1,8 +1,11 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, Dict, Optional, List, Literal
+import json
+from datetime import date, datetime
 from enum import Enum
 
+from app.services.expression import validate_expression
+
 class UserRole(str, Enum):
     SYSTEM_ADMIN = "SYSTEM_ADMIN"
     PROJECT_ADMIN = "PROJECT_ADMIN"
@@ -64,6 +67,7 @@ class DataSourceBase(BaseModel):
     password: str
     description: Optional[str] = None
     is_active: bool = True
+    result_cache_ttl: Optional[int] = Field(None, ge=0, description="Seconds to cache expected_sql results")
 
 class DataSourceCreate(DataSourceBase):
     pass
@@ -78,12 +82,16 @@ class DataSourceUpdate(BaseModel):
     password: Optional[str] = None
     description: Optional[str] = None
     is_active: Optional[bool] = None
+    result_cache_ttl: Optional[int] = Field(None, ge=0)
 
 class DataSource(DataSourceBase):
     id: int
     created_by: int
     created_at: datetime
     status: str = "active"
+    latency_ms: Optional[int] = None
+    checked_at: Optional[datetime] = None
+    circuit_state: str = "closed"
     
     class Config:
         from_attributes = True
@@ -95,11 +103,31 @@ class InspectionTaskBase(BaseModel):
     expected_sql: str = Field(..., description="SQL query that returns a single value")
     check_expression: str = Field(..., description="Expression to compare check and expected values")
     cron_schedule: str = Field(..., description="Cron schedule for task execution")
+    expected_cache_ttl: Optional[int] = Field(None, ge=0, description="Seconds to cache the expected_sql result")
+    check_mode: Literal["scalar", "grouped"] = Field(
+        "scalar",
+        description="scalar: each SQL returns one value; grouped: each SQL returns (key..., value) rows compared per key"
+    )
+    spread_window_seconds: int = Field(
+        0, ge=0, le=86400,
+        description="Delay each cron tick by a fixed, task-id derived offset within this window (seconds)"
+    )
+    max_retries: Optional[int] = Field(None, ge=0, le=10, description="Retries after transient errors, default RETRY_MAX_RETRIES")
+    retry_backoff_seconds: Optional[int] = Field(None, ge=1, le=3600, description="Delay before the first retry, doubled on each further retry")
+    priority: Literal["critical", "high", "normal", "low"] = Field(
+        "normal",
+        description="Dispatch priority under load; critical tasks also get reserved execution slots"
+    )
     status: str = "active"
 
 class InspectionTaskCreate(InspectionTaskBase):
     data_source_id: int
     project_id: int
+    
+    @field_validator("check_expression")
+    @classmethod
+    def validate_check_expression(cls, value):
+        return validate_expression(value)
 
 class InspectionTaskUpdate(BaseModel):
     name: Optional[str] = None
@@ -108,8 +136,19 @@ class InspectionTaskUpdate(BaseModel):
     expected_sql: Optional[str] = None
     check_expression: Optional[str] = None
     cron_schedule: Optional[str] = None
+    expected_cache_ttl: Optional[int] = Field(None, ge=0)
+    check_mode: Optional[Literal["scalar", "grouped"]] = None
+    spread_window_seconds: Optional[int] = Field(None, ge=0, le=86400)
+    max_retries: Optional[int] = Field(None, ge=0, le=10)
+    retry_backoff_seconds: Optional[int] = Field(None, ge=1, le=3600)
+    priority: Optional[Literal["critical", "high", "normal", "low"]] = None
     status: Optional[str] = None
     data_source_id: Optional[int] = None
+    
+    @field_validator("check_expression")
+    @classmethod
+    def validate_check_expression(cls, value):
+        return value if value is None else validate_expression(value)
 
 class InspectionTask(InspectionTaskBase):
     id: int
@@ -130,6 +169,77 @@ class InspectionResult(BaseModel):
     check_passed: bool
     execution_time: datetime
     error_message: Optional[str] = None
+    check_duration_ms: Optional[int] = None
+    expected_duration_ms: Optional[int] = None
+    duration_ms: Optional[int] = None
+    group_summary: Optional[Dict[str, Any]] = None
+    window_start: Optional[datetime] = None
+    backfill_id: Optional[int] = None
+    
+    @field_validator("group_summary", mode="before")
+    @classmethod
+    def parse_group_summary(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+    
+    class Config:
+        from_attributes = True
+
+class DeadLetter(BaseModel):
+    id: int
+    task_id: int
+    result_id: Optional[int] = None
+    attempts: int
+    error_message: Optional[str] = None
+    window_start: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class TaskDependencyCreate(BaseModel):
+    upstream_task_id: Optional[int] = Field(None, description="Run after this task completes with a passing result")
+    signal_name: Optional[str] = Field(None, min_length=1, max_length=200, description="Run after this external signal is marked ready")
+
+class TaskDependency(BaseModel):
+    id: int
+    task_id: int
+    upstream_task_id: Optional[int] = None
+    signal_name: Optional[str] = None
+    consumed_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class DependencySignal(BaseModel):
+    id: int
+    name: str
+    signaled_at: datetime
+    signal_count: int
+    
+    class Config:
+        from_attributes = True
+
+class BackfillCreate(BaseModel):
+    start_date: date = Field(..., description="First day to backfill (inclusive)")
+    end_date: date = Field(..., description="Last day to backfill (inclusive)")
+    max_parallel: Optional[int] = Field(None, ge=1, description="Windows of this backfill executed at the same time")
+
+class BackfillRun(BaseModel):
+    id: int
+    task_id: int
+    start_date: date
+    end_date: date
+    status: str
+    max_parallel: Optional[int] = None
+    total_windows: int
+    passed_windows: int = 0
+    failed_windows: int = 0
+    error_windows: int = 0
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
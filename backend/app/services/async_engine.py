@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.drivers import get_driver
+from app.services.circuit_breaker import circuit_breakers
+from app.services.connection_pool import connection_fingerprint, data_source_type_name
+from app.services.result_cache import result_cache
+from app.services.sql_template import render_task_sql, task_window
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncInspectionEngine:
+    """基于asyncio的巡检执行引擎
+
+    单个事件循环(运行在独立线程中)驱动所有在途的检查SQL，SQL执行使用各驱动的
+    异步实现(aiomysql / asyncpg / asynch)，不会为每个在途查询占用一个系统线程。每个数据源
+    有独立的信号量限制并发查询数；元数据库的读写仍是同步的SQLAlchemy操作，放到
+    默认线程池中执行。
+    """
+
+    def __init__(self, source_concurrency: Optional[int] = None):
+        self.source_concurrency = source_concurrency or settings.ASYNC_ENGINE_SOURCE_CONCURRENCY
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._pools: Dict[int, Tuple[Tuple, Any]] = {}
+        self._pool_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self):
+        """启动事件循环线程"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+
+            def _run_loop():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=_run_loop, name="async-inspection-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+            logger.info("Async inspection engine started")
+
+    def shutdown(self):
+        """关闭所有异步连接池并停止事件循环"""
+        with self._lock:
+            if self._thread is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_pools(), self._loop).result(timeout=30)
+            except Exception as e:
+                logger.error(f"Failed to close async connection pools: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=30)
+            self._loop.close()
+            self._thread = None
+            self._loop = None
+            self._semaphores.clear()
+            self._pool_lock = None
+            logger.info("Async inspection engine shutdown successfully")
+
+    def submit(self, task_id: int, window=None, attempt: int = 1, backfill_id: Optional[int] = None) -> Future:
+        """提交一个任务执行，立即返回，不阻塞调用线程；参数与 InspectionTaskService.execute_task 相同"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self.execute_task(task_id, window, attempt, backfill_id), self._loop)
+        future.add_done_callback(lambda f: self._log_outcome(task_id, f))
+        return future
+
+    async def execute_task(self, task_id: int, window=None, attempt: int = 1, backfill_id: Optional[int] = None):
+        loop = asyncio.get_running_loop()
+        task, data_source = await loop.run_in_executor(None, self._load_task, task_id, window)
+        if task.check_mode == "grouped":
+            # 多行检查没有异步实现，交给同步执行路径
+            return await loop.run_in_executor(None, self._execute_sync, task_id, window, attempt, backfill_id)
+
+        started = time.perf_counter()
+        try:
+            if data_source is None:
+                raise ValueError("Data source not found")
+            check_value, expected_value, timings = await self._execute_check_and_expected(data_source, task)
+        except Exception as e:
+            return await loop.run_in_executor(
+                None, self._record_error, task_id, str(e), self._elapsed_ms(started), task.window, e, attempt, backfill_id
+            )
+
+        return await loop.run_in_executor(
+            None, self._record_result, task_id, check_value, expected_value, timings, self._elapsed_ms(started),
+            task.window, backfill_id
+        )
+
+    async def _execute_check_and_expected(self, data_source, task):
+        """与 InspectionTaskService._execute_check_and_expected 语义一致"""
+        from app.services.services import queries_are_independent
+
+        if task.check_sql.strip() == task.expected_sql.strip():
+            value, elapsed = await self._timed_sql(data_source, task.check_sql)
+            return value, value, {"check": elapsed, "expected": 0}
+
+        ttl = task.expected_cache_ttl
+        if settings.INSPECTION_QUERY_MODE == "parallel" and queries_are_independent(task.check_sql, task.expected_sql):
+            (check_value, check_elapsed), (expected_value, expected_elapsed) = await asyncio.gather(
+                self._timed_sql(data_source, task.check_sql),
+                self._timed_cached_sql(data_source, task.expected_sql, ttl),
+            )
+        else:
+            async with self._connection(data_source) as connection:
+                check_value, check_elapsed = await self._timed_sql(data_source, task.check_sql, connection)
+                expected_value, expected_elapsed = await self._timed_cached_sql(data_source, task.expected_sql, ttl, connection)
+
+        return check_value, expected_value, {"check": check_elapsed, "expected": expected_elapsed}
+
+    async def _timed_cached_sql(self, data_source, sql_query: str, ttl: int, connection=None):
+        """期望SQL经过 result_cache，与同步执行路径共享缓存项和 single-flight
+
+        result_cache 是同步接口，查找放到默认线程池中执行；未命中时查询仍在事件循环上执行。
+        """
+        if ttl <= 0:
+            return await self._timed_sql(data_source, sql_query, connection)
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        value = await loop.run_in_executor(
+            None, result_cache.get_or_load, data_source.id, sql_query, ttl,
+            lambda: asyncio.run_coroutine_threadsafe(self._execute_sql(data_source, sql_query, connection), loop).result()
+        )
+        return value, self._elapsed_ms(started)
+
+    async def _timed_sql(self, data_source, sql_query: str, connection=None):
+        started = time.perf_counter()
+        value = await self._execute_sql(data_source, sql_query, connection)
+        return value, self._elapsed_ms(started)
+
+    async def _execute_sql(self, data_source, sql_query: str, connection=None) -> Any:
+        if connection is None:
+            async with self._connection(data_source) as connection:
+                return await self._execute_sql(data_source, sql_query, connection)
+
+        try:
+            return await get_driver(data_source.type).execute_scalar_async(connection, sql_query)
+        except Exception as e:
+            raise ValueError(f"SQL execution failed: {str(e)}")
+
+    def _connection(self, data_source):
+        return _PooledConnection(self, data_source)
+
+    def _semaphore_for(self, data_source_id: int) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(data_source_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.source_concurrency)
+            self._semaphores[data_source_id] = semaphore
+        return semaphore
+
+    async def _get_pool(self, data_source):
+        """获取数据源的异步连接池，连接配置变化时重建"""
+        fingerprint = connection_fingerprint(data_source)
+        entry = self._pools.get(data_source.id)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            entry = self._pools.get(data_source.id)
+            if entry and entry[0] == fingerprint:
+                return entry[1]
+            if entry:
+                await self._close_pool(entry[1])
+
+            pool = await get_driver(data_source.type).create_async_pool(data_source, self.source_concurrency)
+            self._pools[data_source.id] = (fingerprint, pool)
+            return pool
+
+    async def _close_pool(self, pool):
+        try:
+            # asyncpg 的 close() 是协程，aiomysql / asynch 需要再等待 wait_closed()
+            closing = pool.close()
+            if asyncio.iscoroutine(closing):
+                await closing
+            if hasattr(pool, "wait_closed"):
+                await pool.wait_closed()
+        except Exception as e:
+            logger.debug(f"Error closing async pool: {e}")
+
+    async def _close_pools(self):
+        for _, pool in list(self._pools.values()):
+            await self._close_pool(pool)
+        self._pools.clear()
+
+    def _load_task(self, task_id: int, window=None):
+        """在线程池中读取任务和数据源，返回与会话解绑的快照"""
+        from app.core.database import SessionLocal
+        from app.models.models import DataSource, InspectionTask
+        from app.services.services import InspectionTaskService
+
+        db = SessionLocal()
+        try:
+            task = db.query(InspectionTask).filter(InspectionTask.id == task_id).first()
+            if not task:
+                raise ValueError("Task not found")
+            # 带时间窗口参数的SQL在这里替换为本次执行窗口的SQL
+            window = task_window(task.check_sql, task.expected_sql, window)
+            check_sql, expected_sql = render_task_sql(task.check_sql, task.expected_sql, window)
+            data_source = db.query(DataSource).filter(DataSource.id == task.data_source_id).first()
+            task_snapshot = SimpleNamespace(
+                id=task.id,
+                check_sql=check_sql,
+                expected_sql=expected_sql,
+                check_mode=task.check_mode,
+                # 与同步路径相同：任务配置优先，其次数据源配置，最后是全局默认值
+                expected_cache_ttl=InspectionTaskService(db)._expected_cache_ttl(data_source, task) if data_source else 0,
+                window=window,
+            )
+            if not data_source:
+                return task_snapshot, None
+            data_source_snapshot = SimpleNamespace(
+                id=data_source.id,
+                type=data_source_type_name(data_source),
+                host=data_source.host,
+                port=data_source.port,
+                database=data_source.database,
+                username=data_source.username,
+                password=data_source.password,
+            )
+            return task_snapshot, data_source_snapshot
+        finally:
+            db.close()
+
+    def _execute_sync(self, task_id: int, window=None, attempt: int = 1, backfill_id: Optional[int] = None):
+        from app.core.database import SessionLocal
+        from app.services.services import InspectionTaskService
+
+        db = SessionLocal()
+        try:
+            return InspectionTaskService(db).execute_task(task_id, window=window, backfill_id=backfill_id, attempt=attempt)
+        finally:
+            db.close()
+
+    def _record_result(self, task_id: int, check_value, expected_value, timings, duration_ms: int, window=None,
+                       backfill_id: Optional[int] = None):
+        from app.core.database import SessionLocal
+        from app.services.services import InspectionTaskService
+
+        db = SessionLocal()
+        try:
+            service = InspectionTaskService(db)
+            return service.record_result(
+                service.get_task(task_id), check_value, expected_value, timings, duration_ms, window, backfill_id
+            )
+        finally:
+            db.close()
+
+    def _record_error(self, task_id: int, error_message: str, duration_ms: int, window=None, error=None,
+                      attempt: int = 1, backfill_id: Optional[int] = None):
+        from app.core.database import SessionLocal
+        from app.services.services import InspectionTaskService
+
+        db = SessionLocal()
+        try:
+            service = InspectionTaskService(db)
+            return service.record_error(
+                service.get_task(task_id), error_message, duration_ms, window, backfill_id, error, attempt
+            )
+        finally:
+            db.close()
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> int:
+        return int(round((time.perf_counter() - started) * 1000))
+
+    @staticmethod
+    def _log_outcome(task_id: int, future: Future):
+        try:
+            result = future.result()
+            if result is None:
+                logger.info(f"Task {task_id} hit a transient error, retry scheduled")
+            else:
+                logger.info(f"Task {task_id} executed successfully: {result.check_passed}")
+        except Exception as e:
+            logger.error(f"Failed to execute task {task_id}: {e}")
+
+
+class _PooledConnection:
+    """在数据源信号量保护下从异步连接池借出一个连接"""
+
+    def __init__(self, engine: AsyncInspectionEngine, data_source):
+        self.engine = engine
+        self.data_source = data_source
+        self._semaphore = None
+        self._pool = None
+        self._connection = None
+
+    async def __aenter__(self):
+        # 熔断检查放在信号量之前，熔断中的数据源不占用并发名额
+        circuit_breakers.before_call(self.data_source.id)
+        self._semaphore = self.engine._semaphore_for(self.data_source.id)
+        await self._semaphore.acquire()
+        try:
+            self._pool = await self.engine._get_pool(self.data_source)
+            self._connection = await self._pool.acquire()
+        except Exception as e:
+            self._semaphore.release()
+            circuit_breakers.record_outcome(self.data_source, e)
+            raise
+        return self._connection
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self._pool.release(self._connection)
+        finally:
+            self._semaphore.release()
+            if exc_type is None or issubclass(exc_type, Exception):
+                circuit_breakers.record_outcome(self.data_source, exc)
+
+
+async_engine = AsyncInspectionEngine()
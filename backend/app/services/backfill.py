@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import BackfillRun, InspectionResult, InspectionTask
+from app.schemas.schemas import BackfillCreate
+from app.services.sql_template import TimeWindow, as_utc, day_windows, has_parameters
+
+
+class BackfillService:
+    """历史回填的创建、领取和进度
+
+    回填由运行调度器的进程中的 backfill_runner 执行。领取时用条件UPDATE加租约，
+    执行回填的进程宕机后租约过期，其他进程(或重启后的进程)从尚未完成的窗口接着执行。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_backfill(self, task_id: int, backfill: BackfillCreate, created_by: Optional[int] = None) -> BackfillRun:
+        """创建回填，[start_date, end_date] 每天一个窗口；任务SQL中没有时间窗口参数时抛出 ValueError"""
+        task = self.db.query(InspectionTask).filter(InspectionTask.id == task_id).first()
+        if not task:
+            raise ValueError("Task not found")
+        if not (has_parameters(task.check_sql) or has_parameters(task.expected_sql)):
+            raise ValueError("Task SQL has no time window parameters such as {{ds}}, backfill would repeat the same query")
+        if backfill.end_date < backfill.start_date:
+            raise ValueError("end_date must not be earlier than start_date")
+        total_windows = (backfill.end_date - backfill.start_date).days + 1
+        if total_windows > settings.BACKFILL_MAX_WINDOWS:
+            raise ValueError(f"Backfill covers {total_windows} days, at most {settings.BACKFILL_MAX_WINDOWS} are allowed")
+
+        run = BackfillRun(
+            task_id=task_id,
+            start_date=backfill.start_date,
+            end_date=backfill.end_date,
+            status="pending",
+            max_parallel=backfill.max_parallel,
+            total_windows=total_windows,
+            created_by=created_by
+        )
+        self.db.add(run)
+        self.db.commit()
+        self.db.refresh(run)
+        return run
+
+    def get_backfill(self, backfill_id: int) -> Optional[BackfillRun]:
+        return self.db.query(BackfillRun).filter(BackfillRun.id == backfill_id).first()
+
+    def get_backfills(self, task_id: int) -> List[BackfillRun]:
+        return self.db.query(BackfillRun).filter(BackfillRun.task_id == task_id).order_by(BackfillRun.id.desc()).all()
+
+    def get_backfill_results(self, backfill_id: int) -> List[InspectionResult]:
+        return self.db.query(InspectionResult).filter(
+            InspectionResult.backfill_id == backfill_id
+        ).order_by(InspectionResult.window_start).all()
+
+    def cancel_backfill(self, backfill_id: int) -> BackfillRun:
+        """取消回填，执行中的窗口完成后不再提交新的窗口"""
+        run = self._require(backfill_id)
+        if run.status not in ("pending", "running"):
+            raise ValueError(f"Backfill is already {run.status}")
+        run.status = "cancelled"
+        run.finished_at = datetime.now(timezone.utc)
+        self.db.commit()
+        self.db.refresh(run)
+        return run
+
+    def resume_backfill(self, backfill_id: int) -> BackfillRun:
+        """恢复失败或已取消的回填，只执行还没有结果和执行出错的窗口"""
+        run = self._require(backfill_id)
+        if run.status not in ("failed", "cancelled"):
+            raise ValueError(f"Backfill is {run.status}, only failed or cancelled backfills can be resumed")
+        run.status = "pending"
+        run.finished_at = None
+        run.lease_owner = None
+        run.lease_expires_at = None
+        self.db.commit()
+        self.db.refresh(run)
+        return run
+
+    def claim_backfills(self, owner: str, lease_ttl: int, limit: int) -> List[int]:
+        """领取等待执行或租约已过期的回填，并清掉这些回填中执行出错的窗口结果以便重新执行"""
+        if limit <= 0:
+            return []
+        now = datetime.now(timezone.utc)
+        claimable = or_(
+            BackfillRun.status == "pending",
+            and_(BackfillRun.status == "running", BackfillRun.lease_expires_at < now)
+        )
+        candidates = [
+            row.id for row in self.db.query(BackfillRun.id).filter(claimable).order_by(BackfillRun.id).limit(limit).all()
+        ]
+
+        claimed = []
+        for backfill_id in candidates:
+            updated = self.db.query(BackfillRun).filter(BackfillRun.id == backfill_id, claimable).update({
+                BackfillRun.status: "running",
+                BackfillRun.lease_owner: owner,
+                BackfillRun.lease_expires_at: now + timedelta(seconds=lease_ttl),
+                BackfillRun.started_at: func.coalesce(BackfillRun.started_at, now),
+            }, synchronize_session=False)
+            if updated:
+                claimed.append(backfill_id)
+        if claimed:
+            self.db.query(InspectionResult).filter(
+                InspectionResult.backfill_id.in_(claimed),
+                InspectionResult.error_message.isnot(None)
+            ).delete(synchronize_session=False)
+        self.db.commit()
+        return claimed
+
+    def pending_windows(self, run: BackfillRun) -> List[TimeWindow]:
+        """尚未成功执行的窗口；检查不通过也算已执行"""
+        executed = {
+            as_utc(row.window_start) for row in self.db.query(InspectionResult.window_start).filter(
+                InspectionResult.backfill_id == run.id,
+                InspectionResult.error_message.is_(None)
+            ).all() if row.window_start is not None
+        }
+        return [
+            window for window in day_windows(run.start_date, run.end_date)
+            if window.start.astimezone(timezone.utc) not in executed
+        ]
+
+    def renew_backfill(self, backfill_id: int, owner: str, lease_ttl: int) -> bool:
+        """续租并写回进度；回填已被取消或被其他进程接管时返回False"""
+        updated = self._owned(backfill_id, owner).update(dict(
+            self._progress(backfill_id),
+            lease_expires_at=datetime.now(timezone.utc) + timedelta(seconds=lease_ttl)
+        ), synchronize_session=False)
+        self.db.commit()
+        return bool(updated)
+
+    def finish_backfill(self, backfill_id: int, owner: str) -> Optional[str]:
+        """所有窗口执行完后结束回填：有窗口执行出错时为 failed，可以恢复重试"""
+        progress = self._progress(backfill_id)
+        status = "failed" if progress["error_windows"] else "completed"
+        updated = self._owned(backfill_id, owner).update(dict(
+            progress,
+            status=status,
+            finished_at=datetime.now(timezone.utc),
+            lease_owner=None,
+            lease_expires_at=None
+        ), synchronize_session=False)
+        self.db.commit()
+        return status if updated else None
+
+    def release_backfill(self, backfill_id: int, owner: str) -> bool:
+        """进程停止时把执行中的回填放回等待状态，下次领取时从未完成的窗口继续"""
+        updated = self._owned(backfill_id, owner).update(dict(
+            self._progress(backfill_id),
+            status="pending",
+            lease_owner=None,
+            lease_expires_at=None
+        ), synchronize_session=False)
+        self.db.commit()
+        return bool(updated)
+
+    def _owned(self, backfill_id: int, owner: str):
+        return self.db.query(BackfillRun).filter(
+            BackfillRun.id == backfill_id,
+            BackfillRun.status == "running",
+            BackfillRun.lease_owner == owner
+        )
+
+    def _progress(self, backfill_id: int) -> Dict[str, int]:
+        executed = InspectionResult.error_message.is_(None)
+        passed, failed, errors = self.db.query(
+            func.count(case((and_(executed, InspectionResult.check_passed.is_(True)), 1))),
+            func.count(case((and_(executed, InspectionResult.check_passed.is_(False)), 1))),
+            func.count(case((InspectionResult.error_message.isnot(None), 1)))
+        ).filter(InspectionResult.backfill_id == backfill_id).one()
+        return {"passed_windows": passed, "failed_windows": failed, "error_windows": errors}
+
+    def _require(self, backfill_id: int) -> BackfillRun:
+        run = self.get_backfill(backfill_id)
+        if not run:
+            raise ValueError("Backfill not found")
+        return run
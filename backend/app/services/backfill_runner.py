@@ -0,0 +1,202 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.schedulers.dispatcher import DispatchQueueFullError
+from app.services.backfill import BackfillService
+from app.services.services import InspectionTaskService
+from app.services.sql_template import TimeWindow
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillRunner:
+    """执行历史回填
+
+    - 每 BACKFILL_POLL_INTERVAL 秒(创建或恢复回填后立即)领取等待执行和租约过期的回填
+    - 每个回填由一个协调线程把窗口逐个提交给调度器执行，与定时触发一样经过进程池和 TASK_TIMEOUT、
+      公平派发器或异步引擎(没有运行调度器时在共享线程池中执行)；同时执行的窗口数同时受回填的
+      max_parallel 和每个数据源的 BACKFILL_MAX_PARALLEL_PER_SOURCE 限制
+    - 协调线程定期续租并写回进度，回填被取消后不再提交新的窗口
+    - 进程停止时执行中的回填放回等待状态，已经有结果的窗口不会重复执行
+    """
+
+    def __init__(self, session_factory=None, poll_interval: Optional[float] = None, lease_ttl: Optional[int] = None,
+                 max_workers: Optional[int] = None, max_parallel_per_source: Optional[int] = None):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval or settings.BACKFILL_POLL_INTERVAL
+        self.lease_ttl = lease_ttl or settings.BACKFILL_LEASE_TTL
+        self.max_workers = max_workers or settings.BACKFILL_MAX_WORKERS
+        self.max_parallel_per_source = max_parallel_per_source or settings.BACKFILL_MAX_PARALLEL_PER_SOURCE
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.scheduler = None  # 由 SchedulerManager 在调度器启动后设置
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._source_slots: Dict[int, threading.BoundedSemaphore] = {}
+        self._runs: Dict[int, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, session_factory=None):
+        if session_factory is not None:
+            self.session_factory = session_factory
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="backfill")
+        self._thread = threading.Thread(target=self._run, name="backfill-runner", daemon=True)
+        self._thread.start()
+        logger.info(f"Backfill runner {self.node_id} started")
+
+    def shutdown(self):
+        """停止领取，等待执行中的窗口完成，把未完成的回填放回等待状态"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        with self._lock:
+            runs = list(self._runs.values())
+        # 所有回填共用一个等待期限，执行中的窗口最多再执行 TASK_TIMEOUT 秒
+        deadline = time.monotonic() + settings.TASK_TIMEOUT
+        for thread in runs:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._executor.shutdown(wait=True)
+        logger.info("Backfill runner shutdown successfully")
+
+    def notify(self):
+        """有新的或恢复的回填；未启动时(如API进程在 standalone 模式下)由调度进程按周期领取"""
+        if self._thread is not None:
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "node_id": self.node_id,
+                "active_backfills": sorted(self._runs),
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._claim()
+            except Exception as e:
+                logger.error(f"Failed to claim backfills: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self):
+        with self._lock:
+            capacity = self.max_workers - len(self._runs)
+        claimed = self._call("claim_backfills", self.node_id, self.lease_ttl, capacity)
+        for backfill_id in claimed:
+            thread = threading.Thread(target=self._drive, args=(backfill_id,), name=f"backfill-{backfill_id}", daemon=True)
+            with self._lock:
+                self._runs[backfill_id] = thread
+            thread.start()
+
+    def _drive(self, backfill_id: int):
+        try:
+            db = self.session_factory()
+            try:
+                service = BackfillService(db)
+                run = service.get_backfill(backfill_id)
+                task_id, data_source_id = run.task_id, run.task.data_source_id
+                max_parallel = run.max_parallel or self.max_parallel_per_source
+                pending = deque(service.pending_windows(run))
+                logger.info(f"Backfill {backfill_id} of task {task_id}: {len(pending)} of {run.total_windows} windows to execute")
+            finally:
+                db.close()
+
+            source_slots = self._source_slot(data_source_id)
+            in_flight: Dict[Future, TimeWindow] = {}
+            owned = True
+            next_renew = time.monotonic() + self.lease_ttl / 3
+            while in_flight or (pending and owned and not self._stop.is_set()):
+                while (pending and owned and not self._stop.is_set()
+                       and len(in_flight) < max_parallel and source_slots.acquire(blocking=False)):
+                    window = pending.popleft()
+                    future = self._submit_window(backfill_id, task_id, window)
+                    future.add_done_callback(lambda _: source_slots.release())
+                    in_flight[future] = window
+                if in_flight:
+                    done, _ = wait(list(in_flight), timeout=1.0, return_when=FIRST_COMPLETED)
+                    requeued = False
+                    for future in done:
+                        window = in_flight.pop(future)
+                        if future.cancelled() or isinstance(future.exception(), DispatchQueueFullError):
+                            # 调度器关闭时被取消或数据源的派发队列已满，窗口放回等待执行
+                            pending.appendleft(window)
+                            requeued = True
+                        elif future.exception() is not None:
+                            logger.error(f"Backfill {backfill_id} window {window.start:%Y-%m-%d} failed: {future.exception()}")
+                    if requeued:
+                        self._stop.wait(0.5)
+                else:
+                    # 数据源的并发额度被其他回填占满
+                    self._stop.wait(0.5)
+                if time.monotonic() >= next_renew:
+                    next_renew = time.monotonic() + self.lease_ttl / 3
+                    if owned and not self._call("renew_backfill", backfill_id, self.node_id, self.lease_ttl):
+                        logger.info(f"Backfill {backfill_id} was cancelled or taken over, stop submitting windows")
+                        owned = False
+
+            if not owned:
+                return
+            if pending:
+                self._call("release_backfill", backfill_id, self.node_id)
+                logger.info(f"Backfill {backfill_id} released with {len(pending)} windows left")
+            else:
+                status = self._call("finish_backfill", backfill_id, self.node_id)
+                logger.info(f"Backfill {backfill_id} finished: {status}")
+        except Exception as e:
+            logger.error(f"Backfill {backfill_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._runs.pop(backfill_id, None)
+
+    def _submit_window(self, backfill_id: int, task_id: int, window: TimeWindow) -> Future:
+        scheduler = self.scheduler
+        if scheduler is not None:
+            try:
+                return scheduler.submit_execution(task_id, window=window, backfill_id=backfill_id)
+            except RuntimeError:
+                # 调度器已关闭，在自己的线程池中执行
+                pass
+        return self._executor.submit(self._execute_window, backfill_id, task_id, window)
+
+    def _execute_window(self, backfill_id: int, task_id: int, window: TimeWindow):
+        db = self.session_factory()
+        try:
+            InspectionTaskService(db).execute_task(task_id, window=window, backfill_id=backfill_id)
+        finally:
+            db.close()
+
+    def _source_slot(self, data_source_id: int) -> threading.BoundedSemaphore:
+        with self._lock:
+            slots = self._source_slots.get(data_source_id)
+            if slots is None:
+                slots = threading.BoundedSemaphore(self.max_parallel_per_source)
+                self._source_slots[data_source_id] = slots
+            return slots
+
+    def _call(self, method: str, *args):
+        db = self.session_factory()
+        try:
+            return getattr(BackfillService(db), method)(*args)
+        finally:
+            db.close()
+
+
+# 全局回填执行器，在运行调度器的进程中启动
+backfill_runner = BackfillRunner()
@@ -0,0 +1,145 @@
+import logging
+import re
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import DataSource, InspectionResult, InspectionTask
+from app.drivers import get_driver
+from app.services.connection_pool import connection_pools
+from app.services.services import InspectionTaskService, queries_are_independent
+from app.services.sql_template import render_task_sql, task_window
+
+logger = logging.getLogger(__name__)
+
+# 只有普通查询可以作为标量子查询合并
+_BATCHABLE_PATTERN = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+class BatchInspectionExecutor:
+    """把同一数据源上同时到期的任务合并成一次往返执行
+
+    同一批任务的 check_sql / expected_sql 去重后作为标量子查询拼成一条多列语句：
+        SELECT (<sql_1>) AS q_0, (<sql_2>) AS q_1, ...
+    返回的一行结果再拆回每个任务的 InspectionResult。合并查询失败(如某条SQL
+    返回多行或多列、语法不支持子查询)时自动退回逐个任务执行，由单任务路径按
+    QUERY_RESULT_GUARD 检查结果形状。期望SQL配置了结果缓存的任务不参与合并，
+    走单任务路径读写 result_cache。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.task_service = InspectionTaskService(db)
+
+    def execute_tasks(self, task_ids: List[int]) -> List[InspectionResult]:
+        tasks = self.db.query(InspectionTask).filter(InspectionTask.id.in_(task_ids)).all()
+        found = {task.id for task in tasks}
+        missing = [task_id for task_id in task_ids if task_id not in found]
+        if missing:
+            logger.warning(f"Tasks not found, skipped from batch: {missing}")
+
+        groups: Dict[int, List[InspectionTask]] = defaultdict(list)
+        for task in tasks:
+            groups[task.data_source_id].append(task)
+
+        results = []
+        for data_source_id, group in groups.items():
+            results.extend(self._execute_group(data_source_id, group))
+        return results
+
+    def _execute_group(self, data_source_id: int, tasks: List[InspectionTask]) -> List[InspectionResult]:
+        data_source = self.db.query(DataSource).filter(DataSource.id == data_source_id).first()
+        batchable = [task for task in tasks if data_source and self._is_batchable(data_source, task)]
+        individual = [task for task in tasks if task not in batchable]
+
+        # 带时间窗口参数的任务先替换为本次窗口的SQL再合并
+        windows = {task.id: task_window(task.check_sql, task.expected_sql) for task in batchable}
+        sqls = {
+            task.id: tuple(self._normalize(sql) for sql in render_task_sql(task.check_sql, task.expected_sql, windows[task.id]))
+            for task in batchable
+        }
+
+        results = []
+        for start in range(0, len(batchable), settings.SCHEDULER_BATCH_MAX_TASKS):
+            chunk = batchable[start:start + settings.SCHEDULER_BATCH_MAX_TASKS]
+            if len(chunk) == 1:
+                individual.extend(chunk)
+                continue
+            try:
+                values, duration_ms = self._query_combined(data_source, [sqls[task.id] for task in chunk])
+            except Exception as e:
+                logger.warning(
+                    f"Combined query for {len(chunk)} tasks on data source {data_source_id} failed, "
+                    f"falling back to per-task execution: {e}"
+                )
+                individual.extend(chunk)
+                continue
+
+            for task in chunk:
+                # 每个任务单独保存，一个任务的表达式或保存失败不影响同一批的其他任务
+                try:
+                    result = self.task_service.record_result(
+                        task,
+                        values[sqls[task.id][0]],
+                        values[sqls[task.id][1]],
+                        # 检查SQL和期望SQL在同一次合并查询中执行，两者的耗时都是这次查询的耗时
+                        {"check": duration_ms, "expected": duration_ms},
+                        duration_ms,
+                        windows[task.id]
+                    )
+                except Exception as e:
+                    self.db.rollback()
+                    logger.error(f"Failed to record batched result of task {task.id}: {e}")
+                    result = self.task_service.record_error(task, str(e), duration_ms, windows[task.id])
+                if result is not None:
+                    results.append(result)
+
+        for task in individual:
+            result = self.task_service.execute_task(task.id)
+            if result is not None:
+                results.append(result)
+        return results
+
+    def _query_combined(self, data_source: DataSource, task_sqls: List[Tuple[str, str]]) -> Tuple[Dict[str, Any], int]:
+        """执行合并查询，task_sqls 为每个任务标准化后的 (check_sql, expected_sql)，返回 {标准化SQL: 值} 和耗时(毫秒)"""
+        # 相同的SQL(例如共用的期望基线)只查询一次
+        columns: "OrderedDict[str, str]" = OrderedDict()
+        for pair in task_sqls:
+            for normalized in pair:
+                if normalized not in columns:
+                    columns[normalized] = f"q_{len(columns)}"
+
+        combined_sql = "SELECT " + ", ".join(f"({sql}) AS {alias}" for sql, alias in columns.items())
+
+        started = time.perf_counter()
+        with connection_pools.connection(data_source) as connection:
+            row = get_driver(data_source.type).fetch_row(connection, combined_sql)
+        duration_ms = int(round((time.perf_counter() - started) * 1000))
+
+        if row is None or len(row) != len(columns):
+            raise ValueError(f"Combined query returned an unexpected row: {row!r}")
+        if any(isinstance(value, (tuple, list)) for value in row):
+            # ClickHouse 的多列标量子查询返回元组而不报错，退回单任务路径做结果形状检查
+            raise ValueError("Combined query returned a multi-column subquery value")
+
+        logger.info(f"Executed {len(task_sqls)} tasks on data source {data_source.id} in one round-trip ({duration_ms} ms)")
+        return dict(zip(columns.keys(), row)), duration_ms
+
+    @staticmethod
+    def _normalize(sql: str) -> str:
+        return sql.strip().rstrip(";").strip()
+
+    def _is_batchable(self, data_source: DataSource, task: InspectionTask) -> bool:
+        check_sql, expected_sql = self._normalize(task.check_sql), self._normalize(task.expected_sql)
+        return (
+            task.check_mode != "grouped"
+            and self.task_service._expected_cache_ttl(data_source, task) <= 0
+            and bool(_BATCHABLE_PATTERN.match(check_sql))
+            and bool(_BATCHABLE_PATTERN.match(expected_sql))
+            and ";" not in check_sql
+            and ";" not in expected_sql
+            and queries_are_independent(check_sql, expected_sql)
+        )
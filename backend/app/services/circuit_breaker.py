@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.drivers import get_driver
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """数据源熔断中，任务直接失败而不再尝试连接"""
+
+
+class CircuitBreaker:
+    """单个数据源的熔断器
+
+    - closed: 正常放行，连续 failure_threshold 次连接类失败后进入 open
+    - open: 直接拒绝，recovery_timeout 秒后进入 half_open
+    - half_open: 最多放行 half_open_max_calls 个试探请求，成功则恢复 closed，失败则重新 open
+
+    只有连接类错误(连接失败、超时、连接中断)计入失败；SQL本身的错误说明数据源可达，按成功处理。
+    """
+
+    def __init__(self, data_source_id: int, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int):
+        self.data_source_id = data_source_id
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._last_error: Optional[str] = None
+        self._last_failure_at: Optional[datetime] = None
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state_locked()
+
+    def before_call(self):
+        """请求放行检查，熔断中抛出 CircuitOpenError"""
+        with self._lock:
+            state = self._current_state_locked()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return
+            self._rejected += 1
+            retry_after = max(0, int(self._opened_at + self.recovery_timeout - time.monotonic()))
+            raise CircuitOpenError(
+                f"Circuit breaker open for data source {self.data_source_id} after {self._failures} "
+                f"consecutive connection failures, retry in {retry_after}s (last error: {self._last_error})"
+            )
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit breaker for data source {self.data_source_id} closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._half_open_calls = 0
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            state = self._current_state_locked()
+            self._failures += 1
+            self._last_error = str(error)[:500]
+            self._last_failure_at = datetime.utcnow()
+            if state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != OPEN:
+                    logger.warning(
+                        f"Circuit breaker for data source {self.data_source_id} opened after "
+                        f"{self._failures} consecutive connection failures: {self._last_error}"
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+    def release(self):
+        """放行的请求没有得到成败结论(如连接池等待超时)，归还试探名额"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._half_open_calls = 0
+            self._last_error = None
+        logger.info(f"Circuit breaker for data source {self.data_source_id} reset")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state_locked()
+            retry_after = None
+            if state == OPEN:
+                retry_after = max(0, int(self._opened_at + self.recovery_timeout - time.monotonic()))
+            return {
+                "data_source_id": self.data_source_id,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_after_seconds": retry_after,
+                "rejected_calls": self._rejected,
+                "last_error": self._last_error,
+                "last_failure_at": self._last_failure_at.isoformat() if self._last_failure_at else None,
+            }
+
+    def _current_state_locked(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"Circuit breaker for data source {self.data_source_id} half-open, allowing trial calls")
+        return self._state
+
+
+class CircuitBreakerRegistry:
+    """进程级熔断器注册表，按 DataSource.id 维护熔断器"""
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = None,
+        recovery_timeout: Optional[float] = None,
+        half_open_max_calls: Optional[int] = None,
+    ):
+        self.failure_threshold = settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+        self.recovery_timeout = recovery_timeout or settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT
+        self.half_open_max_calls = half_open_max_calls or settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS
+        self._breakers: Dict[int, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def get(self, data_source_id: int) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(data_source_id)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    data_source_id,
+                    self.failure_threshold,
+                    self.recovery_timeout,
+                    self.half_open_max_calls,
+                )
+                self._breakers[data_source_id] = breaker
+            return breaker
+
+    def state(self, data_source_id: int) -> str:
+        with self._lock:
+            breaker = self._breakers.get(data_source_id)
+        return breaker.state if breaker else CLOSED
+
+    def before_call(self, data_source_id: int):
+        if self.enabled:
+            self.get(data_source_id).before_call()
+
+    def record_outcome(self, data_source, error: Optional[BaseException] = None):
+        """按执行结果更新熔断器；error 为空或不是连接类错误时视为数据源可达"""
+        if not self.enabled:
+            return
+        breaker = self.get(data_source.id)
+        if error is not None and is_connection_error(data_source, error):
+            breaker.record_failure(error)
+        else:
+            breaker.record_success()
+
+    def release(self, data_source_id: int):
+        if self.enabled:
+            self.get(data_source_id).release()
+
+    def reset(self, data_source_id: int):
+        with self._lock:
+            breaker = self._breakers.get(data_source_id)
+        if breaker:
+            breaker.reset()
+
+    def remove(self, data_source_id: int):
+        with self._lock:
+            self._breakers.pop(data_source_id, None)
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.data_source_id: breaker.stats() for breaker in breakers}
+
+
+def is_connection_error(data_source, error: BaseException) -> bool:
+    """沿异常链判断是否为连接类错误(执行SQL的错误会被包装成 ValueError)"""
+    driver = get_driver(data_source.type)
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if driver.is_connection_error(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,281 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.drivers import get_driver
+from app.services.circuit_breaker import circuit_breakers
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(TimeoutError):
+    """等待可用连接超时"""
+
+
+def data_source_type_name(data_source) -> str:
+    """数据源类型可能是枚举(刚创建的对象)或字符串(从数据库加载)"""
+    return getattr(data_source.type, "value", data_source.type)
+
+
+def connection_fingerprint(data_source) -> Tuple:
+    """数据源连接相关字段的指纹，任意一项变化都需要重建连接池"""
+    return (
+        data_source_type_name(data_source),
+        data_source.host,
+        data_source.port,
+        data_source.database,
+        data_source.username,
+        data_source.password,
+    )
+
+
+class ConnectionPool:
+    """单个数据源的有界连接池
+
+    - 总连接数(空闲 + 借出)不超过 max_size，满时借用方最多等待 acquire_timeout 秒
+    - 空闲超过 idle_timeout 秒的连接会被关闭
+    - 借出前做存活检查，失效连接直接替换为新连接
+    """
+
+    def __init__(
+        self,
+        data_source_id: int,
+        data_source_type: str,
+        connect_config,
+        max_size: int,
+        idle_timeout: float,
+        acquire_timeout: float,
+    ):
+        self.data_source_id = data_source_id
+        self.data_source_type = data_source_type
+        self.connect_config = connect_config
+        self.driver = get_driver(data_source_type)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = deque()  # (connection, last_used)
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """借出一个连接"""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            connection = None
+            with self._cond:
+                expired = self._pop_expired_locked()
+                while True:
+                    if self._closed:
+                        raise RuntimeError(f"Connection pool for data source {self.data_source_id} is closed")
+                    if self._idle:
+                        # 后进先出，优先复用最近使用过的连接
+                        connection, _ = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Timed out waiting for a connection to data source {self.data_source_id}"
+                        )
+                    self._cond.wait(remaining)
+
+            for stale in expired:
+                self.driver.close(stale)
+
+            if connection is None:
+                try:
+                    return self.driver.connect(self.connect_config)
+                except Exception:
+                    self._discard_slot()
+                    raise
+
+            if self.driver.ping(connection):
+                return connection
+
+            logger.info(f"Dropping dead pooled connection for data source {self.data_source_id}")
+            self.driver.close(connection)
+            self._discard_slot()
+
+    def release(self, connection, discard: bool = False):
+        """归还连接，discard=True 时直接关闭"""
+        if not discard:
+            try:
+                self.driver.reset(connection)
+            except Exception as e:
+                logger.debug(f"Failed to reset pooled connection for data source {self.data_source_id}: {e}")
+                discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+                connection = None
+            self._cond.notify()
+
+        if connection is not None:
+            self.driver.close(connection)
+
+    def evict_idle(self):
+        """关闭空闲超时的连接"""
+        with self._cond:
+            expired = self._pop_expired_locked()
+        for connection in expired:
+            self.driver.close(connection)
+
+    def close(self):
+        """关闭连接池；已借出的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for connection in idle:
+            self.driver.close(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "data_source_id": self.data_source_id,
+                "type": self.data_source_type,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+    def _pop_expired_locked(self):
+        expired = []
+        cutoff = time.monotonic() - self.idle_timeout
+        # 空闲队列左侧是最久未使用的连接
+        while self._idle and self._idle[0][1] < cutoff:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            expired.append(connection)
+        return expired
+
+    def _discard_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+class ConnectionPoolRegistry:
+    """进程级连接池注册表，按 DataSource.id 维护连接池"""
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        acquire_timeout: Optional[float] = None,
+    ):
+        self.max_size = max_size or settings.CONNECTION_POOL_MAX_SIZE
+        self.idle_timeout = idle_timeout or settings.CONNECTION_POOL_IDLE_TIMEOUT
+        self.acquire_timeout = acquire_timeout or settings.CONNECTION_POOL_ACQUIRE_TIMEOUT
+        self._pools: Dict[int, Tuple[Tuple, ConnectionPool]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get_pool(self, data_source) -> ConnectionPool:
+        """获取数据源对应的连接池，连接配置变化时自动重建"""
+        fingerprint = connection_fingerprint(data_source)
+        stale = None
+        with self._lock:
+            entry = self._pools.get(data_source.id)
+            if entry and entry[0] == fingerprint:
+                return entry[1]
+            if entry:
+                stale = entry[1]
+            pool = ConnectionPool(
+                data_source_id=data_source.id,
+                data_source_type=data_source_type_name(data_source),
+                connect_config=SimpleNamespace(
+                    host=data_source.host,
+                    port=data_source.port,
+                    database=data_source.database,
+                    username=data_source.username,
+                    password=data_source.password,
+                ),
+                max_size=self.max_size,
+                idle_timeout=self.idle_timeout,
+                acquire_timeout=self.acquire_timeout,
+            )
+            self._pools[data_source.id] = (fingerprint, pool)
+
+        if stale:
+            logger.info(f"Connection settings changed for data source {data_source.id}, rebuilding pool")
+            stale.close()
+        return pool
+
+    @contextmanager
+    def connection(self, data_source):
+        """借出一个连接，用完自动归还；执行出错时丢弃该连接
+
+        数据源熔断中时直接抛出 CircuitOpenError，连接和执行结果会反馈给熔断器。
+        """
+        self._maybe_sweep()
+        circuit_breakers.before_call(data_source.id)
+        pool = self.get_pool(data_source)
+        try:
+            connection = pool.acquire()
+        except PoolTimeoutError:
+            # 本进程内的连接池排队，不代表数据源不可用
+            circuit_breakers.release(data_source.id)
+            raise
+        except Exception as e:
+            circuit_breakers.record_outcome(data_source, e)
+            raise
+
+        try:
+            yield connection
+        except Exception as e:
+            pool.release(connection, discard=True)
+            circuit_breakers.record_outcome(data_source, e)
+            raise
+        else:
+            pool.release(connection)
+            circuit_breakers.record_outcome(data_source)
+
+    def invalidate(self, data_source_id: int):
+        """关闭并移除数据源的连接池"""
+        with self._lock:
+            entry = self._pools.pop(data_source_id, None)
+        if entry:
+            entry[1].close()
+            logger.info(f"Invalidated connection pool for data source {data_source_id}")
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._pools.values())
+            self._pools.clear()
+        for _, pool in entries:
+            pool.close()
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            pools = [pool for _, pool in self._pools.values()]
+        return {pool.data_source_id: pool.stats() for pool in pools}
+
+    def _maybe_sweep(self):
+        """顺带清理所有连接池中的空闲超时连接，避免不再使用的数据源长期占用连接"""
+        now = time.monotonic()
+        if now - self._last_sweep < self.idle_timeout:
+            return
+        self._last_sweep = now
+        with self._lock:
+            pools = [pool for _, pool in self._pools.values()]
+        for pool in pools:
+            pool.evict_idle()
+
+
+connection_pools = ConnectionPoolRegistry()
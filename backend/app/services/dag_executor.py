@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DagExecutor:
+    """按任务依赖触发下游任务
+
+    - 上游任务检查通过(同进程内执行时即时通知)或外部信号就绪后，评估直接依赖它们的任务
+    - 通知在 DAG_BATCH_WINDOW_MS 内合并评估，同时就绪且属于同一数据源的任务一起提交
+    - 就绪任务交给调度器执行，与定时触发一样经过进程池和 TASK_TIMEOUT、公平派发器或异步引擎，
+      可以合并时合并执行；没有运行调度器时在 DAG_MAX_WORKERS 个线程中执行
+    - 不同数据源的就绪任务并行执行，互不等待；下游执行完成后继续触发它的下游
+    - 每 DAG_SWEEP_INTERVAL 秒评估一次所有有依赖的任务，补上在其他进程中完成的上游和上报的信号
+    """
+
+    def __init__(self, session_factory=None, batch_window: Optional[float] = None,
+                 sweep_interval: Optional[float] = None, max_workers: Optional[int] = None):
+        self.session_factory = session_factory
+        self.batch_window = batch_window if batch_window is not None else settings.DAG_BATCH_WINDOW_MS / 1000
+        self.sweep_interval = sweep_interval or settings.DAG_SWEEP_INTERVAL
+        self.max_workers = max_workers or settings.DAG_MAX_WORKERS
+        self.scheduler = None  # 由 SchedulerManager 在调度器启动后设置
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending_upstreams: Set[int] = set()
+        self._pending_signals: Set[str] = set()
+        self._pending_tasks: Set[int] = set()
+        self._running: Set[int] = set()
+        self._counters = {"evaluations": 0, "triggered": 0, "batches": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, session_factory=None):
+        """启动后台评估线程"""
+        if session_factory is not None:
+            self.session_factory = session_factory
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag-executor")
+        self._thread = threading.Thread(target=self._run, name="dag-executor", daemon=True)
+        self._thread.start()
+        logger.info(f"DAG executor started, sweep interval {self.sweep_interval}s")
+
+    def shutdown(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self._executor.shutdown(wait=True)
+        logger.info("DAG executor shutdown successfully")
+
+    def notify_task_completed(self, task_id: int):
+        """上游任务检查通过；执行器未启动(如API进程在 standalone 模式下)时忽略，由调度进程的定期评估处理"""
+        if self._thread is None:
+            return
+        with self._lock:
+            self._pending_upstreams.add(task_id)
+        self._wakeup.set()
+
+    def notify_signal(self, name: str):
+        """外部信号就绪"""
+        if self._thread is None:
+            return
+        with self._lock:
+            self._pending_signals.add(name)
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self._counters,
+                running=self._thread is not None,
+                executing=sorted(self._running),
+                pending_upstreams=len(self._pending_upstreams),
+                pending_signals=len(self._pending_signals),
+            )
+
+    def _run(self):
+        next_sweep = time.monotonic()
+        while not self._stop.is_set():
+            woken = self._wakeup.wait(max(0.0, next_sweep - time.monotonic()))
+            if self._stop.is_set():
+                return
+            sweep = time.monotonic() >= next_sweep
+            if woken and not sweep:
+                # 合并窗口内陆续完成的上游，让同时就绪的下游一起执行
+                self._stop.wait(self.batch_window)
+            self._wakeup.clear()
+
+            with self._lock:
+                upstreams, self._pending_upstreams = self._pending_upstreams, set()
+                signals, self._pending_signals = self._pending_signals, set()
+                tasks, self._pending_tasks = self._pending_tasks, set()
+            try:
+                if sweep:
+                    next_sweep = time.monotonic() + self.sweep_interval
+                    self._evaluate(sweep=True)
+                elif upstreams or signals or tasks:
+                    self._evaluate(upstreams, signals, tasks)
+            except Exception as e:
+                logger.error(f"DAG evaluation failed: {e}")
+
+    def _evaluate(self, upstreams=(), signals=(), tasks=(), sweep: bool = False):
+        from app.services.dependencies import TaskDependencyService
+
+        db = self.session_factory()
+        try:
+            service = TaskDependencyService(db)
+            if sweep:
+                candidates = set(service.get_dependent_task_ids())
+            else:
+                candidates = set(tasks)
+                if upstreams or signals:
+                    candidates.update(service.get_dependent_task_ids(upstreams, signals))
+            with self._lock:
+                # 正在执行的任务完成后会重新评估
+                deferred = candidates & self._running
+                self._pending_tasks.update(deferred)
+                self._counters["evaluations"] += 1
+            ready = service.claim_ready_tasks(sorted(candidates - deferred))
+        finally:
+            db.close()
+
+        for data_source_id, task_ids in ready.items():
+            logger.info(f"Dependencies satisfied for tasks {task_ids} on data source {data_source_id}")
+            with self._lock:
+                self._running.update(task_ids)
+                self._counters["triggered"] += len(task_ids)
+                if len(task_ids) > 1:
+                    self._counters["batches"] += 1
+            future = self._submit(task_ids)
+            future.add_done_callback(partial(self._finished, data_source_id, task_ids))
+
+    def _submit(self, task_ids: List[int]) -> Future:
+        scheduler = self.scheduler
+        if scheduler is not None:
+            try:
+                if len(task_ids) > 1:
+                    return scheduler.submit_batch(task_ids)
+                return scheduler.submit_execution(task_ids[0])
+            except RuntimeError:
+                # 调度器已关闭，在自己的线程池中执行
+                pass
+        return self._executor.submit(self._execute_group, task_ids)
+
+    def _execute_group(self, task_ids: List[int]):
+        db = self.session_factory()
+        try:
+            if len(task_ids) > 1:
+                from app.services.batch_executor import BatchInspectionExecutor
+                BatchInspectionExecutor(db).execute_tasks(task_ids)
+            else:
+                from app.services.services import InspectionTaskService
+                InspectionTaskService(db).execute_task(task_ids[0])
+        finally:
+            db.close()
+
+    def _finished(self, data_source_id: int, task_ids: List[int], future: Future):
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            logger.error(f"DAG execution of tasks {task_ids} on data source {data_source_id} failed: {error}")
+        with self._lock:
+            if error is not None or future.cancelled():
+                self._counters["failed"] += len(task_ids)
+            self._running.difference_update(task_ids)
+            deferred = bool(self._pending_tasks & set(task_ids))
+        if deferred:
+            self._wakeup.set()
+
+
+# 全局DAG执行器，在运行调度器的进程中启动
+dag_executor = DagExecutor()
@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.models import DeadLetter, InspectionResult
+from app.services.services import InspectionTaskService
+from app.services.sql_template import as_utc, day_window, template_timezone
+
+
+class DeadLetterService:
+    """重试用尽的执行：查看、重新执行和忽略"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_dead_letters(self, task_id: Optional[int] = None, include_resolved: bool = False,
+                         skip: int = 0, limit: int = 100) -> List[DeadLetter]:
+        query = self.db.query(DeadLetter)
+        if task_id is not None:
+            query = query.filter(DeadLetter.task_id == task_id)
+        if not include_resolved:
+            query = query.filter(DeadLetter.resolved_at.is_(None))
+        return query.order_by(DeadLetter.id.desc()).offset(skip).limit(limit).all()
+
+    def retry_dead_letter(self, dead_letter_id: int) -> InspectionResult:
+        """立即重新执行一次(不再自动重试)，执行没有出错时标记为已处理"""
+        dead_letter = self._require(dead_letter_id)
+        window = None
+        if dead_letter.window_start is not None:
+            window = day_window(as_utc(dead_letter.window_start).astimezone(template_timezone()).date())
+        result = InspectionTaskService(self.db).execute_task(dead_letter.task_id, window=window, retry=False)
+        if not result.error_message:
+            dead_letter.resolved_at = datetime.now(timezone.utc)
+            self.db.commit()
+        return result
+
+    def resolve_dead_letter(self, dead_letter_id: int) -> DeadLetter:
+        """忽略死信，标记为已处理"""
+        dead_letter = self._require(dead_letter_id)
+        dead_letter.resolved_at = datetime.now(timezone.utc)
+        self.db.commit()
+        self.db.refresh(dead_letter)
+        return dead_letter
+
+    def _require(self, dead_letter_id: int) -> DeadLetter:
+        dead_letter = self.db.query(DeadLetter).filter(DeadLetter.id == dead_letter_id).first()
+        if not dead_letter:
+            raise ValueError("Dead letter not found")
+        return dead_letter
@@ -0,0 +1,188 @@
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.models.models import DependencySignal, InspectionResult, InspectionTask, TaskDependency
+from app.schemas.schemas import TaskDependencyCreate
+from app.services.sql_template import as_utc
+
+
+class TaskDependencyService:
+    """任务依赖(DAG)的维护和就绪判断
+
+    依赖有两种：上游任务最近一次执行完成且检查通过；外部就绪信号被上报。
+    某个任务的所有依赖都在上次由DAG触发之后产生了新的完成时间/信号时间，该任务即就绪。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_dependencies(self, task_id: int) -> List[TaskDependency]:
+        return self.db.query(TaskDependency).filter(TaskDependency.task_id == task_id).order_by(TaskDependency.id).all()
+
+    def add_dependency(self, task_id: int, dependency: TaskDependencyCreate) -> TaskDependency:
+        """添加依赖；上游任务不存在、重复添加或形成环时抛出 ValueError"""
+        if (dependency.upstream_task_id is None) == (dependency.signal_name is None):
+            raise ValueError("Exactly one of upstream_task_id and signal_name must be set")
+        if not self.db.query(InspectionTask.id).filter(InspectionTask.id == task_id).first():
+            raise ValueError("Task not found")
+
+        query = self.db.query(TaskDependency).filter(TaskDependency.task_id == task_id)
+        if dependency.upstream_task_id is not None:
+            upstream_task_id = dependency.upstream_task_id
+            if not self.db.query(InspectionTask.id).filter(InspectionTask.id == upstream_task_id).first():
+                raise ValueError(f"Upstream task {upstream_task_id} not found")
+            if query.filter(TaskDependency.upstream_task_id == upstream_task_id).first():
+                raise ValueError(f"Task {task_id} already depends on task {upstream_task_id}")
+            if self._reaches(upstream_task_id, task_id):
+                raise ValueError(f"Dependency on task {upstream_task_id} would create a cycle")
+        elif query.filter(TaskDependency.signal_name == dependency.signal_name).first():
+            raise ValueError(f"Task {task_id} already depends on signal {dependency.signal_name}")
+
+        db_dependency = TaskDependency(
+            task_id=task_id,
+            upstream_task_id=dependency.upstream_task_id,
+            signal_name=dependency.signal_name
+        )
+        self.db.add(db_dependency)
+        self.db.commit()
+        self.db.refresh(db_dependency)
+        return db_dependency
+
+    def remove_dependency(self, task_id: int, dependency_id: int) -> bool:
+        deleted = self.db.query(TaskDependency).filter(
+            TaskDependency.id == dependency_id,
+            TaskDependency.task_id == task_id
+        ).delete()
+        self.db.commit()
+        return bool(deleted)
+
+    def signal_ready(self, name: str) -> DependencySignal:
+        """记录外部信号就绪，依赖它的任务在下一次评估时执行"""
+        signal = self.db.query(DependencySignal).filter(DependencySignal.name == name).first()
+        if signal is None:
+            signal = DependencySignal(name=name, signal_count=0)
+            self.db.add(signal)
+        signal.signaled_at = datetime.utcnow()
+        signal.signal_count = (signal.signal_count or 0) + 1
+        self.db.commit()
+        self.db.refresh(signal)
+        return signal
+
+    def get_signals(self) -> List[DependencySignal]:
+        return self.db.query(DependencySignal).order_by(DependencySignal.name).all()
+
+    def get_dependent_task_ids(self, upstream_task_ids=(), signal_names=()) -> List[int]:
+        """直接依赖给定上游任务或信号的任务；两者都为空时返回所有有依赖的任务"""
+        query = self.db.query(TaskDependency.task_id).distinct()
+        if upstream_task_ids or signal_names:
+            conditions = []
+            if upstream_task_ids:
+                conditions.append(TaskDependency.upstream_task_id.in_(list(upstream_task_ids)))
+            if signal_names:
+                conditions.append(TaskDependency.signal_name.in_(list(signal_names)))
+            query = query.filter(or_(*conditions))
+        return [row.task_id for row in query.all()]
+
+    def claim_ready_tasks(self, task_ids: List[int]) -> Dict[int, List[int]]:
+        """找出所有依赖都已满足的活跃任务并标记为已消费，按数据源分组返回任务ID
+
+        标记使用条件UPDATE，多个线程或副本同时评估时同一次上游完成只会触发一次下游。
+        """
+        if not task_ids:
+            return {}
+        dependencies = self.db.query(TaskDependency).filter(TaskDependency.task_id.in_(task_ids)).all()
+        tasks = {
+            row.id: row for row in self.db.query(InspectionTask.id, InspectionTask.data_source_id).filter(
+                InspectionTask.id.in_(task_ids),
+                InspectionTask.status == 'active'
+            ).all()
+        }
+        markers = self._dependency_markers(dependencies)
+
+        by_task: Dict[int, List[TaskDependency]] = {}
+        for dependency in dependencies:
+            by_task.setdefault(dependency.task_id, []).append(dependency)
+
+        ready: Dict[int, List[int]] = {}
+        for task_id, task_dependencies in by_task.items():
+            if task_id not in tasks:
+                continue
+            task_markers = [markers.get(dependency.id) for dependency in task_dependencies]
+            if not all(
+                marker is not None and (dependency.consumed_at is None or marker > as_utc(dependency.consumed_at))
+                for dependency, marker in zip(task_dependencies, task_markers)
+            ):
+                continue
+            if self._consume(task_dependencies, task_markers):
+                ready.setdefault(tasks[task_id].data_source_id, []).append(task_id)
+        return ready
+
+    def _dependency_markers(self, dependencies: List[TaskDependency]) -> Dict[int, datetime]:
+        """每个依赖最近一次满足的时间：上游任务检查通过的完成时间，或信号的就绪时间"""
+        upstream_ids = {dependency.upstream_task_id for dependency in dependencies if dependency.upstream_task_id}
+        signal_names = {dependency.signal_name for dependency in dependencies if dependency.signal_name}
+
+        upstream_markers = {}
+        if upstream_ids:
+            latest = self.db.query(
+                InspectionResult.task_id, func.max(InspectionResult.id).label("result_id")
+            ).filter(InspectionResult.task_id.in_(upstream_ids)).group_by(InspectionResult.task_id).subquery()
+            rows = self.db.query(InspectionTask.id, InspectionTask.last_run_at, InspectionResult.check_passed).join(
+                latest, latest.c.task_id == InspectionTask.id
+            ).join(InspectionResult, InspectionResult.id == latest.c.result_id).all()
+            upstream_markers = {
+                row.id: as_utc(row.last_run_at) for row in rows if row.check_passed and row.last_run_at
+            }
+
+        signal_markers = {}
+        if signal_names:
+            signal_markers = {
+                row.name: as_utc(row.signaled_at) for row in self.db.query(
+                    DependencySignal.name, DependencySignal.signaled_at
+                ).filter(DependencySignal.name.in_(signal_names)).all()
+            }
+
+        markers = {}
+        for dependency in dependencies:
+            if dependency.upstream_task_id:
+                marker = upstream_markers.get(dependency.upstream_task_id)
+            else:
+                marker = signal_markers.get(dependency.signal_name)
+            if marker is not None:
+                markers[dependency.id] = marker
+        return markers
+
+    def _consume(self, dependencies: List[TaskDependency], markers: List[datetime]) -> bool:
+        """把任务的所有依赖标记为已消费；任何一个已被其他评估抢先标记时放弃"""
+        for dependency, marker in zip(dependencies, markers):
+            updated = self.db.query(TaskDependency).filter(
+                TaskDependency.id == dependency.id,
+                or_(TaskDependency.consumed_at.is_(None), TaskDependency.consumed_at < marker)
+            ).update({TaskDependency.consumed_at: marker}, synchronize_session=False)
+            if not updated:
+                self.db.rollback()
+                return False
+        self.db.commit()
+        return True
+
+    def _reaches(self, start_task_id: int, target_task_id: int) -> bool:
+        """沿上游方向从 start 出发能否到达 target(用于检测环)"""
+        edges: Dict[int, List[int]] = {}
+        for row in self.db.query(TaskDependency.task_id, TaskDependency.upstream_task_id).filter(
+            TaskDependency.upstream_task_id.isnot(None)
+        ).all():
+            edges.setdefault(row.task_id, []).append(row.upstream_task_id)
+
+        stack, seen = [start_task_id], set()
+        while stack:
+            task_id = stack.pop()
+            if task_id == target_task_id:
+                return True
+            if task_id in seen:
+                continue
+            seen.add(task_id)
+            stack.extend(edges.get(task_id, []))
+        return False
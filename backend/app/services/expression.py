@@ -0,0 +1,262 @@
+import ast
+import copy
+import logging
+import math
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# 表达式中可以使用的变量名
+CHECK_NAMES = ("check_value", "check", "检查项")
+EXPECTED_NAMES = ("expected_value", "expected", "期望项")
+
+# 旧版本只支持包含比较运算符的表达式，解析失败时按运算符回退；多字符运算符必须先匹配
+_FALLBACK_OPERATORS = ("==", "!=", ">=", "<=", ">", "<")
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Call, ast.Name, ast.Load, ast.Constant,
+)
+
+# 可以参与算术运算的取值类型；文本与整数相乘会构造出任意长的字符串
+_ARITHMETIC_TYPES = (int, float, Decimal, datetime, date, timedelta)
+
+
+def _seconds(value):
+    """timedelta 转换为秒数，便于与数字比较，例如 seconds(now() - check) < 3600"""
+    return value.total_seconds() if hasattr(value, "total_seconds") else value
+
+
+_FUNCTIONS = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "float": float,
+    "int": int,
+    "seconds": _seconds,
+    "now": datetime.utcnow,
+}
+
+
+def _vector_functions(np) -> Dict[str, Any]:
+    return {
+        "abs": np.abs,
+        "min": np.minimum,
+        "max": np.maximum,
+        "round": np.round,
+        "float": lambda value: np.asarray(value, dtype=float),
+        "int": lambda value: np.trunc(value),
+    }
+
+
+class _Vectorize(ast.NodeTransformer):
+    """把逻辑运算改写为按元素运算：and/or/not -> &/|/~，链式比较拆成两两比较再 &"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        operator = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=operator, right=value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        left = node.left
+        result = None
+        for operator, right in zip(node.ops, node.comparators):
+            pair = ast.Compare(left=left, ops=[operator], comparators=[right])
+            result = pair if result is None else ast.BinOp(left=result, op=ast.BitAnd(), right=pair)
+            left = right
+        return result
+
+
+class _Literals(ast.NodeTransformer):
+    """小数常量替换为变量，求值时按数值类型(Decimal 或 float)提供对应的值"""
+
+    def __init__(self):
+        self.literals: Dict[str, str] = {}
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, float):
+            name = f"_lit{len(self.literals)}"
+            self.literals[name] = repr(node.value)
+            return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+        return node
+
+
+class _Arguments(ast.NodeTransformer):
+    """变量别名统一替换为 lambda 的两个参数"""
+
+    def visit_Name(self, node):
+        if node.id in CHECK_NAMES:
+            return ast.copy_location(ast.Name(id="_check", ctx=ast.Load()), node)
+        if node.id in EXPECTED_NAMES:
+            return ast.copy_location(ast.Name(id="_expected", ctx=ast.Load()), node)
+        return node
+
+
+def _to_function(body: ast.AST, namespace: Dict[str, Any], filename: str):
+    """把表达式编译为 lambda _check, _expected: <body>，常量和函数作为全局变量"""
+    arguments = ast.arguments(
+        posonlyargs=[], args=[ast.arg(arg="_check"), ast.arg(arg="_expected")],
+        kwonlyargs=[], kw_defaults=[], defaults=[]
+    )
+    tree = ast.fix_missing_locations(ast.Expression(body=ast.Lambda(args=arguments, body=body)))
+    return eval(compile(tree, filename, "eval"), dict(namespace, __builtins__={}))
+
+
+class CompiledExpression:
+    """编译后的检查表达式，可以反复求值"""
+
+    def __init__(self, source: str, tree: ast.Expression, fallback: bool = False):
+        self.source = source
+        self.fallback = fallback
+
+        names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        self._uses_check = bool(names & set(CHECK_NAMES))
+        self._uses_expected = bool(names & set(EXPECTED_NAMES))
+        # 出现在算术运算中的变量，求值时必须是数值或时间类型
+        arithmetic_names = {
+            node.id for operation in ast.walk(tree) if isinstance(operation, ast.BinOp)
+            for node in ast.walk(operation) if isinstance(node, ast.Name)
+        }
+        self._check_in_arithmetic = bool(arithmetic_names & set(CHECK_NAMES))
+        self._expected_in_arithmetic = bool(arithmetic_names & set(EXPECTED_NAMES))
+
+        literals = _Literals()
+        body = _Arguments().visit(literals.visit(tree)).body
+        self._body = body
+        self._float_literals = {name: float(value) for name, value in literals.literals.items()}
+        # 小数常量在 Decimal 运算中保持精确，在 float 运算中使用 float，各编译一个函数
+        self._decimal_function = _to_function(
+            body, dict(_FUNCTIONS, **{name: Decimal(value) for name, value in literals.literals.items()}),
+            "<check_expression>"
+        )
+        self._float_function = _to_function(body, dict(_FUNCTIONS, **self._float_literals), "<check_expression>")
+        self._vector_function = None
+
+    def evaluate(self, check_value: Any, expected_value: Any) -> bool:
+        """对原生类型的值求值，无法比较(类型不兼容、空值等)时返回False"""
+        # SQL没有返回值时检查不通过
+        if (check_value is None and self._uses_check) or (expected_value is None and self._uses_expected):
+            return False
+        if check_value.__class__ is str:
+            check_value = _coerce(check_value)
+        if expected_value.__class__ is str:
+            expected_value = _coerce(expected_value)
+        if ((self._check_in_arithmetic and not isinstance(check_value, _ARITHMETIC_TYPES))
+                or (self._expected_in_arithmetic and not isinstance(expected_value, _ARITHMETIC_TYPES))):
+            logger.debug(f"Check expression {self.source!r} rejects non-numeric operands {check_value!r}, {expected_value!r}")
+            return False
+        check_float = check_value.__class__ is float
+        expected_float = expected_value.__class__ is float
+        try:
+            if check_float or expected_float:
+                # Decimal 与 float 不能直接运算，一侧是 float 时另一侧的 Decimal 也转换为 float
+                if check_value.__class__ is Decimal:
+                    check_value = float(check_value)
+                if expected_value.__class__ is Decimal:
+                    expected_value = float(expected_value)
+                return bool(self._float_function(check_value, expected_value))
+            return bool(self._decimal_function(check_value, expected_value))
+        except Exception as e:
+            logger.debug(f"Check expression {self.source!r} failed for {check_value!r}, {expected_value!r}: {e}")
+            return False
+
+    def evaluate_vector(self, check_values, expected_values):
+        """对NumPy数组按元素求值，返回布尔数组"""
+        import numpy as np
+
+        if self._vector_function is None:
+            body = _Vectorize().visit(ast.Expression(body=copy.deepcopy(self._body))).body
+            self._vector_function = _to_function(
+                body, dict(_vector_functions(np), **self._float_literals), "<check_expression:vector>"
+            )
+
+        with np.errstate(all="ignore"):
+            result = self._vector_function(check_values, expected_values)
+        return np.broadcast_to(np.asarray(result, dtype=bool), np.shape(check_values))
+
+
+def _coerce(value: str) -> Any:
+    """数字字符串转换为 Decimal，其余字符串保持不变"""
+    try:
+        return Decimal(value.strip())
+    except InvalidOperation:
+        return value
+
+
+def _validate(tree: ast.AST, source: str):
+    allowed_names = set(CHECK_NAMES) | set(EXPECTED_NAMES) | set(_FUNCTIONS)
+    for node in ast.walk(tree):
+        # 文本常量只能直接作为比较的操作数，避免 "a" * 100000000000 这类运算
+        for child in ast.iter_child_nodes(node):
+            if (isinstance(child, ast.Constant) and isinstance(child.value, (str, bytes))
+                    and not isinstance(node, ast.Compare)):
+                raise ValueError(f"Text constants can only be compared in check expression: {source}")
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax {type(node).__name__} in check expression: {source}")
+        if isinstance(node, ast.Name) and node.id not in allowed_names:
+            raise ValueError(f"Unknown name {node.id!r} in check expression: {source}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS):
+            raise ValueError(f"Unsupported function call in check expression: {source}")
+        if isinstance(node, ast.Constant) and isinstance(node.value, float) and not math.isfinite(node.value):
+            raise ValueError(f"Invalid number in check expression: {source}")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> CompiledExpression:
+    """解析并编译检查表达式，按表达式文本缓存
+
+    表达式修改后文本不同，自然会重新编译。无法解析的旧式表达式(如只写了运算符)
+    按其中的比较运算符回退为 check_value <运算符> expected_value。
+    """
+    source = (expression or "").strip()
+    try:
+        tree = ast.parse(source, mode="eval")
+        _validate(tree, source)
+        return CompiledExpression(source, tree)
+    except (SyntaxError, ValueError) as e:
+        for operator in _FALLBACK_OPERATORS:
+            if operator in source:
+                logger.warning(f"Falling back to 'check_value {operator} expected_value' for check expression {source!r}: {e}")
+                tree = ast.parse(f"check_value {operator} expected_value", mode="eval")
+                return CompiledExpression(source, tree, fallback=True)
+        raise ValueError(f"Invalid check expression {source!r}: {e}")
+
+
+def validate_expression(expression: str) -> str:
+    """校验新保存的检查表达式，不接受旧式的运算符回退写法；无效时抛出 ValueError"""
+    source = (expression or "").strip()
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid check expression {source!r}: {e.msg}")
+    _validate(tree, source)
+    compile_expression(source)
+    return expression
+
+
+def evaluate_expression(expression: str, check_value: Any, expected_value: Any) -> bool:
+    """编译(命中缓存时直接复用)并求值；表达式无效时返回False"""
+    try:
+        compiled = compile_expression(expression)
+    except ValueError as e:
+        logger.error(str(e))
+        return False
+    return compiled.evaluate(check_value, expected_value)
@@ -0,0 +1,141 @@
+import logging
+from typing import Any, Dict, List, Sequence
+
+from app.services.expression import compile_expression
+
+logger = logging.getLogger(__name__)
+
+# 多字符运算符必须先于单字符运算符匹配
+_COMPARISON_OPERATORS = ("==", "!=", ">=", "<=", ">", "<")
+
+
+class GroupedCheckOutcome:
+    """一次多行检查的评估结果"""
+
+    def __init__(self, check_passed: bool, total: int, failed: int, summary: Dict[str, Any]):
+        self.check_passed = check_passed
+        self.total = total
+        self.failed = failed
+        self.summary = summary
+
+    @property
+    def check_value(self) -> str:
+        return f"{self.total - self.failed}/{self.total} groups passed"
+
+    @property
+    def expected_value(self) -> str:
+        return f"{self.total}/{self.total} groups passed"
+
+
+def comparison_operator(expression: str) -> str:
+    """非数值分组只支持按表达式中的比较运算符直接比较"""
+    for operator in _COMPARISON_OPERATORS:
+        if operator in expression:
+            return operator
+    raise ValueError(f"Unsupported check expression for grouped check: {expression}")
+
+
+def _index_rows(rows: Sequence[Sequence], side: str) -> Dict[Any, Any]:
+    """把 (key..., value) 行整理成 {key: value}，最后一列为值，其余列组成分组键"""
+    indexed = {}
+    for row in rows:
+        if len(row) < 2:
+            raise ValueError(f"{side} rows must contain at least one key column and one value column")
+        key = row[0] if len(row) == 2 else tuple(row[:-1])
+        if key in indexed:
+            raise ValueError(f"Duplicate group key in {side} result: {key!r}")
+        indexed[key] = row[-1]
+    return indexed
+
+
+def _to_array(np, values: List[Any]):
+    """全部可以转为数值时返回浮点数组(空值为NaN)，否则返回字符串数组"""
+    try:
+        return np.array([float(value) if value is not None else np.nan for value in values], dtype=float), True
+    except (TypeError, ValueError):
+        return np.array(["" if value is None else str(value) for value in values], dtype=str), False
+
+
+def evaluate_groups(
+    expression: str,
+    check_rows: Sequence[Sequence],
+    expected_rows: Sequence[Sequence],
+    max_failures: int,
+) -> GroupedCheckOutcome:
+    """按分组键连接检查结果和期望结果，用NumPy一次性比较所有分组
+
+    数值分组用编译后的检查表达式按元素求值(支持算术和容差表达式)；非数值分组按
+    表达式中的比较运算符比较。只在一侧出现的分组记为失败；摘要中只保留偏差最大的
+    max_failures 个失败分组。
+    """
+    import numpy as np
+
+    check_index = _index_rows(check_rows, "check_sql")
+    expected_index = _index_rows(expected_rows, "expected_sql")
+
+    keys = list(check_index.keys() | expected_index.keys())
+    try:
+        keys.sort()
+    except TypeError:
+        keys.sort(key=repr)
+    total = len(keys)
+
+    in_check = np.fromiter((key in check_index for key in keys), dtype=bool, count=total)
+    in_expected = np.fromiter((key in expected_index for key in keys), dtype=bool, count=total)
+    check_values, check_numeric = _to_array(np, [check_index.get(key) for key in keys])
+    expected_values, expected_numeric = _to_array(np, [expected_index.get(key) for key in keys])
+    numeric = check_numeric and expected_numeric
+    if numeric:
+        passed = np.array(compile_expression(expression).evaluate_vector(check_values, expected_values))
+    else:
+        passed = _compare_strings(np, comparison_operator(expression), check_values.astype(str), expected_values.astype(str))
+    passed &= in_check & in_expected
+    if numeric:
+        # NaN(空值)与任何值比较都不算通过
+        passed &= ~(np.isnan(check_values) | np.isnan(expected_values))
+
+    failed_positions = np.flatnonzero(~passed)
+    if numeric and len(failed_positions) > max_failures:
+        deviation = np.abs(check_values[failed_positions] - expected_values[failed_positions])
+        # 缺失分组的偏差为NaN，排在最前面
+        deviation = np.where(np.isnan(deviation), np.inf, deviation)
+        failed_positions = failed_positions[np.argsort(-deviation, kind="stable")]
+
+    failures = []
+    for position in failed_positions[:max_failures]:
+        key = keys[position]
+        failures.append({
+            "key": [_json_value(part) for part in key] if isinstance(key, tuple) else _json_value(key),
+            "check": _json_value(check_index.get(key)) if in_check[position] else None,
+            "expected": _json_value(expected_index.get(key)) if in_expected[position] else None,
+        })
+
+    summary = {
+        "expression": expression,
+        "groups": total,
+        "failed": int(len(failed_positions)),
+        "missing_in_check": int(np.count_nonzero(~in_check)),
+        "missing_in_expected": int(np.count_nonzero(~in_expected)),
+        "failures": failures,
+    }
+    return GroupedCheckOutcome(check_passed=len(failed_positions) == 0, total=total, failed=summary["failed"], summary=summary)
+
+
+def _compare_strings(np, operator: str, check_values, expected_values):
+    if operator == "==":
+        return check_values == expected_values
+    if operator == "!=":
+        return check_values != expected_values
+    if operator == ">=":
+        return check_values >= expected_values
+    if operator == "<=":
+        return check_values <= expected_values
+    if operator == ">":
+        return check_values > expected_values
+    return check_values < expected_values
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
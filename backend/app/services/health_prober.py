@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.drivers import get_driver
+from app.services.connection_pool import data_source_type_name
+
+logger = logging.getLogger(__name__)
+
+# 还没有探测结果时的状态
+UNKNOWN = "unknown"
+
+
+class HealthProber:
+    """数据源健康探测器
+
+    后台线程按 HEALTH_PROBE_INTERVAL 周期并发测试所有启用的数据源，把状态和延迟
+    缓存在内存中，列表和详情接口直接读取缓存，不再在请求中逐个测试连接。
+    """
+
+    def __init__(self, session_factory=None, interval: Optional[float] = None, max_workers: Optional[int] = None):
+        self.session_factory = session_factory
+        self.interval = interval or settings.HEALTH_PROBE_INTERVAL
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.HEALTH_PROBE_THREADS,
+            thread_name_prefix="health-probe"
+        )
+        self._statuses: Dict[int, Dict[str, Any]] = {}
+        self._in_flight: Dict[int, Any] = {}
+        # forget() 后递增，旧配置的探测结果不再写入缓存
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, session_factory=None):
+        """启动后台探测线程"""
+        if session_factory is not None:
+            self.session_factory = session_factory
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+        logger.info(f"Health prober started, interval {self.interval}s")
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+        logger.info("Health prober shutdown successfully")
+
+    def get_status(self, data_source) -> Dict[str, Any]:
+        """读取缓存的状态；停用的数据源为 inactive，从未探测过的为 unknown"""
+        if not data_source.is_active:
+            return {"status": "inactive", "latency_ms": None, "checked_at": None}
+        with self._lock:
+            cached = self._statuses.get(data_source.id)
+        if cached is None:
+            return {"status": UNKNOWN, "latency_ms": None, "checked_at": None}
+        return {key: cached[key] for key in ("status", "latency_ms", "checked_at")}
+
+    def probe(self, data_sources: Iterable, timeout: Optional[float] = None):
+        """同步并发探测一组数据源，等待全部完成(或超时)"""
+        futures = [self.probe_async(data_source) for data_source in data_sources if data_source.is_active]
+        if futures:
+            wait(futures, timeout=timeout)
+
+    def probe_async(self, data_source):
+        """提交一次探测，立即返回；同一数据源已有探测在进行时复用它"""
+        snapshot = self._snapshot(data_source)
+        with self._lock:
+            future = self._in_flight.get(snapshot.id)
+            if future is None:
+                generation = self._generations.get(snapshot.id, 0)
+                future = self._executor.submit(self._probe_one, snapshot, generation)
+                self._in_flight[snapshot.id] = future
+        return future
+
+    def forget(self, data_source_id: int):
+        """删除数据源或修改连接配置后清除旧的探测结果"""
+        with self._lock:
+            self._statuses.pop(data_source_id, None)
+            self._in_flight.pop(data_source_id, None)
+            self._generations[data_source_id] = self._generations.get(data_source_id, 0) + 1
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            return {data_source_id: dict(status) for data_source_id, status in self._statuses.items()}
+
+    def probe_all(self):
+        """探测所有启用的数据源"""
+        from app.models.models import DataSource
+
+        db = self.session_factory()
+        try:
+            data_sources = db.query(DataSource).filter(DataSource.is_active == True).all()
+            snapshots = [self._snapshot(data_source) for data_source in data_sources]
+            active_ids = {snapshot.id for snapshot in snapshots}
+        finally:
+            db.close()
+
+        with self._lock:
+            for data_source_id in [key for key in self._statuses if key not in active_ids]:
+                del self._statuses[data_source_id]
+
+        started = time.perf_counter()
+        self.probe(snapshots, timeout=self.interval)
+        logger.debug(f"Probed {len(snapshots)} data sources in {time.perf_counter() - started:.2f}s")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _probe_one(self, data_source, generation: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        error = None
+        try:
+            connection_ok = get_driver(data_source.type).test_connection(data_source)
+        except Exception as e:
+            connection_ok = False
+            error = str(e)[:500]
+        latency_ms = int(round((time.perf_counter() - started) * 1000))
+
+        status = {
+            "status": "active" if connection_ok else "error",
+            "latency_ms": latency_ms if connection_ok else None,
+            "checked_at": datetime.utcnow(),
+            "error": error,
+        }
+        with self._lock:
+            if self._generations.get(data_source.id, 0) == generation:
+                self._statuses[data_source.id] = status
+                self._in_flight.pop(data_source.id, None)
+        if not connection_ok:
+            logger.warning(f"Health probe failed for data source {data_source.id}: {error}")
+        return status
+
+    @staticmethod
+    def _snapshot(data_source) -> SimpleNamespace:
+        """与会话解绑的数据源快照，可以在探测线程中安全使用"""
+        return SimpleNamespace(
+            id=data_source.id,
+            type=data_source_type_name(data_source),
+            host=data_source.host,
+            port=data_source.port,
+            database=data_source.database,
+            username=data_source.username,
+            password=data_source.password,
+            is_active=data_source.is_active,
+        )
+
+
+health_prober = HealthProber()
@@ -0,0 +1,137 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """折叠空白、去掉结尾分号，使格式不同但等价的SQL命中同一缓存项"""
+    return _WHITESPACE_PATTERN.sub(" ", sql).strip().rstrip(";").strip()
+
+
+class _InFlight:
+    """正在填充的缓存项，其他请求同一个key的线程等待它完成"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class ScalarResultCache:
+    """标量查询结果缓存
+
+    - key 为 (data_source_id, 标准化后的SQL)，每项有独立的TTL
+    - 同一个key同时只有一个线程执行查询(single-flight)，其余线程等待其结果
+    - 条目数超过 max_entries 时按LRU淘汰
+    - invalidate 递增数据源的代数，失效前开始的查询完成后不再写入缓存
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.RESULT_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[Any, float]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[int, str], _InFlight] = {}
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0  # invalidate() 清除全部时递增
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get_or_load(self, data_source_id: int, sql: str, ttl: float, loader: Callable[[], Any]) -> Any:
+        """返回缓存值；未命中或已过期时调用 loader 填充"""
+        if ttl <= 0:
+            return loader()
+
+        key = (data_source_id, normalize_sql(sql))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            generation = self._generation(data_source_id)
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.value
+
+        try:
+            value = loader()
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        else:
+            in_flight.value = value
+            self._store(key, value, ttl, generation)
+            return value
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is in_flight:
+                    del self._in_flight[key]
+            in_flight.event.set()
+
+    def invalidate(self, data_source_id: Optional[int] = None):
+        """清除某个数据源(或全部)的缓存；正在进行的查询结果不再写入，之后的请求重新查询"""
+        with self._lock:
+            if data_source_id is None:
+                self._epoch += 1
+                self._entries.clear()
+                self._in_flight.clear()
+                return
+            self._generations[data_source_id] = self._generations.get(data_source_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == data_source_id]:
+                del self._entries[key]
+            for key in [key for key in self._in_flight if key[0] == data_source_id]:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.coalesced) / lookups * 100, 1) if lookups else 0,
+            }
+
+    def _generation(self, data_source_id: int) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(data_source_id, 0)
+
+    def _store(self, key: Tuple[int, str], value: Any, ttl: float, generation: Tuple[int, int]):
+        with self._lock:
+            if self._generation(key[0]) != generation:
+                logger.debug(f"Discarded result loaded before data source {key[0]} was invalidated")
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+result_cache = ScalarResultCache()
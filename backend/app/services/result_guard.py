@@ -0,0 +1,39 @@
+import logging
+from typing import Any, List, Optional, Sequence
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResultShapeError(ValueError):
+    """检查SQL返回的行数或列数超过限制"""
+
+
+def _check_shape(sql_query: str, rows: Sequence, column_count: Optional[int], max_rows: int) -> Optional[str]:
+    """返回违规描述，没有违规时返回None"""
+    problems = []
+    if len(rows) > max_rows:
+        problems.append(f"more than {max_rows} row(s)")
+    if column_count is not None and column_count > settings.QUERY_MAX_COLUMNS:
+        problems.append(f"{column_count} columns (max {settings.QUERY_MAX_COLUMNS})")
+    if not problems:
+        return None
+    return f"Query returned {' and '.join(problems)}: {sql_query.strip()[:200]}"
+
+
+def limit_rows(sql_query: str, rows: List, max_rows: int) -> List:
+    """多行检查的结果行数保护，超过 max_rows 时始终执行失败"""
+    if len(rows) > max_rows:
+        raise ResultShapeError(f"Query returned more than {max_rows} rows: {sql_query.strip()[:200]}")
+    return rows
+
+
+def first_value(sql_query: str, rows: List, column_count: Optional[int], max_rows: int) -> Any:
+    """检查有限读取的结果形状，返回第一行第一列的值"""
+    violation = _check_shape(sql_query, rows, column_count, max_rows)
+    if violation:
+        if settings.QUERY_RESULT_GUARD == "strict":
+            raise ResultShapeError(violation)
+        logger.warning(violation)
+    return rows[0][0] if rows and len(rows[0]) > 0 else None
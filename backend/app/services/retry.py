@@ -0,0 +1,209 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.schedulers.dispatcher import DispatchQueueFullError
+from app.schedulers.executors import WorkerCrashedError
+from app.services.circuit_breaker import CircuitOpenError, is_connection_error
+from app.services.sql_template import TimeWindow
+
+logger = logging.getLogger(__name__)
+
+# 与数据源本身无关、稍后重试可能成功的错误：执行超时、等待连接超时、工作进程崩溃、熔断中
+_TRANSIENT_ERRORS = (TimeoutError, ConnectionError, CircuitOpenError, WorkerCrashedError)
+
+
+def is_transient_error(data_source, error: BaseException) -> bool:
+    """沿异常链判断是否为瞬时错误；SQL语法、表达式等确定性错误重试也不会成功，返回False"""
+    seen = set()
+    current = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, _TRANSIENT_ERRORS):
+            return True
+        current = current.__cause__ or current.__context__
+    return data_source is not None and is_connection_error(data_source, error)
+
+
+def task_max_retries(task) -> int:
+    return task.max_retries if task.max_retries is not None else settings.RETRY_MAX_RETRIES
+
+
+def task_retry_delay(task, attempt: int) -> float:
+    """第 attempt 次执行失败后的等待秒数：指数退避，在后一半区间内随机抖动，避免同一数据源的任务同时重试"""
+    base = task.retry_backoff_seconds or settings.RETRY_BACKOFF_SECONDS
+    backoff = min(settings.RETRY_BACKOFF_MAX_SECONDS, base * 2 ** (attempt - 1))
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class _Retry(NamedTuple):
+    task_id: int
+    attempt: int
+    window: Optional[TimeWindow]
+    error_message: str
+
+
+class RetryQueue:
+    """瞬时错误的延迟重试队列
+
+    失败的执行按到期时间放入内存中的堆，由一个线程等待最早到期的重试，等待期间不占用
+    调度器或派发器的执行线程。到期的重试交给调度器执行，与定时触发一样经过进程池、
+    TASK_TIMEOUT、公平派发器或异步引擎；没有运行调度器时在自己的线程池中执行。
+    进程停止时还没到期或还在派发队列中的重试直接记录为失败结果，不会悄悄丢失。
+    """
+
+    def __init__(self, session_factory=None, max_workers: Optional[int] = None):
+        self.session_factory = session_factory
+        self.max_workers = max_workers or settings.RETRY_MAX_WORKERS
+        self.scheduler = None  # 由 SchedulerManager 在调度器启动后设置
+        self._heap: List = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._relayed: Optional[List[Tuple]] = None
+        self._counters = {"scheduled": 0, "executed": 0, "abandoned": 0}
+
+    def start(self, session_factory=None):
+        if session_factory is not None:
+            self.session_factory = session_factory
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task-retry")
+        self._thread = threading.Thread(target=self._run, name="task-retry", daemon=True)
+        self._thread.start()
+        logger.info("Retry queue started")
+
+    def shutdown(self):
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            pending = [entry for _, _, entry in self._heap]
+            self._heap.clear()
+            self._condition.notify_all()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self._executor.shutdown(wait=True)
+        for entry in pending:
+            self._abandon(entry)
+        logger.info(f"Retry queue shutdown successfully, {len(pending)} pending retries recorded as failed")
+
+    def schedule(self, task_id: int, attempt: int, delay: float, window: Optional[TimeWindow], error_message: str) -> bool:
+        """delay 秒后重新执行任务，作为第 attempt 次执行；队列未启动时返回False，由调用方直接记录失败"""
+        with self._condition:
+            if self._relayed is not None:
+                self._relayed.append((task_id, attempt, delay, window, error_message))
+                return True
+            if self._thread is None or self._stopping:
+                return False
+            entry = _Retry(task_id, attempt, window, error_message)
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), entry))
+            self._counters["scheduled"] += 1
+            self._condition.notify()
+        return True
+
+    def relay(self):
+        """在进程池的工作进程中调用：之后 schedule 只记下重试请求，由 take_relayed 取出交回调度进程排队"""
+        with self._condition:
+            self._relayed = []
+
+    def take_relayed(self) -> List[Tuple]:
+        """取出记下的重试请求 [(task_id, attempt, delay, window, error_message)]"""
+        with self._condition:
+            if self._relayed is None:
+                return []
+            relayed, self._relayed = self._relayed, []
+        return relayed
+
+    def schedule_relayed(self, task_id: int, attempt: int, delay: float, window: Optional[TimeWindow], error_message: str) -> bool:
+        """工作进程交回的重试请求放入队列；队列没有运行时记录为失败结果"""
+        if self.schedule(task_id, attempt, delay, window, error_message):
+            return True
+        self._abandon(_Retry(task_id, attempt, window, error_message), "not scheduled, retry queue is not running")
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            next_due = self._heap[0][0] - time.monotonic() if self._heap else None
+            return dict(
+                self._counters,
+                running=self._thread is not None,
+                pending=len(self._heap),
+                next_retry_in_seconds=round(max(next_due, 0), 1) if next_due is not None else None,
+            )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._stopping:
+                    return
+                _, _, entry = heapq.heappop(self._heap)
+            logger.info(f"Retrying task {entry.task_id}, attempt {entry.attempt}")
+            scheduler = self.scheduler
+            if scheduler is not None:
+                try:
+                    future = scheduler.submit_execution(entry.task_id, window=entry.window, attempt=entry.attempt)
+                except RuntimeError:
+                    # 调度器已关闭，直接执行
+                    pass
+                else:
+                    future.add_done_callback(partial(self._dispatched, entry))
+                    continue
+            self._executor.submit(self._execute, entry)
+
+    def _dispatched(self, entry: _Retry, future: Future):
+        """调度器没有执行的重试记录为失败：调度器关闭时被取消，或数据源的派发队列已满"""
+        if future.cancelled():
+            self._abandon(entry)
+        elif isinstance(future.exception(), DispatchQueueFullError):
+            self._abandon(entry, "dropped, dispatch queue full")
+        else:
+            with self._condition:
+                self._counters["executed"] += 1
+
+    def _execute(self, entry: _Retry):
+        from app.services.services import InspectionTaskService
+
+        db = self.session_factory()
+        try:
+            InspectionTaskService(db).execute_task(entry.task_id, window=entry.window, attempt=entry.attempt)
+            with self._condition:
+                self._counters["executed"] += 1
+        except Exception as e:
+            logger.error(f"Retry of task {entry.task_id} failed: {e}")
+        finally:
+            db.close()
+
+    def _abandon(self, entry: _Retry, reason: str = "abandoned at shutdown"):
+        from app.services.services import InspectionTaskService
+
+        db = self.session_factory()
+        try:
+            service = InspectionTaskService(db)
+            task = service.get_task(entry.task_id)
+            if task:
+                service.record_error(
+                    task, f"{entry.error_message} (retry {entry.attempt} {reason})", window=entry.window
+                )
+                with self._condition:
+                    self._counters["abandoned"] += 1
+        except Exception as e:
+            logger.error(f"Failed to record abandoned retry of task {entry.task_id}: {e}")
+        finally:
+            db.close()
+
+
+# 全局重试队列，在运行调度器的进程中启动
+retry_queue = RetryQueue()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.drivers import get_driver
+from app.services.connection_pool import connection_fingerprint, connection_pools, data_source_type_name
+
+logger = logging.getLogger(__name__)
+
+
+class _CatalogEntry:
+    """单个数据源的库表结构缓存"""
+
+    def __init__(self, fingerprint: Tuple):
+        self.fingerprint = fingerprint
+        self.tables: Dict[str, Tuple[Any, List[str]]] = {}  # 表名 -> (变更标记, 列名)
+        self.version = ""
+        self.refreshed_at: Optional[datetime] = None
+        self.refreshed_monotonic = 0.0
+        self.full_refreshed_monotonic = 0.0
+        self.payload: Dict[str, Any] = {}
+
+
+class SchemaCatalog:
+    """数据源库表结构目录
+
+    - 每个数据源缓存一份表/列目录，接口直接返回缓存内容及其版本号(用作ETag)
+    - 缓存超过 SCHEMA_CATALOG_TTL 秒后在后台增量刷新：先读取所有表的元数据变更标记，
+      只对新增或标记变化的表读取列信息，删除已不存在的表
+    - 每隔 SCHEMA_CATALOG_FULL_REFRESH_INTERVAL 秒做一次全量刷新，兜底标记无法反映的变更
+    """
+
+    def __init__(self, ttl: Optional[float] = None, full_refresh_interval: Optional[float] = None):
+        self.ttl = ttl or settings.SCHEMA_CATALOG_TTL
+        self.full_refresh_interval = full_refresh_interval or settings.SCHEMA_CATALOG_FULL_REFRESH_INTERVAL
+        self._entries: Dict[int, _CatalogEntry] = {}
+        self._refresh_locks: Dict[int, threading.Lock] = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="schema-catalog")
+
+    def get(self, data_source, refresh: bool = False) -> Dict[str, Any]:
+        """返回 {"tables": [{"name", "columns"}], "version", "refreshed_at"}
+
+        没有缓存或 refresh=True 时同步刷新；缓存过期时先返回旧内容，再在后台刷新。
+        """
+        fingerprint = connection_fingerprint(data_source)
+        with self._lock:
+            entry = self._entries.get(data_source.id)
+        if entry is None or entry.fingerprint != fingerprint or refresh:
+            return self._refresh(data_source, time.monotonic()).payload
+
+        if time.monotonic() - entry.refreshed_monotonic >= self.ttl:
+            self._refresh_in_background(data_source)
+        return entry.payload
+
+    def invalidate(self, data_source_id: int):
+        with self._lock:
+            self._entries.pop(data_source_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _refresh_in_background(self, data_source):
+        snapshot = self._snapshot(data_source)
+        with self._lock:
+            if snapshot.id in self._in_flight:
+                return
+            self._in_flight.add(snapshot.id)
+
+        def _run():
+            try:
+                self._refresh(snapshot, time.monotonic())
+            except Exception as e:
+                logger.warning(f"Background schema refresh failed for data source {snapshot.id}: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(snapshot.id)
+
+        self._executor.submit(_run)
+
+    def _refresh(self, data_source, requested_at: float) -> _CatalogEntry:
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault(data_source.id, threading.Lock())
+
+        with refresh_lock:
+            fingerprint = connection_fingerprint(data_source)
+            with self._lock:
+                previous = self._entries.get(data_source.id)
+            if previous is not None and previous.fingerprint != fingerprint:
+                previous = None
+            # 等待锁期间其他线程已经完成了刷新
+            if previous is not None and previous.refreshed_monotonic >= requested_at:
+                return previous
+
+            now = time.monotonic()
+            full = previous is None or now - previous.full_refreshed_monotonic >= self.full_refresh_interval
+            old_tables = {} if previous is None else previous.tables
+
+            driver = get_driver(data_source.type)
+            with connection_pools.connection(data_source) as connection:
+                stamps = driver.list_tables(connection)
+                changed = [
+                    name for name, stamp in stamps.items()
+                    if full or stamp is None or name not in old_tables or old_tables[name][0] != stamp
+                ]
+                described = driver.describe_tables(connection, changed) if changed else {}
+
+            entry = _CatalogEntry(fingerprint)
+            for name, stamp in stamps.items():
+                columns = described[name] if name in described else old_tables[name][1]
+                entry.tables[name] = (stamp, columns)
+            entry.refreshed_at = datetime.utcnow()
+            entry.refreshed_monotonic = now
+            entry.full_refreshed_monotonic = now if full else previous.full_refreshed_monotonic
+            self._build_payload(entry)
+
+            with self._lock:
+                self._entries[data_source.id] = entry
+
+            removed = len(old_tables.keys() - stamps.keys())
+            logger.info(
+                f"Refreshed schema catalog for data source {data_source.id} "
+                f"({'full' if full else 'incremental'}): {len(stamps)} tables, "
+                f"{len(changed)} described, {removed} removed, version {entry.version}"
+            )
+            return entry
+
+    @staticmethod
+    def _build_payload(entry: _CatalogEntry):
+        tables = [{"name": name, "columns": entry.tables[name][1]} for name in sorted(entry.tables)]
+        # 版本号只取决于目录内容，内容不变时ETag保持不变
+        entry.version = hashlib.sha1(
+            json.dumps(tables, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        ).hexdigest()[:16]
+        entry.payload = {
+            "tables": tables,
+            "version": entry.version,
+            "refreshed_at": entry.refreshed_at,
+        }
+
+    @staticmethod
+    def _snapshot(data_source) -> SimpleNamespace:
+        return SimpleNamespace(
+            id=data_source.id,
+            type=data_source_type_name(data_source),
+            host=data_source.host,
+            port=data_source.port,
+            database=data_source.database,
+            username=data_source.username,
+            password=data_source.password,
+        )
+
+
+schema_catalog = SchemaCatalog()
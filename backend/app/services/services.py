@@ -1,18 +1,46 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple, Dict
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import or_, text
+from concurrent.futures import ThreadPoolExecutor
+import json
 import logging
-import pymysql
-import psycopg2
-from clickhouse_driver import Client
+import re
+import time
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
-from app.models.models import User, Project, DataSource, InspectionTask, InspectionResult, UserProjectPermission, UserRole
+from datetime import datetime, timedelta, timezone
+from app.models.models import User, Project, DataSource, InspectionTask, InspectionResult, UserProjectPermission, UserRole, TaskDependency, BackfillRun, DeadLetter
 from app.schemas.schemas import UserCreate, ProjectCreate, DataSourceCreate, DataSourceUpdate, InspectionTaskCreate, InspectionTaskUpdate, ConnectionTest, UserUpdate, UserProjectPermissionCreate
 from app.core.security import get_password_hash, verify_password
+from app.core.config import settings
+from app.drivers import get_driver
+from app.services.circuit_breaker import circuit_breakers
+from app.services.connection_pool import connection_pools
+from app.services.expression import evaluate_expression
+from app.services.grouped_check import evaluate_groups
+from app.services.health_prober import health_prober
+from app.services.result_cache import result_cache
+from app.services.retry import is_transient_error, retry_queue, task_max_retries, task_retry_delay
+from app.services.schema_catalog import schema_catalog
+from app.services.sql_template import TimeWindow, render_task_sql, task_window
 
 logger = logging.getLogger(__name__)
 
+# 并行模式下执行检查SQL的线程池
+_query_executor = ThreadPoolExecutor(
+    max_workers=settings.INSPECTION_QUERY_THREADS,
+    thread_name_prefix="inspection-query"
+)
+
+# 依赖会话状态的SQL(变量、SET、临时表等)必须在同一个会话中按顺序执行
+_SESSION_STATE_PATTERN = re.compile(
+    r"@\w|\bSET\b|\bTEMPORARY\b|\bLAST_INSERT_ID\b|\bFOUND_ROWS\b|\bCURRVAL\b|\bLASTVAL\b",
+    re.IGNORECASE
+)
+
+def queries_are_independent(check_sql: str, expected_sql: str) -> bool:
+    """两条SQL都不依赖会话状态时才可以在不同连接上并发执行"""
+    return not (_SESSION_STATE_PATTERN.search(check_sql) or _SESSION_STATE_PATTERN.search(expected_sql))
+
 class UserService:
     def __init__(self, db: Session):
         self.db = db
@@ -196,6 +224,20 @@ class ProjectService:
             return True
         return False
 
+# 修改后需要重建数据源连接的字段
+CONNECTION_FIELDS = ("type", "host", "port", "database", "username", "password")
+
+def forget_data_source(data_source_id: int, deleted: bool = False):
+    """丢弃本进程中按旧连接配置建立的连接池、缓存结果、熔断和健康状态"""
+    connection_pools.invalidate(data_source_id)
+    result_cache.invalidate(data_source_id)
+    if deleted:
+        circuit_breakers.remove(data_source_id)
+    else:
+        circuit_breakers.reset(data_source_id)
+    health_prober.forget(data_source_id)
+    schema_catalog.invalidate(data_source_id)
+
 class DataSourceService:
     def __init__(self, db: Session):
         self.db = db
@@ -211,6 +253,7 @@ class DataSourceService:
             password=data_source.password,
             description=data_source.description,
             is_active=data_source.is_active,
+            result_cache_ttl=data_source.result_cache_ttl,
             created_by=created_by
         )
         self.db.add(db_data_source)
@@ -229,6 +272,7 @@ class DataSourceService:
         if data_source:
             self.db.delete(data_source)
             self.db.commit()
+            forget_data_source(data_source_id, deleted=True)
             return True
         return False
     
@@ -249,6 +293,12 @@ class DataSourceService:
         if 'password' in update_data and update_data['password'] == '':
             del update_data['password']
         
+        # 连接相关字段变化时需要丢弃已建立的连接
+        connection_changed = any(
+            field in CONNECTION_FIELDS and getattr(data_source, field) != value
+            for field, value in update_data.items()
+        )
+        
         # 应用更新
         for field, value in update_data.items():
             setattr(data_source, field, value)
@@ -256,6 +306,8 @@ class DataSourceService:
         try:
             self.db.commit()
             self.db.refresh(data_source)
+            if connection_changed:
+                forget_data_source(data_source_id)
             logger.info(f"Successfully updated data source {data_source_id}")
             return data_source
         except Exception as e:
@@ -279,101 +331,18 @@ class DataSourceService:
         return self.test_connection_with_config(connection_data)
     
     def test_connection_with_config(self, connection_data: ConnectionTest) -> bool:
-        logger = logging.getLogger(__name__)
         logger.info(f"开始测试连接 - 类型: {connection_data.type}, 主机: {connection_data.host}:{connection_data.port}, 数据库: {connection_data.database}")
         
         try:
-            if connection_data.type == "mysql":
-                logger.info("测试MySQL连接...")
-                result = self._test_mysql_connection(connection_data)
-                logger.info(f"MySQL连接测试结果: {result}")
-                return result
-            elif connection_data.type == "postgresql":
-                logger.info("测试PostgreSQL连接...")
-                result = self._test_postgresql_connection(connection_data)
-                logger.info(f"PostgreSQL连接测试结果: {result}")
-                return result
-            elif connection_data.type == "clickhouse":
-                logger.info("测试ClickHouse连接...")
-                result = self._test_clickhouse_connection(connection_data)
-                logger.info(f"ClickHouse连接测试结果: {result}")
-                return result
-            elif connection_data.type == "starrocks":
-                logger.info("测试StarRocks连接...")
-                result = self._test_starrocks_connection(connection_data)
-                logger.info(f"StarRocks连接测试结果: {result}")
-                return result
-            else:
-                logger.error(f"不支持的数据源类型: {connection_data.type}")
-                return False
+            driver = get_driver(connection_data.type)
+            logger.info(f"尝试连接{driver.name}: {connection_data.host}:{connection_data.port}, 用户: {connection_data.username}, 数据库: {connection_data.database}")
+            result = driver.test_connection(connection_data)
+            logger.info(f"{driver.name}连接测试结果: {result}")
+            return result
         except Exception as e:
             logger.error(f"连接测试失败 - 类型: {connection_data.type}, 错误: {str(e)}")
             return False
     
-    def _test_mysql_connection(self, config: ConnectionTest) -> bool:
-        logger = logging.getLogger(__name__)
-        logger.info(f"尝试连接MySQL: {config.host}:{config.port}, 用户: {config.username}, 数据库: {config.database}")
-        
-        try:
-            connection = pymysql.connect(
-                host=config.host,
-                port=config.port,
-                user=config.username,
-                password=config.password,
-                database=config.database,
-                connect_timeout=5
-            )
-            logger.info("MySQL连接成功")
-            connection.close()
-            return True
-        except Exception as e:
-            logger.error(f"MySQL连接失败: {str(e)}")
-            return False
-    
-    def _test_postgresql_connection(self, config: ConnectionTest) -> bool:
-        logger = logging.getLogger(__name__)
-        logger.info(f"尝试连接PostgreSQL: {config.host}:{config.port}, 用户: {config.username}, 数据库: {config.database}")
-        
-        try:
-            connection = psycopg2.connect(
-                host=config.host,
-                port=config.port,
-                user=config.username,
-                password=config.password,
-                database=config.database,
-                connect_timeout=5
-            )
-            logger.info("PostgreSQL连接成功")
-            connection.close()
-            return True
-        except Exception as e:
-            logger.error(f"PostgreSQL连接失败: {str(e)}")
-            return False
-    
-    def _test_clickhouse_connection(self, config: ConnectionTest) -> bool:
-        logger = logging.getLogger(__name__)
-        logger.info(f"尝试连接ClickHouse: {config.host}:{config.port}, 用户: {config.username}, 数据库: {config.database}")
-        
-        try:
-            client = Client(
-                host=config.host,
-                port=config.port,
-                user=config.username,
-                password=config.password,
-                database=config.database
-            )
-            result = client.execute('SELECT 1')
-            logger.info("ClickHouse连接成功")
-            client.disconnect()
-            return True
-        except Exception as e:
-            logger.error(f"ClickHouse连接失败: {str(e)}")
-            return False
-    
-    def _test_starrocks_connection(self, config: ConnectionTest) -> bool:
-        # StarRocks uses MySQL protocol
-        return self._test_mysql_connection(config)
-    
     def test_sql_query(self, data_source_id: int, sql: str) -> str:
         """Test SQL query and return single value result"""
         data_source = self.get_data_source(data_source_id)
@@ -388,84 +357,18 @@ class DataSourceService:
     def _execute_sql_query(self, data_source: DataSource, sql_query: str) -> any:
         """Execute SQL query against data source and return single value"""
         try:
-            if data_source.type == "mysql":
-                return self._execute_mysql_sql(data_source, sql_query)
-            elif data_source.type == "postgresql":
-                return self._execute_postgresql_sql(data_source, sql_query)
-            elif data_source.type == "clickhouse":
-                return self._execute_clickhouse_sql(data_source, sql_query)
-            elif data_source.type == "starrocks":
-                return self._execute_starrocks_sql(data_source, sql_query)
-            else:
-                raise ValueError(f"Unsupported data source type: {data_source.type}")
+            driver = get_driver(data_source.type)
+            with connection_pools.connection(data_source) as connection:
+                return driver.execute_scalar(connection, sql_query)
         except Exception as e:
             raise ValueError(f"SQL execution failed: {str(e)}")
     
-    def _execute_mysql_sql(self, data_source: DataSource, sql_query: str) -> any:
-        import pymysql
-        connection = pymysql.connect(
-            host=data_source.host,
-            port=data_source.port,
-            user=data_source.username,
-            password=data_source.password,
-            database=data_source.database
-        )
-        
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute(sql_query)
-                result = cursor.fetchone()
-                return result[0] if result and len(result) > 0 else None
-        finally:
-            connection.close()
-    
-    def _execute_postgresql_sql(self, data_source: DataSource, sql_query: str) -> any:
-        import psycopg2
-        connection = psycopg2.connect(
-            host=data_source.host,
-            port=data_source.port,
-            user=data_source.username,
-            password=data_source.password,
-            database=data_source.database
-        )
-        
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute(sql_query)
-                result = cursor.fetchone()
-                return result[0] if result and len(result) > 0 else None
-        finally:
-            connection.close()
-    
-    def _execute_clickhouse_sql(self, data_source: DataSource, sql_query: str) -> any:
-        from clickhouse_driver import Client
-        client = Client(
-            host=data_source.host,
-            port=data_source.port,
-            user=data_source.username,
-            password=data_source.password,
-            database=data_source.database
-        )
-        
-        try:
-            result = client.execute(sql_query)
-            return result[0][0] if result and len(result) > 0 and len(result[0]) > 0 else None
-        finally:
-            client.disconnect()
-    
-    def _execute_starrocks_sql(self, data_source: DataSource, sql_query: str) -> any:
-        # StarRocks uses MySQL protocol
-        return self._execute_mysql_sql(data_source, sql_query)
-    
-    def get_sql_schema(self, data_source_id: int) -> dict:
-        # This would implement schema fetching from the data source
-        # For now, return placeholder data
-        return {
-            "tables": [
-                {"name": "users", "columns": ["id", "name", "email"]},
-                {"name": "orders", "columns": ["id", "user_id", "amount", "created_at"]}
-            ]
-        }
+    def get_sql_schema(self, data_source_id: int, refresh: bool = False) -> dict:
+        """从库表结构目录读取数据源的表和列，refresh=True 时立即增量刷新"""
+        data_source = self.get_data_source(data_source_id)
+        if not data_source:
+            raise ValueError("Data source not found")
+        return schema_catalog.get(data_source, refresh=refresh)
 
 class InspectionTaskService:
     def __init__(self, db: Session):
@@ -479,6 +382,12 @@ class InspectionTaskService:
             expected_sql=task.expected_sql,
             check_expression=task.check_expression,
             cron_schedule=task.cron_schedule,
+            expected_cache_ttl=task.expected_cache_ttl,
+            check_mode=task.check_mode,
+            spread_window_seconds=task.spread_window_seconds,
+            max_retries=task.max_retries,
+            retry_backoff_seconds=task.retry_backoff_seconds,
+            priority=task.priority,
             status=task.status,
             data_source_id=task.data_source_id,
             project_id=task.project_id,
@@ -509,11 +418,18 @@ class InspectionTaskService:
     def get_task(self, task_id: int) -> InspectionTask:
         return self.db.query(InspectionTask).filter(InspectionTask.id == task_id).first()
     
-    def execute_task(self, task_id: int) -> InspectionResult:
+    def execute_task(self, task_id: int, window: Optional[TimeWindow] = None, backfill_id: Optional[int] = None,
+                     attempt: int = 1, retry: bool = True) -> Optional[InspectionResult]:
+        """执行任务；window 指定SQL时间窗口参数对应的窗口(回填时使用)，不指定时使用默认窗口
+        
+        attempt 为本次是第几次执行；retry 为True时瞬时错误进入重试队列，此时返回None。
+        """
         task = self.get_task(task_id)
         if not task:
             raise ValueError("Task not found")
         
+        window = task_window(task.check_sql, task.expected_sql, window)
+        started = time.perf_counter()
         try:
             # Get data source for SQL execution
             data_source_service = DataSourceService(self.db)
@@ -522,119 +438,251 @@ class InspectionTaskService:
             if not data_source:
                 raise ValueError("Data source not found")
             
-            # Execute check SQL
-            check_value = self._execute_sql(data_source, task.check_sql)
-            
-            # Execute expected SQL
-            expected_value = self._execute_sql(data_source, task.expected_sql)
+            if task.check_mode == "grouped":
+                check_rows, expected_rows, timings = self._execute_grouped(data_source, task, window)
+                return self.record_grouped_result(
+                    task, check_rows, expected_rows, timings, self._elapsed_ms(started), window, backfill_id
+                )
             
-            # Evaluate the check expression
-            check_passed = self._evaluate_expression(task.check_expression, str(check_value), str(expected_value))
+            # Execute check SQL and expected SQL
+            check_value, expected_value, timings = self._execute_check_and_expected(data_source, task, window)
             
-            result = InspectionResult(
-                task_id=task_id,
-                check_value=str(check_value),
-                expected_value=str(expected_value),
-                check_passed=check_passed
+            return self.record_result(
+                task, check_value, expected_value, timings, self._elapsed_ms(started), window, backfill_id
             )
             
-            self.db.add(result)
-            self.db.commit()
-            self.db.refresh(result)
-            
-            # Update task last run time
-            from datetime import datetime
-            task.last_run_at = datetime.utcnow()
-            self.db.commit()
-            
-            # Trigger alert if task failed
-            if not check_passed:
-                self._trigger_alert(task, result)
-            
-            return result
-            
         except Exception as e:
-            result = InspectionResult(
-                task_id=task_id,
-                check_passed=False,
-                error_message=str(e)
+            return self.record_error(
+                task, str(e), self._elapsed_ms(started), window, backfill_id, e if retry else None, attempt
             )
-            self.db.add(result)
-            self.db.commit()
-            
-            # Trigger alert for execution error
-            self._trigger_alert(task, result)
-            
+    
+    def record_result(self, task: InspectionTask, check_value, expected_value, timings: Dict[str, int], duration_ms: int,
+                      window: Optional[TimeWindow] = None, backfill_id: Optional[int] = None) -> InspectionResult:
+        """评估检查表达式并保存一次执行结果"""
+        # Evaluate the check expression
+        check_passed = evaluate_expression(task.check_expression, check_value, expected_value)
+        
+        result = InspectionResult(
+            task_id=task.id,
+            check_value=str(check_value),
+            expected_value=str(expected_value),
+            check_passed=check_passed,
+            check_duration_ms=timings.get("check"),
+            expected_duration_ms=timings.get("expected"),
+            duration_ms=duration_ms,
+            window_start=self._window_start(window),
+            backfill_id=backfill_id
+        )
+        
+        self.db.add(result)
+        self.db.commit()
+        self.db.refresh(result)
+        
+        if backfill_id is not None:
+            # 回填的是历史窗口，不更新最近执行时间，也不告警和触发下游
             return result
+        
+        # Update task last run time
+        task.last_run_at = datetime.utcnow()
+        self.db.commit()
+        
+        # Trigger alert if task failed
+        if not check_passed:
+            self._trigger_alert(task, result)
+        else:
+            self._notify_dependents(task)
+        
+        return result
     
-    def _execute_sql(self, data_source: DataSource, sql_query: str) -> any:
+    def record_grouped_result(self, task: InspectionTask, check_rows, expected_rows, timings: Dict[str, int], duration_ms: int,
+                              window: Optional[TimeWindow] = None, backfill_id: Optional[int] = None) -> InspectionResult:
+        """按分组键比较多行检查结果，保存通过的分组数和失败分组摘要"""
+        outcome = evaluate_groups(
+            task.check_expression, check_rows, expected_rows, settings.GROUPED_CHECK_MAX_FAILURES_STORED
+        )
+        
+        result = InspectionResult(
+            task_id=task.id,
+            check_value=outcome.check_value,
+            expected_value=outcome.expected_value,
+            check_passed=outcome.check_passed,
+            check_duration_ms=timings.get("check"),
+            expected_duration_ms=timings.get("expected"),
+            duration_ms=duration_ms,
+            group_summary=json.dumps(outcome.summary, ensure_ascii=False),
+            window_start=self._window_start(window),
+            backfill_id=backfill_id
+        )
+        
+        self.db.add(result)
+        self.db.commit()
+        self.db.refresh(result)
+        
+        if backfill_id is not None:
+            return result
+        
+        task.last_run_at = datetime.utcnow()
+        self.db.commit()
+        
+        if not outcome.check_passed:
+            self._trigger_alert(task, result)
+        else:
+            self._notify_dependents(task)
+        
+        return result
+    
+    def record_error(self, task: InspectionTask, error_message: str, duration_ms: Optional[int] = None,
+                     window: Optional[TimeWindow] = None, backfill_id: Optional[int] = None,
+                     error: Optional[BaseException] = None, attempt: int = 1) -> Optional[InspectionResult]:
+        """保存一次执行失败的结果
+        
+        传入 error 时按错误类型决定是否重试：瞬时错误且还有重试次数时放入重试队列，
+        不保存结果也不告警，返回None；重试用尽后保存失败结果并加入死信列表。
+        """
+        transient = error is not None and backfill_id is None and self._is_transient(task, error)
+        if transient and attempt <= task_max_retries(task):
+            delay = task_retry_delay(task, attempt)
+            if retry_queue.schedule(task.id, attempt + 1, delay, window, error_message):
+                logger.warning(
+                    f"Task {task.name} failed with a transient error, retry {attempt}/{task_max_retries(task)} "
+                    f"in {delay:.1f}s: {error_message}"
+                )
+                return None
+        
+        result = InspectionResult(
+            task_id=task.id,
+            check_passed=False,
+            error_message=error_message,
+            duration_ms=duration_ms,
+            window_start=self._window_start(window),
+            backfill_id=backfill_id
+        )
+        self.db.add(result)
+        self.db.commit()
+        
+        if backfill_id is not None:
+            return result
+        
+        if transient and attempt > 1:
+            self.db.add(DeadLetter(
+                task_id=task.id,
+                result_id=result.id,
+                attempts=attempt,
+                error_message=error_message,
+                window_start=self._window_start(window)
+            ))
+            self.db.commit()
+            logger.error(f"Task {task.name} exhausted {attempt - 1} retries, moved to dead letters")
+        
+        # Trigger alert for execution error
+        self._trigger_alert(task, result)
+        
+        return result
+    
+    def _execute_check_and_expected(self, data_source: DataSource, task: InspectionTask,
+                                    window: Optional[TimeWindow] = None) -> Tuple[any, any, Dict[str, int]]:
+        """执行检查SQL和期望SQL，返回两者的结果和各阶段耗时(毫秒)
+        
+        parallel模式下两条相互独立的SQL各借用一个连接并发执行，端到端耗时约为
+        max(check, expected)；否则两条SQL在同一个借出的会话中依次执行。
+        """
+        check_sql, expected_sql = render_task_sql(task.check_sql, task.expected_sql, window)
+        if check_sql.strip() == expected_sql.strip():
+            value, elapsed = self._timed_sql(data_source, check_sql)
+            return value, value, {"check": elapsed, "expected": 0}
+        
+        expected_ttl = self._expected_cache_ttl(data_source, task)
+        
+        if settings.INSPECTION_QUERY_MODE == "parallel" and queries_are_independent(check_sql, expected_sql):
+            future = _query_executor.submit(self._timed_sql, data_source, check_sql)
+            expected_value, expected_elapsed = self._timed_cached_sql(data_source, expected_sql, expected_ttl)
+            check_value, check_elapsed = future.result()
+        else:
+            with connection_pools.connection(data_source) as connection:
+                check_value, check_elapsed = self._timed_sql(data_source, check_sql, connection)
+                expected_value, expected_elapsed = self._timed_cached_sql(data_source, expected_sql, expected_ttl, connection)
+        
+        return check_value, expected_value, {"check": check_elapsed, "expected": expected_elapsed}
+    
+    def _execute_grouped(self, data_source: DataSource, task: InspectionTask,
+                         window: Optional[TimeWindow] = None) -> Tuple[list, list, Dict[str, int]]:
+        """多行检查：两侧SQL各执行一次并读取全部分组行，执行方式与单值检查相同"""
+        max_rows = settings.GROUPED_CHECK_MAX_ROWS
+        check_sql, expected_sql = render_task_sql(task.check_sql, task.expected_sql, window)
+        
+        if settings.INSPECTION_QUERY_MODE == "parallel" and queries_are_independent(check_sql, expected_sql):
+            future = _query_executor.submit(self._timed_rows, data_source, check_sql, max_rows)
+            expected_rows, expected_elapsed = self._timed_rows(data_source, expected_sql, max_rows)
+            check_rows, check_elapsed = future.result()
+        else:
+            with connection_pools.connection(data_source) as connection:
+                check_rows, check_elapsed = self._timed_rows(data_source, check_sql, max_rows, connection)
+                expected_rows, expected_elapsed = self._timed_rows(data_source, expected_sql, max_rows, connection)
+        
+        return check_rows, expected_rows, {"check": check_elapsed, "expected": expected_elapsed}
+    
+    def _timed_rows(self, data_source: DataSource, sql_query: str, max_rows: int, connection=None) -> Tuple[list, int]:
+        if connection is None:
+            with connection_pools.connection(data_source) as connection:
+                return self._timed_rows(data_source, sql_query, max_rows, connection)
+        
+        started = time.perf_counter()
         try:
-            if data_source.type == "mysql":
-                return self._execute_mysql_sql(data_source, sql_query)
-            elif data_source.type == "postgresql":
-                return self._execute_postgresql_sql(data_source, sql_query)
-            elif data_source.type == "clickhouse":
-                return self._execute_clickhouse_sql(data_source, sql_query)
-            elif data_source.type == "starrocks":
-                return self._execute_starrocks_sql(data_source, sql_query)
-            else:
-                raise ValueError(f"Unsupported data source type: {data_source.type}")
+            rows = get_driver(data_source.type).fetch_rows(connection, sql_query, max_rows)
         except Exception as e:
             raise ValueError(f"SQL execution failed: {str(e)}")
-    
-    def _execute_mysql_sql(self, data_source: DataSource, sql_query: str) -> any:
-        connection = pymysql.connect(
-            host=data_source.host,
-            port=data_source.port,
-            user=data_source.username,
-            password=data_source.password,
-            database=data_source.database
+        return rows, self._elapsed_ms(started)
+    
+    def _expected_cache_ttl(self, data_source: DataSource, task: InspectionTask) -> int:
+        """期望SQL结果的缓存时间：任务配置优先，其次数据源配置，最后是全局默认值"""
+        if task.expected_cache_ttl is not None:
+            return task.expected_cache_ttl
+        if data_source.result_cache_ttl is not None:
+            return data_source.result_cache_ttl
+        return settings.RESULT_CACHE_DEFAULT_TTL
+    
+    def _timed_cached_sql(self, data_source: DataSource, sql_query: str, ttl: int, connection=None) -> Tuple[any, int]:
+        started = time.perf_counter()
+        value = result_cache.get_or_load(
+            data_source.id, sql_query, ttl,
+            lambda: self._execute_sql(data_source, sql_query, connection)
         )
-        
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute(sql_query)
-                result = cursor.fetchone()
-                return result[0] if result and len(result) > 0 else None
-        finally:
-            connection.close()
+        return value, self._elapsed_ms(started)
     
-    def _execute_postgresql_sql(self, data_source: DataSource, sql_query: str) -> any:
-        import psycopg2
-        connection = psycopg2.connect(
-            host=data_source.host,
-            port=data_source.port,
-            user=data_source.username,
-            password=data_source.password,
-            database=data_source.database
-        )
+    def _timed_sql(self, data_source: DataSource, sql_query: str, connection=None) -> Tuple[any, int]:
+        started = time.perf_counter()
+        value = self._execute_sql(data_source, sql_query, connection)
+        return value, self._elapsed_ms(started)
+    
+    @staticmethod
+    def _elapsed_ms(started: float) -> int:
+        return int(round((time.perf_counter() - started) * 1000))
+    
+    @staticmethod
+    def _window_start(window: Optional[TimeWindow]) -> Optional[datetime]:
+        return window.start.astimezone(timezone.utc) if window is not None else None
+    
+    def _execute_sql(self, data_source: DataSource, sql_query: str, connection=None) -> any:
+        if connection is None:
+            with connection_pools.connection(data_source) as connection:
+                return self._execute_sql(data_source, sql_query, connection)
         
         try:
-            with connection.cursor() as cursor:
-                cursor.execute(sql_query)
-                result = cursor.fetchone()
-                return result[0] if result and len(result) > 0 else None
-        finally:
-            connection.close()
+            return get_driver(data_source.type).execute_scalar(connection, sql_query)
+        except Exception as e:
+            raise ValueError(f"SQL execution failed: {str(e)}")
     
-    def _execute_clickhouse_sql(self, data_source: DataSource, sql_query: str) -> any:
-        client = Client(
-            host=data_source.host,
-            port=data_source.port,
-            user=data_source.username,
-            password=data_source.password,
-            database=data_source.database
-        )
-        
+    def _is_transient(self, task: InspectionTask, error: BaseException) -> bool:
         try:
-            result = client.execute(sql_query)
-            return result[0][0] if result and len(result) > 0 and len(result[0]) > 0 else None
-        finally:
-            client.disconnect()
+            return is_transient_error(task.data_source, error)
+        except Exception as e:
+            logger.warning(f"Failed to classify error of task {task.id}: {e}")
+            return False
     
-    def _execute_starrocks_sql(self, data_source: DataSource, sql_query: str) -> any:
-        # StarRocks uses MySQL protocol
-        return self._execute_mysql_sql(data_source, sql_query)
+    def _notify_dependents(self, task: InspectionTask):
+        """检查通过后通知DAG执行器，依赖该任务的下游任务满足条件时立即执行"""
+        from app.services.dag_executor import dag_executor
+        dag_executor.notify_task_completed(task.id)
     
     def _trigger_alert(self, task: InspectionTask, result: InspectionResult):
         # This would implement alert notification logic
@@ -644,38 +692,22 @@ class InspectionTaskService:
         
         # Here you could implement email, webhook, or other notification methods
     
-    def _evaluate_expression(self, expression: str, check_value: str, expected_value: str) -> bool:
-        # Simple expression evaluation
-        # In production, use a safer evaluation method
-        try:
-            check_num = float(check_value) if check_value else 0
-            expected_num = float(expected_value) if expected_value else 0
-            
-            if "==" in expression:
-                return check_num == expected_num
-            elif "!=" in expression:
-                return check_num != expected_num
-            elif ">" in expression:
-                return check_num > expected_num
-            elif "<" in expression:
-                return check_num < expected_num
-            elif ">=" in expression:
-                return check_num >= expected_num
-            elif "<=" in expression:
-                return check_num <= expected_num
-            else:
-                return False
-        except:
-            return False
-    
     def delete_task(self, task_id: int) -> bool:
         task = self.get_task(task_id)
         if task:
-            # 首先删除关联的执行结果历史记录
+            # 首先删除死信和关联的执行结果历史记录
+            self.db.query(DeadLetter).filter(DeadLetter.task_id == task_id).delete(synchronize_session=False)
             self.db.query(InspectionResult).filter(
                 InspectionResult.task_id == task_id
             ).delete()
             
+            # 删除该任务的依赖以及其他任务对它的依赖
+            self.db.query(TaskDependency).filter(
+                or_(TaskDependency.task_id == task_id, TaskDependency.upstream_task_id == task_id)
+            ).delete(synchronize_session=False)
+            
+            self.db.query(BackfillRun).filter(BackfillRun.task_id == task_id).delete(synchronize_session=False)
+            
             # 然后删除任务本身
             self.db.delete(task)
             self.db.commit()
@@ -695,6 +727,9 @@ class InspectionTaskService:
             
             if result:
                 logger.info(f"找到执行结果, 准备删除: {result.id}, task_id: {result.task_id}")
+                self.db.query(DeadLetter).filter(DeadLetter.result_id == result_id).update(
+                    {DeadLetter.result_id: None}, synchronize_session=False
+                )
                 self.db.delete(result)
                 logger.info(f"已标记删除, 准备提交事务")
                 self.db.commit()
@@ -755,7 +790,8 @@ class InspectionTaskService:
                 "check_passed": result.check_passed,
                 "execution_time": result.execution_time,
                 "error_message": result.error_message,
-                "duration": 0  # 暂时设为0，后续可以添加实际计算
+                "duration": result.duration_ms or 0,
+                "group_summary": json.loads(result.group_summary) if result.group_summary else None
             }
             for result in results
         ]
@@ -816,7 +852,8 @@ class InspectionTaskService:
                     "check_passed": result.check_passed,
                     "execution_time": result.execution_time,
                     "error_message": result.error_message,
-                    "duration": 0  # 暂时设为0，后续可以添加实际计算
+                    "duration": result.duration_ms or 0,
+                    "group_summary": json.loads(result.group_summary) if result.group_summary else None
                 })
         
         return detailed_results
@@ -857,6 +894,73 @@ class InspectionTaskService:
             })
         
         return stats
+    
+    def get_schedule_load_preview(
+        self,
+        horizon_seconds: int = 3600,
+        bucket_seconds: int = 60,
+        data_source_id: Optional[int] = None,
+        assume_spread_seconds: Optional[int] = None
+    ) -> dict:
+        """预测未来 horizon_seconds 秒内各数据源每个时间桶的触发次数
+        
+        assume_spread_seconds 不为空时，按所有任务都使用该分散窗口计算，用于评估调整效果。
+        """
+        from app.schedulers.triggers import build_task_trigger
+        
+        query = self.db.query(InspectionTask).filter(InspectionTask.status == 'active')
+        if data_source_id is not None:
+            query = query.filter(InspectionTask.data_source_id == data_source_id)
+        tasks = [task for task in query.all() if task.cron_schedule]
+        
+        start_ts = int(time.time()) // bucket_seconds * bucket_seconds
+        bucket_count = -(-horizon_seconds // bucket_seconds)
+        end_ts = start_ts + bucket_count * bucket_seconds
+        
+        counts: Dict[int, List[int]] = {}
+        task_counts: Dict[int, int] = {}
+        invalid_tasks = []
+        for task in tasks:
+            spread = (task.spread_window_seconds or 0) if assume_spread_seconds is None else assume_spread_seconds
+            try:
+                trigger = build_task_trigger(task.id, task.cron_schedule, spread)
+            except ValueError:
+                invalid_tasks.append(task.id)
+                continue
+            
+            buckets = counts.setdefault(task.data_source_id, [0] * bucket_count)
+            task_counts[task.data_source_id] = task_counts.get(task.data_source_id, 0) + 1
+            now = datetime.fromtimestamp(start_ts, trigger.timezone)
+            fire_time = trigger.get_next_fire_time(None, now)
+            while fire_time is not None and fire_time.timestamp() < end_ts:
+                buckets[int(fire_time.timestamp() - start_ts) // bucket_seconds] += 1
+                fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+        
+        names = dict(
+            self.db.query(DataSource.id, DataSource.name).filter(DataSource.id.in_(list(counts))).all()
+        ) if counts else {}
+        data_sources = []
+        for source_id in sorted(counts):
+            buckets = counts[source_id]
+            peak = max(buckets)
+            data_sources.append({
+                "data_source_id": source_id,
+                "data_source_name": names.get(source_id),
+                "tasks": task_counts[source_id],
+                "executions": sum(buckets),
+                "peak": peak,
+                "peak_at": datetime.fromtimestamp(start_ts + buckets.index(peak) * bucket_seconds).isoformat(),
+                "buckets": buckets
+            })
+        
+        return {
+            "start": datetime.fromtimestamp(start_ts).isoformat(),
+            "horizon_seconds": bucket_count * bucket_seconds,
+            "bucket_seconds": bucket_seconds,
+            "assume_spread_seconds": assume_spread_seconds,
+            "invalid_tasks": invalid_tasks,
+            "data_sources": data_sources
+        }
 
 class TaskScheduler:
     def __init__(self, db_session_factory):
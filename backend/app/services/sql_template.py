@@ -0,0 +1,77 @@
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+
+# 检查SQL和期望SQL中可用的时间窗口参数，按原样替换为文本，字符串需要在SQL中自行加引号：
+#   {{ds}}            窗口起始日期 2024-01-31
+#   {{ds_nodash}}     窗口起始日期 20240131
+#   {{window_start}}  窗口起始时间 2024-01-31 00:00:00
+#   {{window_end}}    窗口结束时间(不含) 2024-02-01 00:00:00
+_PARAMETER_PATTERN = re.compile(r"\{\{\s*(ds|ds_nodash|window_start|window_end)\s*\}\}")
+
+
+class TimeWindow(NamedTuple):
+    """一次执行对应的数据时间窗口 [start, end)，带 SQL_TEMPLATE_TIMEZONE 时区"""
+    start: datetime
+    end: datetime
+
+
+def template_timezone() -> ZoneInfo:
+    return ZoneInfo(settings.SQL_TEMPLATE_TIMEZONE)
+
+
+def as_utc(value: datetime) -> datetime:
+    """SQLite 读回不带时区的UTC时间，统一成带时区的值再比较"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def has_parameters(sql: Optional[str]) -> bool:
+    return bool(sql) and _PARAMETER_PATTERN.search(sql) is not None
+
+
+def render_sql(sql: str, window: TimeWindow) -> str:
+    """把SQL中的时间窗口参数替换为窗口的日期/时间"""
+    values = {
+        "ds": window.start.strftime("%Y-%m-%d"),
+        "ds_nodash": window.start.strftime("%Y%m%d"),
+        "window_start": window.start.strftime("%Y-%m-%d %H:%M:%S"),
+        "window_end": window.end.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return _PARAMETER_PATTERN.sub(lambda match: values[match.group(1)], sql)
+
+
+def day_window(day: date) -> TimeWindow:
+    tz = template_timezone()
+    return TimeWindow(
+        datetime.combine(day, time.min, tzinfo=tz),
+        datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+    )
+
+
+def default_window(now: Optional[datetime] = None) -> TimeWindow:
+    """定时和手动执行使用的窗口：前一个完整自然日，与按天分区的数据就绪时间一致"""
+    now = now or datetime.now(timezone.utc)
+    return day_window(now.astimezone(template_timezone()).date() - timedelta(days=1))
+
+
+def day_windows(start_date: date, end_date: date) -> List[TimeWindow]:
+    """回填区间内每天一个窗口，包含起止两天"""
+    return [day_window(start_date + timedelta(days=offset)) for offset in range((end_date - start_date).days + 1)]
+
+
+def task_window(check_sql: str, expected_sql: str, window: Optional[TimeWindow] = None) -> Optional[TimeWindow]:
+    """任务本次执行的窗口：指定了窗口(回填)时使用指定窗口，SQL中有参数时使用默认窗口，否则为None"""
+    if window is not None:
+        return window
+    if has_parameters(check_sql) or has_parameters(expected_sql):
+        return default_window()
+    return None
+
+
+def render_task_sql(check_sql: str, expected_sql: str, window: Optional[TimeWindow]) -> Tuple[str, str]:
+    if window is None:
+        return check_sql, expected_sql
+    return render_sql(check_sql, window), render_sql(expected_sql, window)
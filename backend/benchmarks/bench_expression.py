@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Check expression micro-benchmark
+Compares the compiled expression engine (app.services.expression) with the
+previous substring-based evaluator, and checks where their results differ.
+
+Usage: python benchmarks/bench_expression.py [iterations]
+"""
+
+import sys
+import os
+import timeit
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.expression import compile_expression, evaluate_expression
+
+
+def legacy_evaluate_expression(expression: str, check_value: str, expected_value: str) -> bool:
+    """InspectionTaskService._evaluate_expression 替换前的实现(原样保留，用于对比)"""
+    try:
+        check_num = float(check_value) if check_value else 0
+        expected_num = float(expected_value) if expected_value else 0
+
+        if "==" in expression:
+            return check_num == expected_num
+        elif "!=" in expression:
+            return check_num != expected_num
+        elif ">" in expression:
+            return check_num > expected_num
+        elif "<" in expression:
+            return check_num < expected_num
+        elif ">=" in expression:
+            return check_num >= expected_num
+        elif "<=" in expression:
+            return check_num <= expected_num
+        else:
+            return False
+    except:
+        return False
+
+
+CASES = [
+    ("check_value == expected_value", 1024, 1024),
+    ("check_value != expected_value", Decimal("10.50"), Decimal("10.5")),
+    ("check_value > expected_value", 11, 10),
+    ("check_value >= expected_value", 10, 10),
+    ("check_value <= expected_value", Decimal("99.99"), Decimal("99.99")),
+    ("abs(check-expected)/expected < 0.01", Decimal("100.4"), Decimal("100")),
+]
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    print(f"{'expression':<40} {'legacy':>8} {'compiled':>9} {'legacy ns':>10} {'compiled ns':>12}")
+    for expression, check_value, expected_value in CASES:
+        compile_expression(expression)
+        legacy_result = legacy_evaluate_expression(expression, str(check_value), str(expected_value))
+        compiled_result = evaluate_expression(expression, check_value, expected_value)
+
+        # 旧实现每次执行都要 str() 再 float()，计时时包含这部分开销
+        legacy_ns = timeit.timeit(
+            lambda: legacy_evaluate_expression(expression, str(check_value), str(expected_value)),
+            number=iterations
+        ) / iterations * 1e9
+        compiled_ns = timeit.timeit(
+            lambda: evaluate_expression(expression, check_value, expected_value),
+            number=iterations
+        ) / iterations * 1e9
+
+        marker = "" if legacy_result == compiled_result else "  <- differs"
+        print(
+            f"{expression:<40} {str(legacy_result):>8} {str(compiled_result):>9} "
+            f"{legacy_ns:>10.0f} {compiled_ns:>12.0f}{marker}"
+        )
+
+    print(f"\ncompile cache: {compile_expression.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
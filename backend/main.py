@@ -1,12 +1,20 @@
 import logging
 import atexit
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.database import engine, SessionLocal
+from app.core.database import engine, SessionLocal, add_missing_columns
 from app.models.models import Base
 from app.api import auth, projects, data_sources, inspection_tasks, dashboard, users
 from app.schedulers.factory import SchedulerManager
+from app.schedulers.control import RemoteSchedulerManager, SchedulerUnavailableError
+from app.services.connection_pool import connection_pools
+from app.services.backfill_runner import backfill_runner
+from app.services.dag_executor import dag_executor
+from app.services.health_prober import health_prober
+from app.services.retry import retry_queue
+from app.services.schema_catalog import schema_catalog
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,10 +23,15 @@ logger = logging.getLogger(__name__)
 # Create database tables
 logger.info("Creating database tables...")
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, Base.metadata)
 logger.info("Database tables created successfully")
 
 # Initialize scheduler manager
-scheduler_manager = SchedulerManager(settings, SessionLocal)
+# standalone 模式下调度器由 scheduler_main.py 单独运行，API只通过控制通道访问
+if settings.SCHEDULER_MODE == "standalone":
+    scheduler_manager = RemoteSchedulerManager(settings)
+else:
+    scheduler_manager = SchedulerManager(settings, SessionLocal)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -40,6 +53,19 @@ async def startup_event():
         # 加载活跃任务
         scheduler_manager.load_active_tasks()
         
+        # 任务依赖触发随调度器运行，standalone 模式下在调度进程中启动
+        if settings.DAG_ENABLED and settings.SCHEDULER_MODE == "embedded":
+            dag_executor.start(SessionLocal)
+        
+        # 历史回填和失败重试同样在运行调度器的进程中执行
+        if settings.SCHEDULER_MODE == "embedded":
+            backfill_runner.start(SessionLocal)
+            retry_queue.start(SessionLocal)
+        
+        # 启动数据源健康探测
+        if settings.HEALTH_PROBE_ENABLED:
+            health_prober.start(SessionLocal)
+        
         logger.info("Application startup completed successfully")
         
     except Exception as e:
@@ -54,6 +80,14 @@ async def shutdown_event():
     try:
         # 关闭调度器
         scheduler_manager.shutdown()
+        
+        # 停止健康探测并关闭数据源连接池
+        dag_executor.shutdown()
+        backfill_runner.shutdown()
+        retry_queue.shutdown()
+        health_prober.shutdown()
+        schema_catalog.shutdown()
+        connection_pools.close_all()
         logger.info("Application shutdown completed successfully")
         
     except Exception as e:
@@ -79,6 +113,11 @@ app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["u
 # Make scheduler manager available to routers
 app.state.scheduler_manager = scheduler_manager
 
+@app.exception_handler(SchedulerUnavailableError)
+async def scheduler_unavailable_handler(request: Request, exc: SchedulerUnavailableError):
+    """standalone 模式下调度进程不可达"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
 @app.get("/")
 def read_root():
     return {"message": "欢迎使用数据库质量巡检系统API", "version": settings.VERSION}
@@ -88,6 +127,7 @@ def health_check():
     scheduler_status = {
         "enabled": settings.SCHEDULER_ENABLED,
         "type": settings.SCHEDULER_TYPE,
+        "mode": settings.SCHEDULER_MODE,
         "running": scheduler_manager.is_scheduler_running(),
         "initialized": scheduler_manager.is_initialized
     }
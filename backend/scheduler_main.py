@@ -0,0 +1,74 @@
+import logging
+import signal
+import threading
+from app.core.config import settings
+from app.core.database import engine, SessionLocal, add_missing_columns
+from app.models.models import Base
+from app.schedulers.factory import SchedulerManager
+from app.schedulers.control import SchedulerControlServer, control_authkey
+from app.services.connection_pool import connection_pools
+from app.services.backfill_runner import backfill_runner
+from app.services.dag_executor import dag_executor
+from app.services.health_prober import health_prober
+from app.services.retry import retry_queue
+from app.services.schema_catalog import schema_catalog
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """独立运行调度器和任务执行，配合 SCHEDULER_MODE=standalone 的API进程使用
+
+    API进程不再各自启动调度器，任务的增删、重载和状态查询经控制通道转到这里，
+    因此无论API启动多少个worker或副本，每个任务只会被调度一次。
+    """
+    if not settings.SCHEDULER_ENABLED:
+        logger.error("Scheduler is disabled in configuration, nothing to run")
+        return
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine, Base.metadata)
+
+    scheduler_manager = SchedulerManager(settings, SessionLocal)
+    control_server = SchedulerControlServer(
+        scheduler_manager, settings.SCHEDULER_CONTROL_ADDRESS, control_authkey(settings)
+    )
+    # 先占用控制地址，同一地址上已有调度进程时在启动调度器之前失败
+    control_server.start()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    try:
+        scheduler_manager.initialize()
+        scheduler_manager.load_active_tasks()
+
+        if settings.DAG_ENABLED:
+            dag_executor.start(SessionLocal)
+        backfill_runner.start(SessionLocal)
+        retry_queue.start(SessionLocal)
+        
+        # 任务在本进程执行，熔断和健康状态也在本进程维护
+        if settings.HEALTH_PROBE_ENABLED:
+            health_prober.start(SessionLocal)
+
+        logger.info(f"Scheduler process started with type: {settings.SCHEDULER_TYPE}")
+        stop.wait()
+    finally:
+        logger.info("Shutting down scheduler process...")
+        control_server.shutdown()
+        scheduler_manager.shutdown()
+        dag_executor.shutdown()
+        backfill_runner.shutdown()
+        retry_queue.shutdown()
+        health_prober.shutdown()
+        schema_catalog.shutdown()
+        connection_pools.close_all()
+        logger.info("Scheduler process stopped")
+
+
+if __name__ == "__main__":
+    main()
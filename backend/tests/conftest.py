@@ -0,0 +1,6 @@
+import os
+import sys
+
+# 测试不连接开发库
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
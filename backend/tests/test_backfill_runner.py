@@ -0,0 +1,26 @@
+"""回填窗口经调度器执行的测试，不访问元数据库"""
+from concurrent.futures import Future
+from datetime import datetime
+
+from app.services.backfill_runner import BackfillRunner
+from app.services.sql_template import TimeWindow
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.submitted = []
+
+    def submit_execution(self, task_id, window=None, attempt=1, backfill_id=None):
+        self.submitted.append((task_id, window, backfill_id))
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+def test_windows_are_submitted_to_the_scheduler():
+    runner = BackfillRunner(session_factory=lambda: None)
+    runner.scheduler = FakeScheduler()
+    window = TimeWindow(datetime(2026, 1, 1), datetime(2026, 1, 2))
+
+    assert runner._submit_window(3, 7, window).done()
+    assert runner.scheduler.submitted == [(7, window, 3)]
@@ -0,0 +1,54 @@
+"""合并执行按数据源分组提交到调度器线程池的测试，不访问元数据库"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.schedulers.native_scheduler import NativeScheduler
+
+
+class RecordingScheduler(NativeScheduler):
+    """任务ID的十位数是数据源ID，合并执行只记录分组和执行线程"""
+
+    def __init__(self):
+        super().__init__(db_session_factory=lambda: None, config={"max_workers": 4, "max_instances": 1})
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="native-scheduler")
+        self.batches = []
+        self.gate = threading.Event()
+
+    def _group_by_data_source(self, task_ids):
+        groups = {}
+        for task_id in task_ids:
+            groups.setdefault(task_id // 10, []).append(task_id)
+        return list(groups.values())
+
+    def _execute_batch(self, task_ids):
+        self.batches.append((threading.current_thread().name, sorted(task_ids)))
+        self.gate.wait(5)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_batch_groups_run_in_parallel_on_the_scheduler_executor():
+    scheduler = RecordingScheduler()
+    try:
+        scheduler._dispatch_batch([11, 12, 21])
+        # 两个数据源的分组同时在执行
+        assert wait_until(lambda: len(scheduler.batches) == 2)
+        assert sorted(group for _, group in scheduler.batches) == [[11, 12], [21]]
+        assert all(name.startswith("native-scheduler") for name, _ in scheduler.batches)
+
+        # 上一批还在执行，达到 max_instances 的任务本次跳过
+        scheduler._dispatch_batch([11, 31, 32])
+        assert wait_until(lambda: len(scheduler.batches) == 3)
+        assert scheduler.batches[-1][1] == [31, 32]
+    finally:
+        scheduler.gate.set()
+        scheduler._executor.shutdown(wait=True)
+    assert scheduler._running == {}
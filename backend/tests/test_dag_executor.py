@@ -0,0 +1,41 @@
+"""依赖触发的任务经调度器执行的测试，不访问元数据库"""
+from concurrent.futures import Future
+from functools import partial
+
+from app.services.dag_executor import DagExecutor
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.submitted = []
+        self.futures = []
+
+    def submit_execution(self, task_id):
+        return self._future(("execution", task_id))
+
+    def submit_batch(self, task_ids):
+        return self._future(("batch", task_ids))
+
+    def _future(self, submission):
+        self.submitted.append(submission)
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def test_ready_tasks_are_submitted_to_the_scheduler():
+    executor = DagExecutor(session_factory=lambda: None)
+    executor.scheduler = FakeScheduler()
+    for data_source_id, task_ids in ((1, [10]), (2, [20, 21])):
+        executor._running.update(task_ids)
+        future = executor._submit(task_ids)
+        future.add_done_callback(partial(executor._finished, data_source_id, task_ids))
+
+    assert executor.scheduler.submitted == [("execution", 10), ("batch", [20, 21])]
+    assert executor.stats()["executing"] == [10, 20, 21]
+
+    executor.scheduler.futures[0].set_result(None)
+    executor.scheduler.futures[1].set_exception(RuntimeError("boom"))
+    stats = executor.stats()
+    assert stats["executing"] == []
+    assert stats["failed"] == 2
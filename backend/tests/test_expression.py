@@ -0,0 +1,37 @@
+"""检查表达式的校验测试：文本不能参与算术运算，保存任务时拒绝无效表达式"""
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.schemas import InspectionTaskUpdate
+from app.services.expression import compile_expression, evaluate_expression, validate_expression
+
+
+@pytest.mark.parametrize("expression", [
+    '"a" * 100000000000 == check_value',
+    'max("aa", "b") * 100000000000 == check',
+    'check_value ==',
+    'check_value == __import__("os")',
+])
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        validate_expression(expression)
+
+
+def test_text_constants_can_still_be_compared():
+    assert validate_expression('check_value == "ok"')
+    assert evaluate_expression('check_value == "ok"', "ok", None)
+
+
+def test_text_operands_are_not_used_in_arithmetic():
+    compiled = compile_expression("check * 100000000000 == expected")
+    assert not compiled.evaluate("abc", "abc")
+    assert compiled.evaluate("2", 200000000000)
+    # 只参与比较的一侧可以是文本
+    assert compile_expression("check * 2 == 4 or expected == 'x'").evaluate(2, "y")
+
+
+def test_task_update_validates_expression():
+    with pytest.raises(ValidationError):
+        InspectionTaskUpdate(check_expression='"a" * 100000000000 == check_value')
+    assert InspectionTaskUpdate(check_expression=None).check_expression is None
+    assert InspectionTaskUpdate(check_expression="check_value >= expected_value * 0.9").check_expression
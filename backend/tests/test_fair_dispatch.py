@@ -0,0 +1,65 @@
+"""公平派发队列满时被拒绝或被挤出的触发记录为失败结果的测试，不访问元数据库"""
+import threading
+import time
+
+from app.schedulers.native_scheduler import NativeScheduler
+
+
+class RecordingScheduler(NativeScheduler):
+    """所有任务属于同一个数据源，执行只记录任务ID，失败结果记录在内存中"""
+
+    def __init__(self, priorities=None, **config):
+        super().__init__(db_session_factory=lambda: None, config=dict(config, fair_dispatch=True, max_workers=1))
+        self.priorities = priorities or {}
+        self.executed = []
+        self.errors = []
+        self.gate = threading.Event()
+
+    def _task_dispatch_info(self, task_id):
+        return 1, self.priorities.get(task_id, 2)
+
+    def _run_task(self, task_id, window=None, attempt=1, backfill_id=None):
+        self.gate.wait(5)
+        self.executed.append(task_id)
+
+    def _record_error(self, task_id, error_message, duration_ms, error=None, window=None, attempt=1, backfill_id=None):
+        self.errors.append((task_id, type(error).__name__))
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_trigger_rejected_by_full_queue_is_recorded():
+    scheduler = RecordingScheduler(max_in_flight_per_source=1, max_queue_depth=1)
+    try:
+        # 第一个触发占住执行槽，第二个排队，第三个被拒绝
+        for task_id in (1, 2, 3):
+            scheduler.submit_execution(task_id)
+        assert scheduler.errors == [(3, "DispatchQueueFullError")]
+        scheduler.gate.set()
+        assert wait_until(lambda: len(scheduler.executed) == 2)
+    finally:
+        scheduler.gate.set()
+        scheduler.dispatcher.shutdown(wait=True)
+    assert scheduler.executed == [1, 2]
+
+
+def test_queued_trigger_evicted_by_higher_priority_is_recorded():
+    # 任务3是 critical，队列满时挤出排队中的 normal 任务2
+    scheduler = RecordingScheduler(priorities={3: 0}, max_in_flight_per_source=1, max_queue_depth=1)
+    try:
+        for task_id in (1, 2, 3):
+            scheduler.submit_execution(task_id)
+        assert scheduler.errors == [(2, "DispatchQueueFullError")]
+        scheduler.gate.set()
+        assert wait_until(lambda: len(scheduler.executed) == 2)
+    finally:
+        scheduler.gate.set()
+        scheduler.dispatcher.shutdown(wait=True)
+    assert scheduler.executed == [1, 3]
@@ -0,0 +1,212 @@
+"""RedisScheduler 在 fakeredis 上的测试，Lua 脚本由 fakeredis(lupa) 执行"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import pytest
+
+from app.schedulers.redis_scheduler import RedisScheduler
+
+# 每年只触发一次，测试期间完成后的下一次排期不会再到期
+YEARLY = "0 0 1 1 *"
+
+
+class RecordingScheduler(RedisScheduler):
+    """把执行记录到共享列表，不访问元数据库"""
+
+    def __init__(self, server, runs, config=None, gate=None):
+        config = dict(
+            {
+                'fair_dispatch': False,
+                'executor': 'thread',
+                'key_prefix': 'test:scheduler',
+                'max_workers': 4,
+                'poll_interval': 0.01,
+                'lease_ttl': 30,
+                'claim_batch': 5,
+            },
+            **(config or {})
+        )
+        super().__init__(None, config, client=fakeredis.FakeRedis(server=server))
+        self.runs = runs
+        self.gate = gate
+
+    def _run_task(self, task_id: int):
+        self.runs.append((self.node_id, task_id))
+        if self.gate is not None:
+            self.gate.wait(5)
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def runs():
+    return []
+
+
+def make_due(node, *task_ids, at=None):
+    """把任务的下一次到期时间改到过去"""
+    at = at if at is not None else time.time() - 10
+    node.client.zadd(node.schedule_key, {task_id: at for task_id in task_ids})
+
+
+def with_executor(node):
+    node._executor = ThreadPoolExecutor(max_workers=node.max_workers)
+    return node
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_register_keeps_schedule_of_unchanged_definition(server, runs):
+    node = RecordingScheduler(server, runs)
+    node.add_task(1, YEARLY, "t1")
+    make_due(node, 1, at=123.0)
+
+    node.add_task(1, YEARLY, "t1")
+    assert node.client.zscore(node.schedule_key, 1) == 123.0
+
+    node.add_task(1, "0 0 * * *", "t1")
+    assert node.client.zscore(node.schedule_key, 1) > time.time()
+    assert node.get_task_status(1)['trigger'] == "0 0 * * *"
+
+
+def test_due_tasks_run_exactly_once_across_nodes(server, runs):
+    nodes = [RecordingScheduler(server, runs), RecordingScheduler(server, runs)]
+    task_ids = list(range(1, 31))
+    for task_id in task_ids:
+        nodes[0].add_task(task_id, YEARLY, f"t{task_id}")
+    make_due(nodes[0], *task_ids)
+
+    for node in nodes:
+        node.start()
+    try:
+        assert wait_until(lambda: len(runs) >= len(task_ids))
+        # 再多轮询几次，确认没有重复领取
+        time.sleep(0.2)
+    finally:
+        for node in nodes:
+            node.shutdown()
+
+    assert sorted(task_id for _, task_id in runs) == task_ids
+    assert {node_id for node_id, _ in runs} <= {node.node_id for node in nodes}
+    assert nodes[0].client.hlen(nodes[0].leases_key) == 0
+    now = time.time()
+    for task_id in task_ids:
+        assert nodes[0].client.zscore(nodes[0].schedule_key, task_id) > now
+
+
+def test_expired_lease_is_recovered_by_another_node(server, runs):
+    crashed = RecordingScheduler(server, runs)
+    survivor = with_executor(RecordingScheduler(server, runs))
+    crashed.add_task(7, YEARLY, "t7")
+    fire_at = time.time() - 10
+    make_due(crashed, 7, at=fire_at)
+
+    # 节点领取后宕机：持有租约但不执行、不续约
+    now = time.time()
+    member, lease, claimed_fire_at, recovered = crashed._claim(
+        keys=[crashed.schedule_key, crashed.leases_key],
+        args=[now, now + crashed.lease_ttl, 10, crashed.node_id]
+    )
+    assert recovered == b'0'
+    assert survivor._claim_due_tasks() == 0
+
+    # 租约到期后由其他节点领取，沿用原来的计划触发时间
+    make_due(crashed, 7, at=now - 1)
+    assert survivor._claim_due_tasks() == 1
+    survivor._executor.shutdown(wait=True)
+    assert runs == [(survivor.node_id, 7)]
+    assert float(claimed_fire_at) == pytest.approx(fire_at)
+
+    # 宕机节点恢复后用旧租约完成不会改动排期
+    score = survivor.client.zscore(survivor.schedule_key, 7)
+    crashed._finish(7, lease.decode(), float(claimed_fire_at))
+    assert survivor.client.zscore(survivor.schedule_key, 7) == score
+
+
+def test_heartbeat_renews_only_own_lease(server, runs):
+    gate = threading.Event()
+    owner = with_executor(RecordingScheduler(server, runs, {'lease_ttl': 3}, gate=gate))
+    other = RecordingScheduler(server, runs, {'lease_ttl': 3})
+    owner.add_task(3, YEARLY, "t3")
+    make_due(owner, 3)
+
+    try:
+        assert owner._claim_due_tasks() == 1
+        lease_expires = owner.client.zscore(owner.schedule_key, 3)
+
+        time.sleep(0.05)
+        owner._last_heartbeat = 0
+        owner._renew_leases()
+        renewed = owner.client.zscore(owner.schedule_key, 3)
+        assert renewed > lease_expires
+
+        # 另一个节点接管后，原持有者的续约不再推迟到期时间
+        make_due(owner, 3)
+        other._executor = ThreadPoolExecutor(max_workers=1)
+        assert other._claim_due_tasks() == 1
+        taken_over = other.client.zscore(other.schedule_key, 3)
+        owner._last_heartbeat = 0
+        owner._renew_leases()
+        assert other.client.zscore(other.schedule_key, 3) == taken_over
+    finally:
+        gate.set()
+        owner._executor.shutdown(wait=True)
+        if other._executor is not None:
+            other._executor.shutdown(wait=True)
+
+
+def test_complete_reschedules_to_next_fire(server, runs):
+    node = with_executor(RecordingScheduler(server, runs))
+    node.add_task(5, "0 0 * * *", "t5")
+    node.add_task(6, YEARLY, "t6")
+    make_due(node, 5, 6)
+
+    gate = threading.Event()
+    node.gate = gate
+    assert node._claim_due_tasks() == 2
+    # 执行期间任务被移除，完成后不再排期
+    node.remove_task(6)
+    gate.set()
+    node._executor.shutdown(wait=True)
+
+    assert node.client.hlen(node.leases_key) == 0
+    assert node.client.zscore(node.schedule_key, 6) is None
+    trigger = node._trigger_for("0 0 * * *")
+    expected = node._next_fire_timestamp(trigger, time.time())
+    assert node.client.zscore(node.schedule_key, 5) == pytest.approx(expected)
+    assert node.get_task_status(5)['executing'] is False
+
+
+def test_apply_reconcile_adds_renames_and_removes(server, runs):
+    node = RecordingScheduler(server, runs)
+    node.add_task(1, YEARLY, "keep")
+    node.add_task(2, YEARLY, "old name")
+    node.add_task(3, YEARLY, "gone")
+    make_due(node, 2, at=4102444800.0)
+
+    node._apply_reconcile(
+        adds=[(4, "0 0 * * *", "new", 0)],
+        renames=[(2, YEARLY, "new name", 0)],
+        removes=[3],
+    )
+
+    tasks = node.list_tasks()
+    assert sorted(tasks) == [1, 2, 4]
+    assert tasks[2]['name'] == "new name"
+    # 只改名的任务保留原来的排期
+    assert node.client.zscore(node.schedule_key, 2) == 4102444800.0
+    assert tasks[4]['trigger'] == "0 0 * * *"
+    assert node.client.zscore(node.schedule_key, 3) is None
+    assert node.client.hget(node.leases_key, 3) is None
@@ -0,0 +1,119 @@
+"""重试队列经调度器执行的测试，不访问元数据库"""
+import threading
+import time
+
+from app.schedulers.executors import RetryRequest
+from app.schedulers.native_scheduler import NativeScheduler
+from app.services.retry import RetryQueue
+
+
+class RecordingRetryQueue(RetryQueue):
+    def __init__(self):
+        super().__init__(session_factory=lambda: None, max_workers=1)
+        self.executed = []
+        self.abandoned = []
+
+    def _execute(self, entry):
+        self.executed.append((threading.current_thread().name, entry.task_id, entry.attempt))
+
+    def _abandon(self, entry, reason="abandoned at shutdown"):
+        self.abandoned.append((entry.task_id, entry.attempt, reason))
+
+
+class RecordingScheduler(NativeScheduler):
+    """所有任务属于同一个数据源，执行只记录参数"""
+
+    def __init__(self, **config):
+        super().__init__(db_session_factory=lambda: None, config=dict(config, max_workers=2))
+        self.executed = []
+        self.gate = threading.Event()
+
+    def _task_dispatch_info(self, task_id):
+        return 1, 2
+
+    def _run_task(self, task_id, window=None, attempt=1, backfill_id=None):
+        self.gate.wait(5)
+        self.executed.append((threading.current_thread().name, task_id, attempt))
+
+
+class FakeProcessPool:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def run(self, task_id, window=None, attempt=1, backfill_id=None):
+        return self.outcome
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_due_retries_run_through_the_scheduler():
+    queue = RecordingRetryQueue()
+    scheduler = RecordingScheduler(fair_dispatch=True, max_in_flight_per_source=1, max_queue_depth=10)
+    queue.scheduler = scheduler
+    scheduler.gate.set()
+    queue.start()
+    try:
+        assert queue.schedule(5, 2, 0, None, "timeout")
+        assert wait_until(lambda: queue.stats()["executed"])
+    finally:
+        queue.shutdown()
+        scheduler.dispatcher.shutdown(wait=True)
+
+    assert queue.executed == []
+    assert len(scheduler.executed) == 1
+    thread_name, task_id, attempt = scheduler.executed[0]
+    assert thread_name.startswith("fair-dispatch")
+    assert (task_id, attempt) == (5, 2)
+    assert scheduler.dispatcher.stats()["data_sources"][0]["dispatched"] == 1
+
+
+def test_retry_rejected_by_full_dispatch_queue_is_recorded():
+    queue = RecordingRetryQueue()
+    scheduler = RecordingScheduler(fair_dispatch=True, max_in_flight_per_source=1, max_queue_depth=1)
+    queue.scheduler = scheduler
+    queue.start()
+    try:
+        # 第一个重试占住数据源唯一的执行槽，第二个排队，第三个被拒绝
+        for task_id in (1, 2, 3):
+            assert queue.schedule(task_id, 2, 0, None, "timeout")
+        assert wait_until(lambda: queue.abandoned)
+        assert queue.abandoned == [(3, 2, "dropped, dispatch queue full")]
+    finally:
+        scheduler.gate.set()
+        queue.shutdown()
+        scheduler.dispatcher.shutdown(wait=True)
+    assert sorted(task_id for _, task_id, _ in scheduler.executed) == [1, 2]
+
+
+def test_worker_retry_requests_are_relayed_to_the_scheduler_process(monkeypatch):
+    from app.services import retry
+
+    worker_queue = RetryQueue()
+    worker_queue.relay()
+    assert worker_queue.schedule(7, 2, 1.5, None, "timeout")
+    assert worker_queue.take_relayed() == [(7, 2, 1.5, None, "timeout")]
+    assert worker_queue.take_relayed() == []
+
+    parent_queue = RecordingRetryQueue()
+    monkeypatch.setattr(retry, "retry_queue", parent_queue)
+    scheduler = NativeScheduler(db_session_factory=lambda: None, config={"fair_dispatch": False})
+    scheduler.process_pool = FakeProcessPool(RetryRequest(2, 0, None, "timeout"))
+
+    # 重试队列没有运行时，交回的重试记录为失败结果
+    scheduler._run_task(7)
+    assert parent_queue.abandoned == [(7, 2, "not scheduled, retry queue is not running")]
+
+    parent_queue.start()
+    try:
+        scheduler._run_task(7)
+        assert wait_until(lambda: parent_queue.executed)
+    finally:
+        parent_queue.shutdown()
+    assert [(task_id, attempt) for _, task_id, attempt in parent_queue.executed] == [(7, 2)]
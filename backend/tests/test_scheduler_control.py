@@ -0,0 +1,101 @@
+"""standalone 模式控制通道的测试：认证密钥、JSON协议和执行状态转发"""
+from datetime import datetime
+
+import pytest
+
+from app.core.config import Settings
+from app.schedulers.control import RemoteSchedulerManager, SchedulerClient, SchedulerControlServer, control_authkey
+from app.schedulers.factory import ExecutionStateMixin
+from app.services.circuit_breaker import circuit_breakers
+from app.services.result_cache import result_cache
+
+AUTHKEY = "test-control-authkey"
+
+
+class FakeScheduler:
+    is_running = True
+
+    def list_tasks(self):
+        return {1: {'task_id': 1, 'next_run': datetime(2026, 1, 1, 8, 30)}}
+
+    def task_fingerprints(self):
+        return {1: ("cron", "t1")}
+
+
+class FakeManager(ExecutionStateMixin):
+    is_initialized = True
+
+    def __init__(self):
+        self.settings = Settings(SCHEDULER_TYPE="native")
+        self.scheduler = FakeScheduler()
+
+    def get_scheduler(self):
+        return self.scheduler
+
+    def is_scheduler_running(self):
+        return True
+
+
+@pytest.fixture
+def server():
+    server = SchedulerControlServer(FakeManager(), "127.0.0.1:0", AUTHKEY.encode())
+    server.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def remote(server):
+    host, port = server._listener.address
+    manager = RemoteSchedulerManager(Settings(
+        SCHEDULER_CONTROL_ADDRESS=f"{host}:{port}",
+        SCHEDULER_CONTROL_AUTHKEY=AUTHKEY,
+    ))
+    yield manager
+    manager.client._close()
+
+
+def test_authkey_must_not_fall_back_to_default_secret():
+    with pytest.raises(RuntimeError):
+        control_authkey(Settings(SCHEDULER_CONTROL_AUTHKEY=""))
+    with pytest.raises(RuntimeError):
+        control_authkey(Settings(SCHEDULER_CONTROL_AUTHKEY=Settings.model_fields["SECRET_KEY"].default))
+    assert control_authkey(Settings(SCHEDULER_CONTROL_AUTHKEY=AUTHKEY)) == AUTHKEY.encode()
+
+
+def test_json_protocol_round_trip(remote):
+    tasks = remote.get_scheduler().list_tasks()
+    assert tasks == {1: {'task_id': 1, 'next_run': "2026-01-01T08:30:00"}}
+    assert remote.get_scheduler().status()["total_tasks"] == 1
+    with pytest.raises(RuntimeError, match="Unsupported"):
+        remote.client.call("__class__")
+
+
+def test_wrong_authkey_is_rejected(server):
+    from app.schedulers.control import SchedulerUnavailableError
+    host, port = server._listener.address
+    client = SchedulerClient(f"{host}:{port}", b"wrong-key", 1.0)
+    with pytest.raises(SchedulerUnavailableError):
+        client.call("status")
+
+
+def test_execution_state_is_read_through_the_channel(remote):
+    circuit_breakers.remove(901)
+    breaker = circuit_breakers.get(901)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(ConnectionError("refused"))
+
+    assert remote.circuit_states([901]) == {901: "open"}
+    assert remote.circuit_breaker_stats(901)["state"] == "open"
+    assert remote.reset_circuit_breaker(901)["state"] == "closed"
+    assert remote.result_cache_stats() == result_cache.stats()
+    assert "pending" in remote.retry_stats()
+    circuit_breakers.remove(901)
+
+
+def test_circuit_states_fall_back_when_scheduler_unreachable():
+    manager = RemoteSchedulerManager(Settings(
+        SCHEDULER_CONTROL_ADDRESS="127.0.0.1:1",
+        SCHEDULER_CONTROL_AUTHKEY=AUTHKEY,
+    ))
+    assert manager.circuit_states([902]) == {902: "closed"}